@@ -1,12 +1,34 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
 from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
+import evdev
 import jiwer
-import pandas as pd
+import numpy as np
+from loguru import logger
 from rich.console import Console
 from rich.table import Table
+from transformers.pipelines.audio_utils import ffmpeg_read
+from typing_benchmark import read_typed_text
 
+from speech2caret import utils, virtual_keyboard
+from speech2caret.audio import MODEL_SAMPLE_RATE
+from speech2caret.recorder import Recorder
 from speech2caret.speech_to_text import SpeechToText
+from speech2caret.virtual_keyboard import VirtualKeyboard
+from speech2caret.word_replacer import WordReplacer
 
 # --- Configuration ---
 # Add any Hugging Face model names you want to test here
@@ -15,63 +37,292 @@ MODELS_TO_BENCHMARK = [
     "openai/whisper-base.en",
     "openai/whisper-small.en",
 ]
+# Backends (and their options) to compare (see speech2caret.backends.create_backend).
+# faster-whisper and onnx need the extras of the same name.
+BACKENDS_TO_BENCHMARK = [
+    ("transformers", {}),
+    ("transformers", {"quantize": True}),
+    ("transformers", {"quantize": True, "num_threads": os.cpu_count(), "num_interop_threads": 1}),
+    # Greedy decoding, rather than with 5 beams (which may change the WER)
+    ("transformers", {"num_beams": 1}),
+    # Speculative decoding: whisper-tiny.en drafts the text (compare with the ("transformers", {"num_beams": 1}) row
+    # above: the WER should be the same; the peak RSS includes the assistant model)
+    ("transformers", {"num_beams": 1, "assistant_model_name": "openai/whisper-tiny.en"}),
+    # (Experimental) Only encode the audio of short clips, rather than 30 s (compare the WER with the
+    # ("transformers", {}) row above: it should be the same)
+    ("transformers", {"crop_encoder": True}),
+    ("faster-whisper", {}),
+    ("onnx", {}),
+]
+
+# The corpus: audio files (that ffmpeg can decode), each with its transcription in a .txt file of the same name
+CORPUS_DIR = Path(__file__).parent.parent / "tests/data"
+AUDIO_SUFFIXES = (".flac", ".wav", ".mp3", ".ogg")
+# Used by the end-to-end stage
+WORD_REPLACEMENTS = {"new line": "\n", "full stop": "."}
+RECORDING_BLOCK_FRAMES = 1600  # 100 ms blocks, as written by Recorder._callback
+
+# Metrics compared with --baseline (lower is better), allowing them to get worse by --tolerance (relative)
+REGRESSION_METRICS = ["load_time_s", "latency_p50_s", "e2e_latency_p50_s", "peak_rss_mb"]
+
+
+def load_corpus(corpus_dir: Path) -> list[dict]:
+    """Decode each audio file in ``corpus_dir`` (that has a transcription) to the model's input format."""
+    corpus = []
+    for audio_fp in sorted(corpus_dir.iterdir()):
+        transcription_fp = audio_fp.with_suffix(".txt")
+        if audio_fp.suffix in AUDIO_SUFFIXES and transcription_fp.is_file():
+            corpus.append(
+                {
+                    "name": audio_fp.name,
+                    "audio": ffmpeg_read(audio_fp.read_bytes(), MODEL_SAMPLE_RATE),
+                    "transcription": transcription_fp.read_text().strip(),
+                }
+            )
+    if not corpus:
+        raise SystemExit(f"No audio files with transcriptions (.txt files) in {corpus_dir}")
+    return corpus
+
+
+def percentiles(values: list[float]) -> tuple[float, float]:
+    p50, p95 = np.percentile(values, [50, 95])
+    return float(p50), float(p95)
+
+
+class FakeSink:
+    """Stands in for the keyboard device in the end-to-end stage: stores the key events (rather than typing them),
+    so the typed text can be read back with ``read_typed_text``."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.events: list[evdev.InputEvent] = []
+
+    def write(self, etype: int, code: int, value: int) -> None:
+        self.events.append(evdev.InputEvent(0, 0, etype, code, value))
+
+    def syn(self) -> None:
+        pass
+
+    def read_one(self):
+        return self.events.pop(0) if self.events else None
+
+    def close(self) -> None:
+        pass
+
+
+def run_end_to_end(stt: SpeechToText, corpus: list[dict], repeats: int) -> dict:
+    """Time from the end of a recording (the audio is in the recorder's buffer) until its (post-processed)
+    transcription has been typed, through the same code as when the stop key is pressed."""
+    config = SimpleNamespace(vad=False, word_replacer=WordReplacer(WORD_REPLACEMENTS))
+    with mock.patch.object(virtual_keyboard.evdev, "InputDevice", FakeSink):
+        vkeyboard = VirtualKeyboard("/dev/null")
+    # What should be typed: the post-processed text of each segment, separated by spaces (see transcribe_and_type),
+    # without the characters that can't be typed.
+    expected = {}
+    for item in corpus:
+        texts = [config.word_replacer.replace(text) for text in stt.transcribe_segments(item["audio"])]
+        expected[item["name"]] = "".join(
+            char for char in " ".join(filter(None, texts)) if char in VirtualKeyboard.KEY_TABLE
+        )
+
+    latencies = []
+    typed_correctly = True
+    for _ in range(repeats):
+        for item in corpus:
+            recorder = Recorder()
+            for start in range(0, len(item["audio"]), RECORDING_BLOCK_FRAMES):
+                recorder.buffer.write(item["audio"][start : start + RECORDING_BLOCK_FRAMES, None])
+            start_time = time.perf_counter()
+            asyncio.run(utils.transcribe_and_type(recorder, stt, vkeyboard, config))
+            latencies.append(time.perf_counter() - start_time)
+            typed_correctly &= read_typed_text(vkeyboard.device) == expected[item["name"]]
+    p50, p95 = percentiles(latencies)
+    return {"e2e_latency_p50_s": p50, "e2e_latency_p95_s": p95, "e2e_typed_correctly": typed_correctly}
+
 
-# Path to your test audio and the correct transcription
-AUDIO_FILE_PATH = Path(__file__).parent.parent / "tests/data/jfk.flac"
-GROUND_TRUTH_TRANSCRIPTION = "And so my fellow Americans, ask not what your country can do for you, ask what you can do for your country."
+def benchmark_config(backend: str, options: dict, model_name: str, corpus: list[dict], warmup: int, repeats: int):
+    """Benchmark one model/backend (in a new process, so the load time and peak RSS are only of this model)."""
+    logger.disable("speech2caret")  # e.g. the end-to-end stage logs every transcription
+    start_time = time.perf_counter()
+    stt = SpeechToText(model_name=model_name, backend=backend, **options)
+    load_time = time.perf_counter() - start_time
+
+    for _ in range(warmup):
+        for item in corpus:
+            stt.transcribe_array(item["audio"])
+
+    latencies, real_time_factors, transcriptions = [], [], []
+    for _ in range(repeats):
+        transcriptions = []
+        for item in corpus:
+            start_time = time.perf_counter()
+            transcriptions.append(stt.transcribe_array(item["audio"]))
+            latency = time.perf_counter() - start_time
+            latencies.append(latency)
+            real_time_factors.append(latency / (len(item["audio"]) / MODEL_SAMPLE_RATE))
+
+    latency_p50, latency_p95 = percentiles(latencies)
+    rtf_p50, rtf_p95 = percentiles(real_time_factors)
+    result = {
+        "load_time_s": load_time,
+        "latency_p50_s": latency_p50,
+        "latency_p95_s": latency_p95,
+        "rtf_p50": rtf_p50,
+        "rtf_p95": rtf_p95,
+        "wer": jiwer.wer([item["transcription"] for item in corpus], transcriptions),
+        "transcriptions": dict(zip([item["name"] for item in corpus], transcriptions)),
+    }
+    result.update(run_end_to_end(stt, corpus, repeats))
+    # ru_maxrss is in KB on Linux
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+STARTUP_CODE = """
+import time
+start_time = time.perf_counter()
+from speech2caret.main import listen_keyboard_events
+from speech2caret.speech_to_text import SpeechToText
+stt = SpeechToText(load_in_background={load_in_background})
+print(time.perf_counter() - start_time)
+"""
+
+
+def run_startup_benchmark(console: Console) -> dict:
+    """Time how long it takes from importing speech2caret until it's listening for key presses (i.e. the model has
+    been created), when loading the model in the foreground (old behaviour) vs. in the background."""
+    console.print("\n[bold yellow]Benchmarking: startup (import to listening)[/bold yellow]")
+    startup_times = {}
+    for load_in_background in (False, True):
+        # Run in a new process, so nothing has already been imported
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_CODE.format(load_in_background=load_in_background)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        startup_time = float(result.stdout.strip().splitlines()[-1])
+        console.print(f"✅ load_in_background={load_in_background}: {startup_time:.2f}s")
+        startup_times[f"load_in_background={load_in_background}"] = startup_time
+    return startup_times
+
+
+def find_regressions(results: list[dict], baseline: dict, tolerance: float, wer_tolerance: float) -> list[str]:
+    """Compare ``results`` with the results of a previous run (of the same models and backends)."""
+    baseline_results = {(result["backend"], result["model"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get((result["backend"], result["model"]))
+        if previous is None:
+            continue
+        label = f"{result['model']} ({result['backend']})"
+        for metric in REGRESSION_METRICS:
+            if result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{label}: {metric} {previous[metric]:.3f} -> {result[metric]:.3f}")
+        if result["wer"] > previous["wer"] + wer_tolerance:
+            regressions.append(f"{label}: wer {previous['wer']:.3f} -> {result['wer']:.3f}")
+        if previous["e2e_typed_correctly"] and not result["e2e_typed_correctly"]:
+            regressions.append(f"{label}: the transcription is no longer typed correctly")
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the speech-to-text models and backends.")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help="Audio files, with .txt transcriptions")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs over the corpus (per model)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs over the corpus (per model)")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"), help="Where to save results")
+    parser.add_argument("--baseline", type=Path, help="Results of a previous run: exit with 1 if any regressed")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed (relative) slowdown/memory increase")
+    parser.add_argument("--wer-tolerance", type=float, default=0.01, help="Allowed (absolute) WER increase")
+    return parser.parse_args()
 
 
 def run_benchmark():
     """
-    Loads, runs, and times different speech-to-text models,
-    then prints a comparison table.
+    Loads, runs, and times different speech-to-text models over a corpus,
+    then prints a comparison table (and saves the results as JSON).
     """
+    args = parse_args()
     console = Console()
-    console.print(f"🎤 Starting benchmark with audio: [cyan]{AUDIO_FILE_PATH.name}[/cyan]")
-    console.print(f"📝 Ground Truth: \"{GROUND_TRUTH_TRANSCRIPTION}\"")
+    corpus = load_corpus(args.corpus)
+    audio_seconds = sum(len(item["audio"]) for item in corpus) / MODEL_SAMPLE_RATE
+    console.print(f"🎤 Starting benchmark with {len(corpus)} file(s) ({audio_seconds:.1f}s of audio) in {args.corpus}")
 
-    results = []
+    output = {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus": [item["name"] for item in corpus],
+            "audio_seconds": audio_seconds,
+            "warmup": args.warmup,
+            "repeats": args.repeats,
+        },
+        "startup": run_startup_benchmark(console),
+        "results": [],
+    }
 
-    for model_name in MODELS_TO_BENCHMARK:
-        console.print(f"\n[bold yellow]Benchmarking: {model_name}[/bold yellow]")
+    for backend, options in BACKENDS_TO_BENCHMARK:
+        backend_label = f"{backend} {options}" if options else backend
+        for model_name in MODELS_TO_BENCHMARK:
+            console.print(f"\n[bold yellow]Benchmarking: {model_name} ({backend_label})[/bold yellow]")
+            with (
+                console.status("[bold green]Loading and transcribing...[/bold green]"),
+                ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor,
+            ):
+                result = executor.submit(
+                    benchmark_config, backend, options, model_name, corpus, args.warmup, args.repeats
+                ).result()
+            output["results"].append({"backend": backend_label, "model": model_name, **result})
+            console.print(
+                f"✅ [green]Done.[/green] Load: {result['load_time_s']:.2f}s, "
+                f"p50/p95: {result['latency_p50_s']:.2f}/{result['latency_p95_s']:.2f}s, "
+                f"RTF: {result['rtf_p50']:.3f}, WER: {result['wer'] * 100:.2f}%, "
+                f"Peak RSS: {result['peak_rss_mb']:.0f}MB, End-to-end p50: {result['e2e_latency_p50_s']:.2f}s"
+            )
 
-        # 1. Time the model loading
-        with console.status("[bold green]Loading model...[/bold green]"):
-            start_time = time.perf_counter()
-            stt = SpeechToText(model_name=model_name)
-            load_time = time.perf_counter() - start_time
-
-        # 2. Time the transcription
-        with console.status("[bold green]Transcribing audio...[/bold green]"):
-            start_time = time.perf_counter()
-            transcription = stt.transcribe(AUDIO_FILE_PATH)
-            transcribe_time = time.perf_counter() - start_time
-
-        # 3. Calculate Word Error Rate (WER)
-        error_rate = jiwer.wer(GROUND_TRUTH_TRANSCRIPTION, transcription)
-
-        results.append(
-            {
-                "Model": model_name,
-                "Load Time (s)": f"{load_time:.2f}",
-                "Transcribe Time (s)": f"{transcribe_time:.2f}",
-                "WER (%)": f"{error_rate * 100:.2f}",
-                "Transcription": transcription,
-            }
+    table = Table(title="Benchmark Results")
+    for column in (
+        "Backend",
+        "Model",
+        "Load (s)",
+        "p50 (s)",
+        "p95 (s)",
+        "RTF",
+        "WER (%)",
+        "Peak RSS (MB)",
+        "E2E p50 (s)",
+    ):
+        table.add_column(column, justify="left" if column in ("Backend", "Model") else "right")
+    for result in output["results"]:
+        table.add_row(
+            result["backend"],
+            result["model"],
+            f"{result['load_time_s']:.2f}",
+            f"{result['latency_p50_s']:.2f}",
+            f"{result['latency_p95_s']:.2f}",
+            f"{result['rtf_p50']:.3f}",
+            f"{result['wer'] * 100:.2f}",
+            f"{result['peak_rss_mb']:.0f}",
+            f"{result['e2e_latency_p50_s']:.2f}" + ("" if result["e2e_typed_correctly"] else " ❌"),
         )
-        console.print(
-            f"✅ [green]Done.[/green] Load: {load_time:.2f}s, Transcribe: {transcribe_time:.2f}s, WER: {error_rate * 100:.2f}%")
-        console.print(f"   [dim]Hypothesis: \"{transcription}\"[/dim]")
+    console.print(table)
 
-    # 4. Display results in a table
-    console.print("\n\n--- [bold]Benchmark Results[/bold] ---")
-    df = pd.DataFrame(results)
+    args.output.write_text(json.dumps(output, indent=2))
+    console.print(f"Results saved to {args.output}")
 
-    # To display the full transcription text in the table
-    pd.set_option('display.max_colwidth', None)
-    print(df)
+    if args.baseline is not None:
+        regressions = find_regressions(
+            output["results"], json.loads(args.baseline.read_text()), args.tolerance, args.wer_tolerance
+        )
+        for regression in regressions:
+            console.print(f"[red]Regression: {regression}[/red]")
+        if regressions:
+            sys.exit(1)
+        console.print(f"[green]No regressions compared with {args.baseline}[/green]")
 
 
 if __name__ == "__main__":
-    # For a prettier table output, you can install rich and pandas
     run_benchmark()
@@ -0,0 +1,85 @@
+import time
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from transformers.pipelines.audio_utils import ffmpeg_read
+
+from speech2caret.audio import MODEL_SAMPLE_RATE
+from speech2caret.backends.transformers_backend import TransformersBackend
+
+# --- Configuration ---
+MODEL_NAME = "openai/whisper-base.en"
+AUDIO_FILE_PATH = Path(__file__).parent.parent / "tests/data/jfk.flac"
+DURATIONS_SECONDS = [1, 2, 5, 10, 20, 30]
+NUM_RUNS = 50  # feature extraction runs per duration
+NUM_TRANSCRIPTION_RUNS = 5
+
+
+def time_ms(fn: Callable[[], object], num_runs: int) -> float:
+    """The median time (in ms) of calling ``fn``, after one untimed call."""
+    fn()
+    times = []
+    for _ in range(num_runs):
+        start_time = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start_time)
+    return float(np.median(times)) * 1000
+
+
+def pipeline_preprocess(backend: TransformersBackend, audio: np.ndarray) -> None:
+    """Everything the pipeline does before running the model (converting the input, chunking and features)."""
+    for _ in backend.pipe.preprocess({"raw": audio, "sampling_rate": MODEL_SAMPLE_RATE}, chunk_length_s=30):
+        pass
+
+
+def pipeline_transcribe(backend: TransformersBackend, audio: np.ndarray) -> str:
+    return backend.pipe({"raw": audio, "sampling_rate": MODEL_SAMPLE_RATE})["text"].strip()
+
+
+def run_feature_extraction_benchmark():
+    """Compare the pipeline's feature extraction with ``LogMelSpectrogram`` (which the direct path uses)."""
+    console = Console()
+    speech = ffmpeg_read(AUDIO_FILE_PATH.read_bytes(), MODEL_SAMPLE_RATE)
+    clips = {seconds: np.resize(speech, seconds * MODEL_SAMPLE_RATE) for seconds in DURATIONS_SECONDS}
+    backend = TransformersBackend(MODEL_NAME)
+    feature_extractor = backend.pipe.feature_extractor
+
+    features_table = Table(title=f"Feature Extraction Benchmark ({MODEL_NAME}); median ms")
+    features_table.add_column("Audio", style="cyan", justify="right")
+    features_table.add_column("Pipeline preprocess", style="green", justify="right")
+    features_table.add_column("WhisperFeatureExtractor", style="green", justify="right")
+    features_table.add_column("LogMelSpectrogram", style="green", justify="right")
+    features_table.add_column("Max difference", style="magenta", justify="right")
+    transcription_table = Table(title=f"Transcription Benchmark ({MODEL_NAME}); median ms")
+    transcription_table.add_column("Audio", style="cyan", justify="right")
+    transcription_table.add_column("Pipeline", style="green", justify="right")
+    transcription_table.add_column("Direct", style="green", justify="right")
+    transcription_table.add_column("Same text", style="magenta", justify="right")
+
+    for seconds, clip in clips.items():
+        console.print(f"Benchmarking {seconds} s of audio...")
+        expected = feature_extractor(clip, sampling_rate=MODEL_SAMPLE_RATE, return_tensors="pt").input_features
+        features_table.add_row(
+            f"{seconds} s",
+            f"{time_ms(partial(pipeline_preprocess, backend, clip), NUM_RUNS):.2f}",
+            f"{time_ms(partial(feature_extractor, clip, sampling_rate=MODEL_SAMPLE_RATE), NUM_RUNS):.2f}",
+            f"{time_ms(partial(backend.log_mel, clip), NUM_RUNS):.2f}",
+            f"{(backend.log_mel(clip) - expected).abs().max().item():.1e}",
+        )
+
+        transcription_table.add_row(
+            f"{seconds} s",
+            f"{time_ms(partial(pipeline_transcribe, backend, clip), NUM_TRANSCRIPTION_RUNS):.0f}",
+            f"{time_ms(partial(backend.transcribe_array, clip), NUM_TRANSCRIPTION_RUNS):.0f}",
+            "✅" if backend.transcribe_array(clip) == pipeline_transcribe(backend, clip) else "❌",
+        )
+    console.print(features_table)
+    console.print(transcription_table)
+
+
+if __name__ == "__main__":
+    run_feature_extraction_benchmark()
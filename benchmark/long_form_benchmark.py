@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from transformers.pipelines.audio_utils import ffmpeg_read
+
+from speech2caret.audio import MODEL_SAMPLE_RATE
+from speech2caret.speech_to_text import SpeechToText
+
+# --- Configuration ---
+MODEL_NAME = "openai/whisper-base.en"
+BACKENDS = ["transformers", "faster-whisper"]
+AUDIO_FILE_PATH = Path(__file__).parent.parent / "tests/data/jfk.flac"
+DURATIONS_MINUTES = [1, 5, 15]
+BATCH_SIZES = [1, 2, 4, 8]
+PAUSE_SECONDS = 1.0  # between repeats of the clip
+NOISE_AMPLITUDE = 0.003  # background noise of a (quiet) room
+
+
+def make_recording(speech: np.ndarray, minutes: float) -> np.ndarray:
+    """Repeat ``speech`` (with pauses between repeats) to make a recording ``minutes`` long."""
+    rng = np.random.default_rng(0)
+    pause = np.zeros(int(PAUSE_SECONDS * MODEL_SAMPLE_RATE), dtype=np.float32)
+    n_samples = int(minutes * 60 * MODEL_SAMPLE_RATE)
+    repeats = int(np.ceil(n_samples / (len(speech) + len(pause))))
+    recording = np.tile(np.concatenate([speech, pause]), repeats)[:n_samples]
+    return recording + (NOISE_AMPLITUDE * rng.standard_normal(n_samples)).astype(np.float32)
+
+
+def time_transcription(stt: SpeechToText, audio: np.ndarray) -> float:
+    """Time transcribing ``audio`` as ``transcribe_and_type`` does (segment by segment)."""
+    start_time = time.perf_counter()
+    for _ in stt.transcribe_segments(audio):
+        pass
+    return time.perf_counter() - start_time
+
+
+def run_long_form_benchmark():
+    """Compare the throughput of transcribing long recordings with different batch sizes."""
+    console = Console()
+    speech = ffmpeg_read(AUDIO_FILE_PATH.read_bytes(), MODEL_SAMPLE_RATE)
+    recordings = {minutes: make_recording(speech, minutes) for minutes in DURATIONS_MINUTES}
+
+    table = Table(title=f"Long-form Benchmark ({MODEL_NAME}); throughput in seconds of audio per second")
+    table.add_column("Backend", style="cyan")
+    table.add_column("Batch size", style="cyan", justify="right")
+    for minutes in DURATIONS_MINUTES:
+        table.add_column(f"{minutes} min", style="green", justify="right")
+
+    for backend in BACKENDS:
+        for batch_size in BATCH_SIZES:
+            console.print(f"Benchmarking {backend} with batch_size={batch_size}...")
+            stt = SpeechToText(MODEL_NAME, backend, warm_up=True, batch_size=batch_size)
+            throughputs = [
+                f"{len(recording) / MODEL_SAMPLE_RATE / time_transcription(stt, recording):.1f}"
+                for recording in recordings.values()
+            ]
+            table.add_row(backend, str(batch_size), *throughputs)
+    console.print(table)
+
+
+if __name__ == "__main__":
+    run_long_form_benchmark()
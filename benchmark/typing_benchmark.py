@@ -0,0 +1,70 @@
+import time
+
+import evdev
+from rich.console import Console
+
+from speech2caret.virtual_keyboard import VirtualKeyboard
+
+# --- Configuration ---
+# (label, chars_per_report, report_delay) settings to compare. A key is pressed at most once per report (e.g. one
+# space), so prose is typed about a word per report: the delay matters more than chars_per_report.
+TYPING_SETTINGS_TO_BENCHMARK = [
+    ("previous (1 char per report, 10 ms delay)", 1, 0.01),
+    ("default", 8, 0.004),
+    ("8 chars per report, 2 ms delay", 8, 0.002),
+    ("16 chars per report, 1 ms delay", 16, 0.001),
+]
+TEXT = "And so my fellow Americans, ask not what your country can do for you, ask what you can do for your country. " * 5
+
+
+def read_typed_text(sink: evdev.InputDevice) -> str:
+    """Reconstruct the text typed into ``sink`` from its key events (to check nothing was jumbled)."""
+    key_to_char = {keycode: char for char, (keycode, shift) in VirtualKeyboard.KEY_TABLE.items() if not shift}
+    shifted_key_to_char = {keycode: char for char, (keycode, shift) in VirtualKeyboard.KEY_TABLE.items() if shift}
+    typed = []
+    shift = False
+    while (event := sink.read_one()) is not None:
+        if event.type != evdev.ecodes.EV_KEY:
+            continue
+        if event.code == evdev.ecodes.KEY_LEFTSHIFT:
+            shift = event.value == 1
+        elif event.value == 1:
+            typed.append((shifted_key_to_char if shift else key_to_char).get(event.code, "?"))
+    return "".join(typed)
+
+
+def run_typing_benchmark():
+    """
+    Types text into a virtual (uinput) keyboard with different settings,
+    and prints the typing speed and whether the text was typed correctly.
+
+    Needs write access to /dev/uinput (e.g. `sudo setfacl -m u:$USER:rw /dev/uinput`).
+    """
+    console = Console()
+    console.print(f"⌨️ Starting typing benchmark with {len(TEXT)} characters")
+
+    # The sink only has the keys that can be typed, so (hopefully) nothing picks it up as a real keyboard.
+    keys = sorted({keycode for keycode, _ in VirtualKeyboard.KEY_TABLE.values()} | {evdev.ecodes.KEY_LEFTSHIFT})
+    with evdev.UInput({evdev.ecodes.EV_KEY: keys}, name="speech2caret-benchmark-sink") as sink:
+        time.sleep(0.5)  # give udev time to create the device node
+        sink_device = evdev.InputDevice(sink.device.path)
+        sink_device.grab()  # don't type into whatever window is focused
+        baseline_chars_per_second = None
+        for label, chars_per_report, report_delay in TYPING_SETTINGS_TO_BENCHMARK:
+            vkeyboard = VirtualKeyboard(sink.device.path, chars_per_report, report_delay)
+            start_time = time.perf_counter()
+            vkeyboard.type_text(TEXT)
+            typing_time = time.perf_counter() - start_time
+            time.sleep(0.1)
+
+            chars_per_second = len(TEXT) / typing_time
+            baseline_chars_per_second = baseline_chars_per_second or chars_per_second
+            correct = read_typed_text(sink_device) == TEXT
+            console.print(
+                f"{'✅' if correct else '❌ [red]jumbled[/red]'} {label}: {chars_per_second:.0f} chars/s "
+                f"({chars_per_second / baseline_chars_per_second:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    run_typing_benchmark()
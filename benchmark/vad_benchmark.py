@@ -0,0 +1,89 @@
+import time
+from pathlib import Path
+
+import jiwer
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+from transformers.pipelines.audio_utils import ffmpeg_read
+
+from speech2caret.audio import MODEL_SAMPLE_RATE, trim_silence
+from speech2caret.speech_to_text import SpeechToText
+
+# --- Configuration ---
+MODEL_NAME = "openai/whisper-base.en"
+AUDIO_FILE_PATH = Path(__file__).parent.parent / "tests/data/jfk.flac"
+GROUND_TRUTH_TRANSCRIPTION = "And so my fellow Americans, ask not what your country can do for you, ask what you can do for your country."
+# Where to split the audio (in seconds) to insert pauses
+PHRASE_ENDS = [2.1, 5.2, 7.4]
+# (name, silence before, pauses between phrases, silence after): all in seconds
+CORPUS = [
+    ("no pauses", 0.0, [0.0, 0.0, 0.0], 0.0),
+    ("hotkey silence", 1.5, [0.0, 0.0, 0.0], 2.0),
+    ("thinking pauses", 1.5, [1.0, 3.0, 2.0], 2.0),
+    ("long pauses", 2.0, [4.0, 8.0, 6.0], 3.0),
+    ("very long pauses", 3.0, [8.0, 15.0, 10.0], 5.0),
+]
+NOISE_AMPLITUDE = 0.003  # background noise of a (quiet) room
+
+
+def make_recording(speech: np.ndarray, before: float, pauses: list[float], after: float) -> np.ndarray:
+    """Insert silence (background noise) before, between the phrases of, and after ``speech``."""
+    rng = np.random.default_rng(0)
+
+    def noise(seconds: float) -> np.ndarray:
+        return (NOISE_AMPLITUDE * rng.standard_normal(int(seconds * MODEL_SAMPLE_RATE))).astype(np.float32)
+
+    splits = [int(end * MODEL_SAMPLE_RATE) for end in PHRASE_ENDS]
+    phrases = np.split(speech, splits)
+    pieces = [noise(before)]
+    for phrase, pause in zip(phrases, pauses + [after]):
+        pieces += [phrase + noise(len(phrase) / MODEL_SAMPLE_RATE), noise(pause)]
+    return np.concatenate(pieces)
+
+
+def time_transcription(stt: SpeechToText, audio: np.ndarray) -> tuple[str, float]:
+    start_time = time.perf_counter()
+    transcription = stt.transcribe_array(audio)
+    return transcription, time.perf_counter() - start_time
+
+
+def run_vad_benchmark():
+    """Compare transcribing recordings with pauses in full, vs. after removing silence (``trim_silence``)."""
+    console = Console()
+    speech = ffmpeg_read(AUDIO_FILE_PATH.read_bytes(), MODEL_SAMPLE_RATE)
+    stt = SpeechToText(MODEL_NAME, warm_up=True)
+
+    table = Table(title=f"VAD Benchmark ({MODEL_NAME})")
+    table.add_column("Recording", style="cyan")
+    table.add_column("Audio (s)", style="magenta", justify="right")
+    table.add_column("After VAD (s)", style="green", justify="right")
+    table.add_column("VAD (ms)", style="green", justify="right")
+    table.add_column("Transcribe (s)", style="magenta", justify="right")
+    table.add_column("Transcribe after VAD (s)", style="green", justify="right")
+    table.add_column("WER (%)", style="magenta", justify="right")
+    table.add_column("WER after VAD (%)", style="green", justify="right")
+
+    for name, before, pauses, after in CORPUS:
+        recording = make_recording(speech, before, pauses, after)
+        start_time = time.perf_counter()
+        trimmed = trim_silence(recording, MODEL_SAMPLE_RATE)
+        vad_time = time.perf_counter() - start_time
+
+        transcription, transcribe_time = time_transcription(stt, recording)
+        trimmed_transcription, trimmed_transcribe_time = time_transcription(stt, trimmed)
+        table.add_row(
+            name,
+            f"{len(recording) / MODEL_SAMPLE_RATE:.1f}",
+            f"{len(trimmed) / MODEL_SAMPLE_RATE:.1f}",
+            f"{vad_time * 1000:.1f}",
+            f"{transcribe_time:.2f}",
+            f"{trimmed_transcribe_time:.2f}",
+            f"{jiwer.wer(GROUND_TRUTH_TRANSCRIPTION, transcription) * 100:.1f}",
+            f"{jiwer.wer(GROUND_TRUTH_TRANSCRIPTION, trimmed_transcription) * 100:.1f}",
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    run_vad_benchmark()
@@ -0,0 +1,72 @@
+import random
+import re
+import string
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+from speech2caret.word_replacer import WordReplacer
+
+# --- Configuration ---
+NUMS_OF_REPLACEMENTS = [10, 100, 1_000, 10_000]
+NUM_WORDS = 200  # roughly a minute of dictation
+NUM_RUNS = 5
+
+
+def replace_words_loop(text: str, word_replacements: dict[str, str]) -> str:
+    """The previous implementation: one ``re.sub`` per replacement."""
+    for word, replacement in word_replacements.items():
+        text = re.sub(r"\b" + re.escape(word) + r"\b", replacement, text, flags=re.IGNORECASE)
+    return text
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+
+
+def time_per_run(func, *args) -> float:
+    start_time = time.perf_counter()
+    for _ in range(NUM_RUNS):
+        func(*args)
+    return (time.perf_counter() - start_time) / NUM_RUNS
+
+
+def run_word_replacements_benchmark():
+    """Compare replacing words one ``re.sub`` at a time with a (precompiled) ``WordReplacer``."""
+    console = Console()
+    rng = random.Random(0)
+    table = Table(title=f"Word Replacements Benchmark ({NUM_WORDS} words of text)")
+    table.add_column("Replacements", style="cyan", justify="right")
+    table.add_column("re.sub loop (ms)", style="magenta", justify="right")
+    table.add_column("WordReplacer build (ms)", style="green", justify="right")
+    table.add_column("WordReplacer replace (ms)", style="green", justify="right")
+    table.add_column("Speedup", style="yellow", justify="right")
+
+    for num_replacements in NUMS_OF_REPLACEMENTS:
+        word_replacements = {}
+        while len(word_replacements) < num_replacements:
+            # Single words and two-word phrases
+            word = " ".join(random_word(rng) for _ in range(rng.randint(1, 2)))
+            word_replacements[word] = word.upper()
+        words = list(word_replacements)
+        text = " ".join(rng.choice(words) if rng.random() < 0.2 else random_word(rng) for _ in range(NUM_WORDS))
+
+        loop_time = time_per_run(replace_words_loop, text, word_replacements)
+        build_time = time_per_run(WordReplacer, word_replacements)
+        replacer = WordReplacer(word_replacements)
+        replace_time = time_per_run(replacer.replace, text)
+        assert replacer.replace(text) == replace_words_loop(text, word_replacements)  # nosec
+
+        table.add_row(
+            f"{num_replacements:,}",
+            f"{loop_time * 1000:.2f}",
+            f"{build_time * 1000:.2f}",
+            f"{replace_time * 1000:.3f}",
+            f"{loop_time / replace_time:.0f}x",
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    run_word_replacements_benchmark()
@@ -0,0 +1,313 @@
+import math
+import wave
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MODEL_SAMPLE_RATE = 16000  # whisper models expect 16 kHz mono audio
+
+WAV_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}  # sample width (bytes) -> dtype
+
+
+def load_wav(audio_fp: Path) -> Tuple[np.ndarray, int]:
+    """Decode a (8, 16 or 32-bit PCM) WAV file.
+
+    Returns:
+        The samples shaped (frames, channels), and the sample rate.
+
+    Raises:
+        wave.Error: If the file isn't a WAV file in a supported format.
+    """
+    with wave.open(str(audio_fp), "rb") as wf:
+        dtype = WAV_DTYPES.get(wf.getsampwidth())
+        if dtype is None:
+            raise wave.Error(f"unsupported sample width: {wf.getsampwidth()} bytes")
+        data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=dtype).reshape(-1, wf.getnchannels())
+        return data, wf.getframerate()
+
+
+@lru_cache(maxsize=8)
+def _resample_kernels(orig_sample_rate: int, target_sample_rate: int, lowpass_filter_width: int) -> np.ndarray:
+    """The windowed-sinc (Hann window) filters of each of the ``target_sample_rate`` output phases (see ``resample``).
+
+    The rates are the reduced ratio, so there are only a few hundred phases (e.g. 160 for 44.1 to 16 kHz).
+    """
+    # Low-pass filter just below the lower Nyquist frequency, to remove the frequencies that would alias
+    cutoff = min(orig_sample_rate, target_sample_rate) * 0.99
+    width = math.ceil(lowpass_filter_width * orig_sample_rate / cutoff)
+    # The time (in input samples) of each filter tap, relative to each output sample
+    t = np.arange(-width, width + orig_sample_rate) / orig_sample_rate
+    t = (t - np.arange(target_sample_rate)[:, None] / target_sample_rate) * cutoff
+    t = np.clip(t, -lowpass_filter_width, lowpass_filter_width)
+    window = np.cos(t * np.pi / lowpass_filter_width / 2) ** 2
+    kernels = np.sinc(t) * window
+    # Normalise the gain of each filter, so constant audio stays constant
+    normalised: np.ndarray = (kernels / kernels.sum(axis=1, keepdims=True)).astype(np.float32)
+    return normalised
+
+
+def resample(
+    audio: np.ndarray, orig_sample_rate: int, target_sample_rate: int, lowpass_filter_width: int = 6
+) -> np.ndarray:
+    """Resample mono audio with a windowed-sinc (band-limited) filter.
+
+    Frequencies above the Nyquist frequency of the lower rate are filtered out, rather than aliased (e.g. into the
+    speech band, when downsampling 44.1 kHz recordings to 16 kHz). Each output sample is a dot product of the input
+    with the filter of its phase, so this is a single matrix multiplication (a polyphase resampler).
+
+    Args:
+        audio: 1D array of samples.
+        orig_sample_rate: The sample rate of ``audio``.
+        target_sample_rate: The sample rate to convert to.
+        lowpass_filter_width: The number of zero crossings of the sinc either side of each output sample (higher is a
+            sharper filter, but slower).
+
+    Returns:
+        The resampled float32 audio.
+    """
+    audio = audio.astype(np.float32, copy=False)
+    if orig_sample_rate == target_sample_rate or audio.size == 0:
+        return audio
+    n_out = round(len(audio) * target_sample_rate / orig_sample_rate)
+    gcd = math.gcd(orig_sample_rate, target_sample_rate)
+    orig, target = orig_sample_rate // gcd, target_sample_rate // gcd
+    kernels = _resample_kernels(orig, target, lowpass_filter_width)
+    width = (kernels.shape[1] - orig) // 2
+    # Each block of `orig` input samples gives `target` output samples, from the input around it
+    n_blocks = -(-n_out // target)
+    padded = np.zeros((n_blocks - 1) * orig + kernels.shape[1], dtype=np.float32)
+    n_audio = min(len(audio), len(padded) - width)
+    padded[width : width + n_audio] = audio[:n_audio]
+    frames = np.lib.stride_tricks.sliding_window_view(padded, kernels.shape[1])[::orig]
+    resampled: np.ndarray = (frames @ kernels.T).ravel()[:n_out]
+    return resampled
+
+
+def to_model_input(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Convert recorded audio to the format expected by the speech-to-text model.
+
+    Args:
+        audio: Samples shaped (frames,) or (frames, channels). Integer samples are scaled to [-1, 1].
+        sample_rate: The sample rate of ``audio``.
+
+    Returns:
+        float32 mono audio sampled at ``MODEL_SAMPLE_RATE``.
+    """
+    if np.issubdtype(audio.dtype, np.integer):
+        audio = audio.astype(np.float32) / float(np.iinfo(audio.dtype).max)
+    else:
+        audio = audio.astype(np.float32, copy=False)
+    if audio.ndim == 2:
+        audio = audio[:, 0] if audio.shape[1] == 1 else audio.mean(axis=1, dtype=np.float32)
+    return resample(audio, sample_rate, MODEL_SAMPLE_RATE)
+
+
+def find_split_point(audio: np.ndarray, sample_rate: int, search_seconds: float, frame_seconds: float = 0.03) -> int:
+    """Find the quietest point within the last ``search_seconds`` of ``audio``.
+
+    Splitting audio at a quiet point (rather than at a fixed offset) avoids cutting a word in half.
+
+    Args:
+        audio: Samples shaped (frames,) or (frames, channels).
+        sample_rate: The sample rate of ``audio``.
+        search_seconds: How far back from the end of ``audio`` to search.
+        frame_seconds: The length of the frames that energy is measured over.
+
+    Returns:
+        The index to split ``audio`` at.
+    """
+    frame_len = max(1, int(sample_rate * frame_seconds))
+    start = max(0, len(audio) - int(search_seconds * sample_rate))
+    window = audio[start:].astype(np.float32)
+    if window.ndim == 2:
+        window = window.mean(axis=1)
+    n_frames = len(window) // frame_len
+    if n_frames == 0:
+        return len(audio)
+    energy = np.square(window[: n_frames * frame_len]).reshape(n_frames, frame_len).mean(axis=1)
+    return start + int(np.argmin(energy)) * frame_len + frame_len // 2
+
+
+def trim_silence(
+    audio: np.ndarray,
+    sample_rate: int,
+    threshold_db: float = -35.0,
+    padding_seconds: float = 0.2,
+    max_pause_seconds: float = 0.5,
+    frame_seconds: float = 0.03,
+    min_db: float = -60.0,
+) -> np.ndarray:
+    """Remove the silence before and after speech, and shorten long pauses (energy-based voice activity detection).
+
+    A frame is speech if it is no more than ``-threshold_db`` quieter than the loud parts of the audio (the 99th
+    percentile of frame energy), and louder than ``min_db`` (so a silent recording is all silence). Measuring relative
+    to the loud parts means it doesn't depend on the microphone's gain.
+
+    Args:
+        audio: 1D array of samples (e.g. from ``to_model_input``).
+        sample_rate: The sample rate of ``audio``.
+        threshold_db: How much quieter than the loud parts of the audio (in dB) a frame can be, to count as speech.
+        padding_seconds: How much audio to keep either side of speech (so quiet starts/ends of words aren't cut off).
+        max_pause_seconds: Pauses in speech longer than this are shortened to this.
+        frame_seconds: The length of the frames that energy is measured over.
+        min_db: Frames quieter than this (in dBFS) are always silence.
+
+    Returns:
+        The audio with silence removed (empty if there's no speech).
+    """
+    frame_len = max(1, int(sample_rate * frame_seconds))
+    n_frames = -(-len(audio) // frame_len)  # the last frame may be partial
+    if n_frames == 0:
+        return audio
+    padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+    padded[: len(audio)] = audio
+    energy_db = 10 * np.log10(np.square(padded).reshape(n_frames, frame_len).mean(axis=1) + 1e-12)
+    is_speech = energy_db > max(float(np.percentile(energy_db, 99)) + threshold_db, min_db)
+    if not is_speech.any():
+        return audio[:0]
+
+    # Keep some audio either side of speech
+    padding_frames = int(padding_seconds / frame_seconds)
+    if padding_frames:
+        is_speech = np.convolve(is_speech, np.ones(2 * padding_frames + 1), mode="same") > 0
+    # Keep (at most) the first max_pause_frames of each pause, and none of the silence before/after speech
+    frame_idx = np.arange(n_frames)
+    pause_start = np.maximum.accumulate(np.where(is_speech, frame_idx + 1, 0))
+    keep = is_speech | (frame_idx - pause_start < int(max_pause_seconds / frame_seconds))
+    speech_idx = np.flatnonzero(is_speech)
+    keep[: speech_idx[0]] = False
+    keep[speech_idx[-1] + 1 :] = False
+    trimmed: np.ndarray = audio[np.repeat(keep, frame_len)[: len(audio)]]
+    return trimmed
+
+
+class SilenceDetector:
+    """Detect the end of speech in a stream of audio blocks (e.g. to stop recording hands-free).
+
+    A frame is speech if it is at least ``margin_db`` louder than the background noise (and louder than ``min_db``).
+    The noise level is tracked as the quietest recent frame, rising slowly so it adapts if the room gets noisier.
+
+    Args:
+        sample_rate: The sample rate of the audio.
+        silence_seconds: How long the silence after speech must be, for speech to have ended.
+        margin_db: How much louder than the background noise (in dB) speech is.
+        min_db: Frames quieter than this (in dBFS) are always silence.
+        frame_seconds: The length of the frames that energy is measured over.
+        noise_rise_db_per_second: How quickly the noise level can rise.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        silence_seconds: float,
+        margin_db: float = 10.0,
+        min_db: float = -60.0,
+        frame_seconds: float = 0.03,
+        noise_rise_db_per_second: float = 1.0,
+    ) -> None:
+        self.frame_len = max(1, int(sample_rate * frame_seconds))
+        self.silence_frames = max(1, round(silence_seconds / frame_seconds))
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.noise_rise_db = noise_rise_db_per_second * frame_seconds
+        self.noise_db: Optional[float] = None
+        # Whether there has been speech since speech last ended
+        self.has_speech = False
+        self._n_silent_frames = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def process(self, block: np.ndarray) -> bool:
+        """Process the next block of audio (shaped (frames,) or (frames, channels)).
+
+        Returns:
+            Whether speech ended in this block.
+        """
+        if np.issubdtype(block.dtype, np.integer):
+            block = block.astype(np.float32) / float(np.iinfo(block.dtype).max)
+        if block.ndim == 2:
+            block = block.mean(axis=1, dtype=np.float32)
+        samples = np.concatenate([self._pending, block.astype(np.float32, copy=False)])
+        n_frames = len(samples) // self.frame_len
+        self._pending = samples[n_frames * self.frame_len :]
+        frames = samples[: n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        energy_db = 10 * np.log10(np.square(frames).mean(axis=1) + 1e-12)
+
+        speech_ended = False
+        for frame_db in energy_db.tolist():  # a block is only a few frames
+            noise_db = frame_db if self.noise_db is None else min(frame_db, self.noise_db + self.noise_rise_db)
+            self.noise_db = noise_db
+            if frame_db > max(noise_db + self.margin_db, self.min_db):
+                self.has_speech = True
+                self._n_silent_frames = 0
+            elif self.has_speech:
+                self._n_silent_frames += 1
+                if self._n_silent_frames >= self.silence_frames:
+                    speech_ended = True
+                    self.has_speech = False
+                    self._n_silent_frames = 0
+        return speech_ended
+
+    def reset(self) -> None:
+        """Forget the silence (and partial frame) processed so far, e.g. when recording resumes after a pause.
+
+        Whether there has been speech, and the noise level, are kept, so speech before the pause still ends (and isn't
+        lost) once there's enough silence after it.
+        """
+        self._n_silent_frames = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+
+
+def split_into_segments(
+    audio: np.ndarray, sample_rate: int, segment_seconds: float, search_seconds: float = 2.0
+) -> List[np.ndarray]:
+    """Split audio into segments of at most ``segment_seconds``, at quiet points (see ``find_split_point``).
+
+    Args:
+        audio: Samples shaped (frames,) or (frames, channels).
+        sample_rate: The sample rate of ``audio``.
+        segment_seconds: The maximum length of each segment.
+        search_seconds: How far back from the end of each segment to search for a quiet point.
+
+    Returns:
+        Views of ``audio``.
+    """
+    segment_samples = int(segment_seconds * sample_rate)
+    search_seconds = min(search_seconds, segment_seconds)
+    segments = []
+    start = 0
+    while len(audio) - start > segment_samples:
+        split = start + find_split_point(audio[start : start + segment_samples], sample_rate, search_seconds)
+        segments.append(audio[start:split])
+        start = split
+    segments.append(audio[start:])
+    return segments
+
+
+class AudioBuffer:
+    """A growable buffer that recorded audio blocks are written into in place.
+
+    This avoids allocating an array for every recorded block, and concatenating them all once recording stops.
+    Capacity is doubled when full, so growing is rare (and amortised).
+    """
+
+    def __init__(self, channels: int, dtype: str, initial_frames: int) -> None:
+        self._data = np.empty((max(1, initial_frames), channels), dtype=dtype)
+        self.n_frames = 0
+
+    def write(self, block: np.ndarray) -> np.ndarray:
+        """Append ``block`` (shaped (frames, channels)) and return a view of where it was written."""
+        end = self.n_frames + len(block)
+        if end > len(self._data):
+            grown = np.empty((max(end, 2 * len(self._data)), self._data.shape[1]), dtype=self._data.dtype)
+            grown[: self.n_frames] = self._data[: self.n_frames]
+            self._data = grown
+        written = self._data[self.n_frames : end]
+        written[:] = block
+        self.n_frames = end
+        return written
+
+    def get(self) -> np.ndarray:
+        """Return a view of the audio written so far."""
+        return self._data[: self.n_frames]
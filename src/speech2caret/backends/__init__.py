@@ -0,0 +1,34 @@
+from typing import Any
+
+from speech2caret.backends.base import Backend
+
+BACKENDS = ("transformers", "faster-whisper", "onnx")
+
+
+def create_backend(backend: str, model_name: str, **options: Any) -> Backend:
+    """Create a speech-to-text backend.
+
+    Backends are imported here (rather than at the top of the module) so the optional dependencies of the backends
+    that aren't used don't need to be installed.
+
+    Args:
+        backend: The name of the backend, one of ``BACKENDS``.
+        model_name: The Hugging Face name of the whisper model, e.g. "openai/whisper-base.en".
+        **options: Options supported by the backend (see the backend's class).
+
+    Returns:
+        The backend.
+    """
+    if backend == "transformers":
+        from speech2caret.backends.transformers_backend import TransformersBackend
+
+        return TransformersBackend(model_name, **options)
+    if backend == "faster-whisper":
+        from speech2caret.backends.faster_whisper_backend import FasterWhisperBackend
+
+        return FasterWhisperBackend(model_name, **options)
+    if backend == "onnx":
+        from speech2caret.backends.onnx_backend import OnnxBackend
+
+        return OnnxBackend(model_name, **options)
+    raise ValueError(f"Unknown backend: {backend} (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,30 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from speech2caret.audio import MODEL_SAMPLE_RATE, split_into_segments
+
+SEGMENT_SECONDS = 30  # whisper models transcribe (at most) 30 s of audio at a time
+
+
+class Backend(ABC):
+    """A way of running a whisper model (see ``create_backend``)."""
+
+    @abstractmethod
+    def transcribe(self, audio_fp: Path) -> str:
+        """Transcribe an audio file."""
+
+    @abstractmethod
+    def transcribe_array(self, audio: np.ndarray) -> str:
+        """Transcribe float32 mono audio sampled at ``MODEL_SAMPLE_RATE``."""
+
+    def transcribe_segments(self, audio: np.ndarray) -> Iterator[str]:
+        """Transcribe audio (like ``transcribe_array``), yielding the text of each segment as soon as it is final.
+
+        By default, the audio is split into segments of at most ``SEGMENT_SECONDS`` at quiet points, which are
+        transcribed one at a time.
+        """
+        for segment in split_into_segments(audio, MODEL_SAMPLE_RATE, SEGMENT_SECONDS):
+            yield self.transcribe_array(segment)
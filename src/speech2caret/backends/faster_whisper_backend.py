@@ -0,0 +1,70 @@
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.transcribe import Segment
+
+from speech2caret.backends.base import Backend
+
+
+def faster_whisper_model_name(model_name: str) -> str:
+    """Map an OpenAI whisper model name (e.g. "openai/whisper-base.en") to its faster-whisper name ("base.en").
+
+    Other names (e.g. a CTranslate2 model on the Hugging Face Hub, or a local path) are returned unchanged.
+    """
+    return model_name.removeprefix("openai/whisper-")
+
+
+class FasterWhisperBackend(Backend):
+    """Run the model with CTranslate2 (via faster-whisper), using int8 quantized weights on CPU.
+
+    Args:
+        model_name: The name of the model (see ``faster_whisper_model_name``).
+        num_threads: The number of threads to use (0 uses CTranslate2's default).
+        batch_size: With more than 1, audio is split into chunks (at pauses in speech), which are transcribed this
+            many at a time (with faster-whisper's ``BatchedInferencePipeline``).
+        initial_prompt: Text (e.g. a list of names and technical terms) the model is given as the text preceding the
+            audio, so it's more likely to spell those words the same way. It's tokenized once (here), except with
+            ``batch_size`` above 1 (``BatchedInferencePipeline`` only accepts text, which it tokenizes itself).
+    """
+
+    def __init__(
+        self, model_name: str, num_threads: int = 0, batch_size: int = 1, initial_prompt: Optional[str] = None
+    ) -> None:
+        self.model = WhisperModel(
+            faster_whisper_model_name(model_name), device="cpu", compute_type="int8", cpu_threads=num_threads
+        )
+        self.batch_size = batch_size
+        self.batched_model = BatchedInferencePipeline(self.model) if batch_size > 1 else None
+        # faster-whisper's default decoding (5 beams), the same as the transformers backend
+        self.options: dict[str, Any] = {}
+        if initial_prompt and self.batched_model is not None:
+            self.options["initial_prompt"] = initial_prompt
+        elif initial_prompt:
+            # The same tokens as faster-whisper's (which tokenizes a text prompt for every transcription)
+            self.options["initial_prompt"] = self.model.hf_tokenizer.encode(
+                " " + initial_prompt.strip(), add_special_tokens=False
+            ).ids
+
+    def _transcribe_segments(self, audio: Union[str, np.ndarray]) -> Iterator[Segment]:
+        segments: Iterator[Segment]
+        if self.batched_model is not None:
+            segments, _ = self.batched_model.transcribe(audio, batch_size=self.batch_size, **self.options)
+        else:
+            segments, _ = self.model.transcribe(audio, **self.options)
+        return segments
+
+    def _transcribe(self, audio: Union[str, np.ndarray]) -> str:
+        return "".join(segment.text for segment in self._transcribe_segments(audio)).strip()
+
+    def transcribe(self, audio_fp: Path) -> str:
+        return self._transcribe(str(audio_fp))
+
+    def transcribe_array(self, audio: np.ndarray) -> str:
+        return self._transcribe(audio)
+
+    def transcribe_segments(self, audio: np.ndarray) -> Iterator[str]:
+        # faster-whisper transcribes lazily, one segment (or batch) at a time
+        for segment in self._transcribe_segments(audio):
+            yield segment.text.strip()
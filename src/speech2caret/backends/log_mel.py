@@ -0,0 +1,53 @@
+from typing import Any
+
+import numpy as np
+import torch
+
+
+class LogMelSpectrogram:
+    """Compute whisper's input features (its log-mel spectrogram) for up to 30 s of audio.
+
+    The features are the same as ``WhisperFeatureExtractor``'s, which pads the audio to 30 s and computes the STFT of
+    all 3000 frames. Here, only the frames that overlap the audio are computed (the frames that only contain padding
+    all have the same, minimum, value), so short audio is much quicker. The window and mel filter bank are created
+    once, rather than for each call.
+
+    Args:
+        feature_extractor: The model's ``WhisperFeatureExtractor`` (for its mel filter bank and STFT parameters).
+    """
+
+    def __init__(self, feature_extractor: Any) -> None:
+        self.n_fft: int = feature_extractor.n_fft
+        self.hop_length: int = feature_extractor.hop_length
+        self.n_samples: int = feature_extractor.n_samples  # 30 s
+        self.n_frames: int = feature_extractor.nb_max_frames
+        self.window = torch.hann_window(self.n_fft)
+        self.mel_filters = torch.from_numpy(feature_extractor.mel_filters.T.astype(np.float32)).contiguous()
+
+    def __call__(self, audio: np.ndarray) -> torch.Tensor:
+        """Compute the features of float32 mono audio sampled at ``MODEL_SAMPLE_RATE`` (audio after 30 s is ignored).
+
+        Returns:
+            The features, shaped (1, n_mels, n_frames).
+        """
+        audio = audio[: self.n_samples]
+        pad = self.n_fft // 2
+        # The frames are centred every hop_length samples, so these are the ones that overlap the audio
+        n_active = min(self.n_frames, -(-(len(audio) + pad) // self.hop_length))
+        # The audio zero padded (to n_samples), then reflect padded either side (as torch.stft(center=True) does)
+        padded = np.zeros((n_active - 1) * self.hop_length + self.n_fft, dtype=np.float32)
+        n_audio = min(len(audio), len(padded) - pad)
+        padded[pad : pad + n_audio] = audio[:n_audio]
+        padded[:pad] = padded[2 * pad : pad : -1]
+        end = pad + self.n_samples
+        if len(padded) > end:  # the last frames overlap the end of the 30 s
+            padded[end:] = padded[end - 2 : 2 * end - len(padded) - 2 : -1]
+
+        stft = torch.stft(
+            torch.from_numpy(padded), self.n_fft, self.hop_length, window=self.window, center=False, return_complex=True
+        )
+        log_mel = torch.clamp(self.mel_filters @ stft.abs() ** 2, min=1e-10).log10()
+        features = torch.full((len(self.mel_filters), self.n_frames), -10.0)  # log10 of the padding's 1e-10
+        features[:, :n_active] = log_mel
+        features = torch.maximum(features, features.max() - 8.0)
+        return ((features + 4.0) / 4.0).unsqueeze(0)
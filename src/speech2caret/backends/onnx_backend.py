@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+from onnxruntime import SessionOptions
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+
+from speech2caret.backends.transformers_backend import TransformersBackend
+from speech2caret.config import CACHE_DIR
+
+
+def quantized_model_dir(model_name: str) -> Path:
+    """Get the directory of the int8 quantized ONNX export of a model, creating it the first time it's needed."""
+    model_dir = CACHE_DIR / "onnx" / model_name.replace("/", "--")
+    # config.json is written last, so its presence means the export completed
+    if not (model_dir / "config.json").is_file():
+        logger.info(f"Exporting {model_name} to ONNX (int8) in {model_dir}. This only happens once.")
+        model_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory() as export_dir:
+            ORTModelForSpeechSeq2Seq.from_pretrained(model_name, export=True).save_pretrained(export_dir)
+            export_fps = sorted(Path(export_dir).iterdir(), key=lambda fp: fp.name == "config.json")
+            for fp in export_fps:
+                if fp.suffix == ".onnx":
+                    quantize_dynamic(fp, model_dir / fp.name, weight_type=QuantType.QInt8)
+                elif fp.is_file():
+                    shutil.copy(fp, model_dir / fp.name)
+    return model_dir
+
+
+class OnnxBackend(TransformersBackend):
+    """Run an int8 (dynamically) quantized ONNX export of the model with ONNX Runtime."""
+
+    def _load_model(self, model_name: str, quantize: bool) -> Any:
+        session_options = SessionOptions()
+        session_options.intra_op_num_threads = self.num_threads
+        return ORTModelForSpeechSeq2Seq.from_pretrained(
+            quantized_model_dir(model_name), session_options=session_options
+        )
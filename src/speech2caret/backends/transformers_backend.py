@@ -0,0 +1,223 @@
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import torch
+from loguru import logger
+from transformers import (
+    AutoConfig,
+    AutoModelForSpeechSeq2Seq,
+    AutoProcessor,
+    GenerationConfig,
+    pipeline,
+)
+from transformers.modeling_outputs import BaseModelOutput
+from transformers.modeling_utils import no_init_weights
+
+from speech2caret.audio import MODEL_SAMPLE_RATE
+from speech2caret.backends.base import SEGMENT_SECONDS, Backend
+from speech2caret.backends.log_mel import LogMelSpectrogram
+from speech2caret.config import CACHE_DIR
+
+# With crop_encoder, the encoder gets the audio's frames plus (at least) this many frames of padding, rounded up to a
+# multiple of CROP_STEP_FRAMES (100 frames is 1 s)
+CROP_PADDING_FRAMES = 100
+CROP_STEP_FRAMES = 100
+
+
+def quantize_model(model: Any) -> Any:
+    """Apply dynamic int8 quantization to the Linear layers of a model (weights are int8, activations are
+    quantized on the fly)."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)  # type: ignore[no-untyped-call, unused-ignore]
+
+
+def load_quantized_model(model_name: str) -> Any:
+    """Load a dynamically quantized model, using the quantized weights cached on disk if they exist."""
+    cache_fp = CACHE_DIR / "quantized" / f"{model_name.replace('/', '--')}-torch{torch.__version__}.pt"
+    if not cache_fp.is_file():
+        logger.info(f"Quantizing {model_name} (cached in {cache_fp}). This only happens once.")
+        model = quantize_model(AutoModelForSpeechSeq2Seq.from_pretrained(model_name, torch_dtype=torch.float32))
+        cache_fp.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(model.state_dict(), cache_fp)
+        return model
+
+    # Build the model without loading (or initialising) the float32 weights, then load the quantized ones.
+    with no_init_weights():
+        model = AutoModelForSpeechSeq2Seq.from_config(AutoConfig.from_pretrained(model_name))  # type: ignore[no-untyped-call, unused-ignore]
+    model = quantize_model(model)
+    model.load_state_dict(torch.load(cache_fp, weights_only=True))
+    model.generation_config = GenerationConfig.from_pretrained(model_name)
+    return model.eval()
+
+
+def encode_cropped(encoder: Any, input_features: torch.Tensor, n_frames: int) -> BaseModelOutput:
+    """Run whisper's encoder on only the first ``n_frames`` (an even number) of its input features.
+
+    Whisper's encoder only accepts 30 s of features (3000 frames), and adds the positional embedding of each of its
+    1500 positions. This is the same, except only the positions of the first ``n_frames`` are computed (so the
+    attention is over fewer positions), and the positional embeddings are sliced to match.
+    """
+    inputs_embeds = torch.nn.functional.gelu(encoder.conv1(input_features[..., :n_frames]))
+    inputs_embeds = torch.nn.functional.gelu(encoder.conv2(inputs_embeds)).permute(0, 2, 1)
+    hidden_states = inputs_embeds + encoder.embed_positions.weight[: inputs_embeds.shape[1]]
+    for encoder_layer in encoder.layers:
+        hidden_states = encoder_layer(hidden_states, None, layer_head_mask=None)[0]
+    return BaseModelOutput(last_hidden_state=encoder.layer_norm(hidden_states))
+
+
+class TransformersBackend(Backend):
+    """Run the model (float32, on CPU) with Hugging Face transformers.
+
+    Audio of up to 30 s (e.g. each segment of a recording) is transcribed by calling the model's ``generate`` directly,
+    with the features computed by ``LogMelSpectrogram``. Files, and longer audio (which is chunked), are transcribed
+    with a transformers pipeline.
+
+    Args:
+        model_name: The Hugging Face name of the model.
+        quantize: Apply dynamic int8 quantization to the Linear layers (cached in ``CACHE_DIR``).
+        num_threads: The number of threads torch uses for intra-op parallelism (0 uses torch's default).
+        num_interop_threads: The number of threads torch uses for inter-op parallelism (0 uses torch's default).
+        compile: ``torch.compile`` the encoder (the first transcription is slower, while it compiles).
+        batch_size: For audio longer than 30 s: the number of (overlapping) 30 s chunks to transcribe at once. With
+            more than 1, long audio is transcribed in batches (faster overall, but no text is available until all of
+            it has been transcribed), rather than one segment at a time.
+        stride_seconds: How much consecutive chunks overlap on each side (the overlapping text is merged).
+        num_beams: The number of beams of the beam search (0 uses the model's default, 5 for whisper). 1 decodes
+            greedily, which is faster, but can affect accuracy.
+        assistant_model_name: The Hugging Face name of a smaller model (with the same tokenizer, e.g.
+            ``openai/whisper-tiny.en`` for the ``.en`` models) for speculative (assisted) decoding: it drafts the next
+            few tokens, which the model checks in a single forward pass. This only supports greedy decoding, so
+            ``num_beams`` must be 1; the text is then the same as without it (only faster, when most drafted tokens
+            are right). Only supported with ``batch_size`` 1.
+        crop_encoder: (Experimental) For short audio, only encode the audio (plus a second or two of padding), rather
+            than the full 30 s that whisper is trained on (see ``encode_cropped``). This is much faster for a few
+            seconds of audio (audio near 30 s is encoded in full), but can affect accuracy, so compare the WER (e.g.
+            with ``benchmark/benchmark.py``). Not supported with an assistant model (which encodes the full 30 s), and
+            ``compile`` only applies to audio that is encoded in full.
+        initial_prompt: Text (e.g. a list of names and technical terms) the model is given as the text preceding the
+            audio, so it's more likely to spell those words the same way. It's tokenized once (here), and given to the
+            model as ``prompt_ids``.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool = False,
+        num_threads: int = 0,
+        num_interop_threads: int = 0,
+        compile: bool = False,
+        batch_size: int = 1,
+        stride_seconds: float = 5.0,
+        num_beams: int = 0,
+        assistant_model_name: Optional[str] = None,
+        crop_encoder: bool = False,
+        initial_prompt: Optional[str] = None,
+    ) -> None:
+        if crop_encoder and assistant_model_name:
+            raise ValueError("crop_encoder isn't supported with an assistant model")
+        if assistant_model_name and num_beams != 1:
+            raise ValueError("An assistant model only supports greedy decoding (num_beams 1)")
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.crop_encoder = crop_encoder
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        if num_interop_threads > 0 and num_interop_threads != torch.get_num_interop_threads():
+            try:
+                torch.set_num_interop_threads(num_interop_threads)
+            except RuntimeError as e:
+                # It can only be set once, before any inter-op parallel work (e.g. if another model was loaded first)
+                logger.warning(
+                    f"Can't set num_interop_threads to {num_interop_threads}, "
+                    f"using {torch.get_num_interop_threads()} ({e})"
+                )
+
+        processor = AutoProcessor.from_pretrained(model_name)  # type: ignore[no-untyped-call, unused-ignore]
+        self.tokenizer = processor.tokenizer
+        self.log_mel = LogMelSpectrogram(processor.feature_extractor)
+        self.model = self._load_model(model_name, quantize)
+        if compile:
+            # The encoder always gets 30 s of (padded) audio, so it only needs to be compiled once.
+            self.model.model.encoder.forward = torch.compile(self.model.model.encoder.forward)
+        self.assistant_model = self._load_model(assistant_model_name, quantize) if assistant_model_name else None
+        self.prompt_ids = self._prompt_ids(initial_prompt) if initial_prompt else None
+        self.pipe_kwargs: dict[str, Any] = {"batch_size": batch_size}
+        if self.prompt_ids is not None:
+            self.pipe_kwargs["generate_kwargs"] = {"prompt_ids": self.prompt_ids}
+        # (_generate uses the pipeline's generation config, so both paths decode the same way)
+        generation_kwargs: dict[str, Any] = {"num_beams": num_beams} if num_beams > 0 else {}
+        self.pipe = pipeline(
+            "automatic-speech-recognition",
+            model=self.model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            assistant_model=self.assistant_model,
+            **generation_kwargs,
+            device="cpu",
+            torch_dtype=torch.float32,
+            chunk_length_s=SEGMENT_SECONDS,  # split audio into 30 s pieces (allowing for longer audio)
+            stride_length_s=stride_seconds,  # which overlap, so words at the edges of chunks aren't lost
+            # Chunking is supported for whisper models (the warning is about seq2seq models in general)
+            ignore_warning=True,
+        )
+
+    def _load_model(self, model_name: str, quantize: bool) -> Any:
+        if quantize:
+            return load_quantized_model(model_name)
+        return AutoModelForSpeechSeq2Seq.from_pretrained(model_name, torch_dtype=torch.float32)
+
+    def _prompt_ids(self, initial_prompt: str) -> torch.Tensor:
+        # <|startofprev|>, then the prompt's tokens (only the last of which are kept if there are too many, as whisper
+        # can't attend to more than max_target_positions tokens, including the ones it generates)
+        prompt_ids = self.tokenizer.get_prompt_ids(initial_prompt, return_tensors="pt")
+        max_prompt_tokens = self.model.config.max_target_positions // 2 - 1
+        if len(prompt_ids) - 1 > max_prompt_tokens:
+            logger.warning(f"initial_prompt is too long, so only its last {max_prompt_tokens} tokens are used")
+            prompt_ids = torch.cat([prompt_ids[:1], prompt_ids[-max_prompt_tokens:]])
+        return prompt_ids  # type: ignore[no-any-return]
+
+    def transcribe(self, audio_fp: Path) -> str:
+        result = self.pipe(str(audio_fp), **self.pipe_kwargs)
+        return result["text"].strip()  # type: ignore
+
+    def transcribe_array(self, audio: np.ndarray) -> str:
+        if len(audio) <= self.log_mel.n_samples:
+            return self._generate(audio)
+        result = self.pipe({"raw": audio, "sampling_rate": MODEL_SAMPLE_RATE}, **self.pipe_kwargs)
+        return result["text"].strip()  # type: ignore
+
+    def _generate(self, audio: np.ndarray) -> str:
+        # The same as the pipeline (with the same generation config), without its generic input handling: converting
+        # the audio, computing the features of all 30 s, and merging the text of chunks.
+        input_features = self.log_mel(audio)
+        n_frames = self._cropped_frames(len(audio))
+        # Which frames are audio (rather than padding), as the pipeline passes
+        attention_mask = torch.arange(n_frames) * self.log_mel.hop_length < len(audio)
+        inputs: dict[str, Any] = {"attention_mask": attention_mask.unsqueeze(0).long()}
+        with torch.inference_mode():
+            if n_frames < self.log_mel.n_frames:
+                # generate pads input features to 30 s, so encode them here (whisper's decoder can attend to any
+                # number of encoder positions)
+                inputs["encoder_outputs"] = encode_cropped(self.model.model.encoder, input_features, n_frames)
+            else:
+                inputs["input_features"] = input_features
+            if self.assistant_model is not None:  # (whisper's generate doesn't accept assistant_model=None)
+                inputs["assistant_model"] = self.assistant_model
+            if self.prompt_ids is not None:
+                inputs["prompt_ids"] = self.prompt_ids
+            tokens = self.model.generate(**inputs, generation_config=self.pipe.generation_config)
+        return self.tokenizer.decode(tokens[0], skip_special_tokens=True).strip()  # type: ignore[no-any-return]
+
+    def _cropped_frames(self, n_samples: int) -> int:
+        """The number of frames of features to encode (``log_mel.n_frames``, i.e. 30 s, unless ``crop_encoder``)."""
+        if not self.crop_encoder:
+            return self.log_mel.n_frames
+        n_frames = -(-n_samples // self.log_mel.hop_length) + CROP_PADDING_FRAMES
+        return min(-(-n_frames // CROP_STEP_FRAMES) * CROP_STEP_FRAMES, self.log_mel.n_frames)
+
+    def transcribe_segments(self, audio: np.ndarray) -> Iterator[str]:
+        if self.batch_size > 1 and len(audio) > SEGMENT_SECONDS * MODEL_SAMPLE_RATE:
+            # Transcribe all the chunks (in batches) at once
+            yield self.transcribe_array(audio)
+        else:
+            yield from super().transcribe_segments(audio)
@@ -1,14 +1,80 @@
+import asyncio
 import configparser
+import os
+import re
 import sys
+import tempfile
 from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
 
+import evdev
 from loguru import logger
 
+from speech2caret.backends import BACKENDS
+from speech2caret.virtual_keyboard import OUTPUTS
+from speech2caret.word_replacer import WordReplacer
+
 CONFIG_DIR = Path.home() / ".config/speech2caret"
 CONFIG_FILE = CONFIG_DIR / "config.ini"
+CACHE_DIR = Path.home() / ".cache/speech2caret"
+# Without XDG_RUNTIME_DIR (which only the user can access), use a directory of the user's in the temp directory (which
+# everyone can write to), so other users can't create the socket first
+DAEMON_SOCKET_PATH = (
+    Path(os.environ["XDG_RUNTIME_DIR"])
+    if "XDG_RUNTIME_DIR" in os.environ
+    else Path(tempfile.gettempdir()) / f"speech2caret-{os.getuid()}"
+) / "speech2caret.sock"
+
+
+class ConfigError(Exception):
+    """The config is invalid."""
+
+
+def resolve_keycode(key_name: str) -> int:
+    """Get the code of a key from its name (e.g. "KEY_F11").
+
+    Raises:
+        ConfigError: If there's no key with this name.
+    """
+    keycode = evdev.ecodes.ecodes.get(key_name)
+    if not key_name.startswith(("KEY_", "BTN_")) or keycode is None:
+        raise ConfigError(f"Unknown key: {key_name} (key names look like KEY_F11, see `python -m evdev.evtest`)")
+    return keycode
 
 
 class Config:
+    """The user configuration (see ``get_config``).
+
+    Raises:
+        ConfigError: If the config is invalid.
+    """
+
+    # Settings that are only used at startup, so changing them (when the config is reloaded) needs a restart
+    RESTART_REQUIRED = (
+        "keyboard_device_path",
+        "sample_rate",
+        "channels",
+        "backend",
+        "model_name",
+        "quantize",
+        "num_threads",
+        "num_interop_threads",
+        "compile_model",
+        "batch_size",
+        "stride_seconds",
+        "num_beams",
+        "assistant_model_name",
+        "crop_encoder",
+        "initial_prompt",
+        "daemon_socket_path",
+        "output",
+        "paste_keys",
+        "cache",
+        "cache_max_size_mb",
+        "metrics_port",
+        "metrics_jsonl_path",
+    )
+
     def __init__(self, config_parser: configparser.ConfigParser):
         self.keyboard_device_path: Path = Path(config_parser["main"]["keyboard_device_path"])
         self.start_stop_key: str = config_parser["main"]["start_stop_key"]
@@ -21,23 +87,129 @@ class Config:
             to_replace.strip("'\""): replacement.strip("'\"")
             for to_replace, replacement in dict(config_parser["word_replacements"]).items()
         }
+        try:
+            self.word_replacer: WordReplacer = WordReplacer(self.word_replacements)
+        except re.error as e:
+            raise ConfigError(f"Invalid replacement in [word_replacements]: {e}") from e
+        save_audio_path = Path(config_parser.get("recording", "save_audio_path", fallback=""))
+        self.save_audio_path: Optional[Path] = None if save_audio_path == Path(".") else save_audio_path
+        self.sample_rate: int = config_parser.getint("recording", "sample_rate", fallback=16000)
+        self.channels: int = config_parser.getint("recording", "channels", fallback=1)
+        self.backend: str = config_parser.get("model", "backend", fallback="transformers")
+        self.model_name: str = config_parser.get("model", "model_name", fallback="openai/whisper-base.en")
+        self.quantize: bool = config_parser.getboolean("model", "quantize", fallback=False)
+        self.num_threads: int = config_parser.getint("model", "num_threads", fallback=0)
+        self.num_interop_threads: int = config_parser.getint("model", "num_interop_threads", fallback=0)
+        self.compile_model: bool = config_parser.getboolean("model", "compile", fallback=False)
+        self.batch_size: int = config_parser.getint("model", "batch_size", fallback=1)
+        self.stride_seconds: float = config_parser.getfloat("model", "stride_seconds", fallback=5.0)
+        self.num_beams: int = config_parser.getint("model", "num_beams", fallback=0)
+        self.assistant_model_name: str = config_parser.get("model", "assistant_model_name", fallback="")
+        self.crop_encoder: bool = config_parser.getboolean("model", "crop_encoder", fallback=False)
+        self.initial_prompt: str = config_parser.get("model", "initial_prompt", fallback="").strip()
+        daemon_socket_path = Path(config_parser.get("daemon", "socket_path", fallback=""))
+        self.daemon_socket_path: Path = DAEMON_SOCKET_PATH if daemon_socket_path == Path(".") else daemon_socket_path
+        self.chars_per_report: int = config_parser.getint("typing", "chars_per_report", fallback=8)
+        self.report_delay: float = config_parser.getfloat("typing", "report_delay", fallback=0.004)
+        self.output: str = config_parser.get("typing", "output", fallback="device")
+        self.paste_threshold: int = config_parser.getint("typing", "paste_threshold", fallback=0)
+        self.paste_keys: str = config_parser.get("typing", "paste_keys", fallback="KEY_LEFTCTRL+KEY_V")
+        self.vad: bool = config_parser.getboolean("vad", "enabled", fallback=False)
+        self.vad_threshold_db: float = config_parser.getfloat("vad", "threshold_db", fallback=-35.0)
+        self.vad_padding_seconds: float = config_parser.getfloat("vad", "padding_seconds", fallback=0.2)
+        self.vad_max_pause_seconds: float = config_parser.getfloat("vad", "max_pause_seconds", fallback=0.5)
+        self.auto_stop: bool = config_parser.getboolean("vad", "auto_stop", fallback=False)
+        self.auto_stop_silence_seconds: float = config_parser.getfloat("vad", "auto_stop_silence_seconds", fallback=1.0)
+        self.streaming: bool = config_parser.getboolean("streaming", "enabled", fallback=False)
+        self.streaming_segment_seconds: float = config_parser.getfloat("streaming", "segment_seconds", fallback=10.0)
+        self.cache: bool = config_parser.getboolean("cache", "enabled", fallback=False)
+        self.cache_max_size_mb: float = config_parser.getfloat("cache", "max_size_mb", fallback=100.0)
+        self.metrics_port: int = config_parser.getint("metrics", "port", fallback=0)
+        metrics_jsonl_path = Path(config_parser.get("metrics", "jsonl_path", fallback=""))
+        self.metrics_jsonl_path: Optional[Path] = None if metrics_jsonl_path == Path(".") else metrics_jsonl_path
 
         config_help_message = (
             "Edit the config file (see https://github.com/asmith26/speech2caret/tree/main#configuration)"
         )
 
         if self.keyboard_device_path == Path("."):
-            logger.error(f"Keyboard device not set. {config_help_message}.")
-            sys.exit(1)
+            raise ConfigError(f"Keyboard device not set. {config_help_message}.")
         if not self.keyboard_device_path.exists():
-            logger.error(f"Keyboard device does not exist: {self.keyboard_device_path}")
-            sys.exit(1)
+            raise ConfigError(f"Keyboard device does not exist: {self.keyboard_device_path}")
         if not self.start_stop_key:
-            logger.error(f"start_stop_key not set. {config_help_message}.")
-            sys.exit(1)
+            raise ConfigError(f"start_stop_key not set. {config_help_message}.")
         if not self.resume_pause_key:
-            logger.error(f"resume_pause_key not set. {config_help_message}.")
-            sys.exit(1)
+            raise ConfigError(f"resume_pause_key not set. {config_help_message}.")
+        # Resolve the key names once, so key events can be matched on their (integer) code
+        self.start_stop_keycode: int = resolve_keycode(self.start_stop_key)
+        self.resume_pause_keycode: int = resolve_keycode(self.resume_pause_key)
+        if self.sample_rate <= 0 or self.channels <= 0:
+            raise ConfigError(f"recording sample_rate and channels must be positive. {config_help_message}.")
+        if self.backend not in BACKENDS:
+            raise ConfigError(
+                f"Unknown backend: {self.backend} (choose from {', '.join(BACKENDS)}). {config_help_message}."
+            )
+        if self.num_threads < 0 or self.num_interop_threads < 0:
+            raise ConfigError(f"num_threads and num_interop_threads can't be negative. {config_help_message}.")
+        if self.batch_size < 1 or not 0 <= self.stride_seconds < 15:
+            raise ConfigError(f"batch_size must be at least 1, and stride_seconds from 0 to 15. {config_help_message}.")
+        if self.num_beams < 0:
+            raise ConfigError(f"num_beams can't be negative. {config_help_message}.")
+        if self.assistant_model_name and (self.backend != "transformers" or self.batch_size > 1 or self.num_beams != 1):
+            raise ConfigError(
+                f"assistant_model_name is only supported by the transformers backend, with batch_size 1 and "
+                f"num_beams 1 (greedy decoding). {config_help_message}."
+            )
+        if self.crop_encoder and (self.backend != "transformers" or self.assistant_model_name):
+            raise ConfigError(
+                f"crop_encoder is only supported by the transformers backend, without assistant_model_name. "
+                f"{config_help_message}."
+            )
+        if (self.quantize or self.compile_model) and self.backend != "transformers":
+            logger.warning(f"quantize and compile are only supported by the transformers backend (not {self.backend})")
+        if self.chars_per_report < 1 or self.report_delay < 0:
+            raise ConfigError(
+                f"typing chars_per_report must be at least 1, and report_delay >= 0. {config_help_message}."
+            )
+        if self.output not in OUTPUTS:
+            raise ConfigError(f"Unknown typing output: {self.output}. Choose from: {', '.join(OUTPUTS)}")
+        if self.paste_threshold < 0:
+            raise ConfigError(f"typing paste_threshold can't be negative. {config_help_message}.")
+        self.paste_keycodes: Tuple[int, ...] = tuple(resolve_keycode(key.strip()) for key in self.paste_keys.split("+"))
+        if self.vad_threshold_db >= 0 or self.vad_padding_seconds < 0 or self.vad_max_pause_seconds <= 0:
+            raise ConfigError(
+                f"vad threshold_db must be negative, padding_seconds >= 0 and max_pause_seconds positive. "
+                f"{config_help_message}."
+            )
+        if self.auto_stop_silence_seconds <= 0:
+            raise ConfigError(f"vad auto_stop_silence_seconds must be positive. {config_help_message}.")
+        if self.auto_stop and self.streaming:
+            raise ConfigError(f"vad auto_stop and streaming can't both be enabled. {config_help_message}.")
+        if self.streaming_segment_seconds <= 0:
+            raise ConfigError(f"streaming segment_seconds must be positive. {config_help_message}.")
+        if self.cache_max_size_mb <= 0:
+            raise ConfigError(f"cache max_size_mb must be positive. {config_help_message}.")
+        if not 0 <= self.metrics_port <= 65535:
+            raise ConfigError(f"metrics port must be from 0 to 65535. {config_help_message}.")
+
+    @property
+    def backend_options(self) -> dict[str, Any]:
+        """The options for the configured backend (see ``speech2caret.backends.create_backend``)."""
+        options: dict[str, Any] = {
+            "num_threads": self.num_threads,
+            "batch_size": self.batch_size,
+            "initial_prompt": self.initial_prompt or None,
+        }
+        if self.backend in ("transformers", "onnx"):
+            options["num_interop_threads"] = self.num_interop_threads
+            options["stride_seconds"] = self.stride_seconds
+        if self.backend == "transformers":
+            options["quantize"] = self.quantize
+            options["compile"] = self.compile_model
+            options["num_beams"] = self.num_beams
+            options["assistant_model_name"] = self.assistant_model_name or None
+            options["crop_encoder"] = self.crop_encoder
+        return options
 
 
 def get_config() -> Config:
@@ -71,6 +243,83 @@ def get_config() -> Config:
         config_parser["word_replacements"] = {
             "# EXAMPLE\n# 'underscore'": "'_'",
         }
+        config_parser["recording"] = {
+            "# save_audio_path (optional, save each recording as a WAV file for debugging)": "/path/to/recording.wav",
+            "# sample_rate and channels (16 kHz mono is what the model expects, so needs no conversion)": "16000",
+            "save_audio_path": "",
+            "sample_rate": "16000",
+            "channels": "1",
+        }
+        config_parser["model"] = {
+            "# backend (transformers, faster-whisper or onnx)": "faster-whisper",
+            "backend": "transformers",
+            "# quantize (optional, int8 weights for the transformers backend: faster and smaller)": "true",
+            "# num_threads / num_interop_threads (optional, 0 uses the default)": "4",
+            "# compile (optional, torch.compile the transformers backend)": "true",
+            "model_name": "openai/whisper-base.en",
+            "quantize": "false",
+            "num_threads": "0",
+            "num_interop_threads": "0",
+            "compile": "false",
+            "# batch_size (optional, transcribe long recordings this many 30 s chunks at a time)": "4",
+            "batch_size": "1",
+            "# stride_seconds (optional, how much chunks overlap, for the transformers and onnx backends)": "5",
+            "stride_seconds": "5",
+            "# num_beams (optional, for the transformers backend: 1 decodes greedily, 0 uses the model's default)": "1",
+            "num_beams": "0",
+            "# assistant_model_name (optional, a smaller model that drafts text for the transformers backend, which "
+            "needs num_beams = 1)": "openai/whisper-tiny.en",
+            "assistant_model_name": "",
+            "# crop_encoder (optional, experimental: only encode the audio of short recordings, not 30 s)": "true",
+            "crop_encoder": "false",
+            "# initial_prompt (optional, text the audio follows, e.g. names and technical terms, to spell them right)": (
+                "Glossary: speech2caret, PyTorch, Kubernetes."
+            ),
+            "initial_prompt": "",
+        }
+        config_parser["typing"] = {
+            "# chars_per_report / report_delay (seconds): if typed text gets jumbled, reduce/increase these": "8",
+            "chars_per_report": "8",
+            "report_delay": "0.004",
+            "# output (optional, type with a dedicated virtual keyboard, needs write access to /dev/uinput)": "uinput",
+            "output": "device",
+            "# paste_threshold (optional, paste text of at least this many characters, 0 never pastes)": "200",
+            "paste_threshold": "0",
+            "# paste_keys (optional, the keys pressed to paste, e.g. in terminals)": "KEY_LEFTCTRL+KEY_LEFTSHIFT+KEY_V",
+            "paste_keys": "KEY_LEFTCTRL+KEY_V",
+        }
+        config_parser["daemon"] = {
+            "# socket_path (optional, for speech2caret-daemon)": str(DAEMON_SOCKET_PATH),
+            "socket_path": "",
+        }
+        config_parser["vad"] = {
+            "# enabled (optional, remove silence before transcribing)": "true",
+            "enabled": "false",
+            "threshold_db": "-35",
+            "padding_seconds": "0.2",
+            "max_pause_seconds": "0.5",
+            "# auto_stop (optional, transcribe each utterance once you stop speaking, until recording is stopped)": "true",
+            "auto_stop": "false",
+            "auto_stop_silence_seconds": "1.0",
+        }
+        config_parser["streaming"] = {
+            "# enabled (optional, transcribe segments while still recording)": "true",
+            "enabled": "false",
+            "segment_seconds": "10",
+        }
+        config_parser["cache"] = {
+            "# enabled (optional, reuse the transcription when the same audio is transcribed again)": "true",
+            "enabled": "false",
+            "max_size_mb": "100",
+        }
+        config_parser["metrics"] = {
+            "# port (optional, serve timing histograms at http://127.0.0.1:<port>/metrics, 0 doesn't)": "9464",
+            "port": "0",
+            "# jsonl_path (optional, append the timings of each utterance to this file)": str(
+                CACHE_DIR / "timings.jsonl"
+            ),
+            "jsonl_path": "",
+        }
         with open(CONFIG_FILE, "w") as f:
             f.write(
                 "# This is the configuration file for speech2caret.\n"
@@ -78,8 +327,72 @@ def get_config() -> Config:
             )
             config_parser.write(f)
 
-    config_parser.read(CONFIG_FILE)
+    try:
+        return read_config()
+    except ConfigError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+
+def read_config(config_file: Optional[Path] = None) -> Config:
+    """Read (and validate) the config file.
+
+    Raises:
+        ConfigError: If the config file is invalid.
+    """
+    config_file = config_file or CONFIG_FILE
+    config_parser = configparser.ConfigParser()
+    try:
+        config_parser.read(config_file)
+        return Config(config_parser)
+    except (configparser.Error, KeyError, ValueError) as e:
+        raise ConfigError(f"Invalid config file {config_file}: {e!r}") from e
+
+
+class ConfigWatcher:
+    """Reload the config when the config file changes.
+
+    The file's modification time (and size) is polled, and the config is only reloaded once the file has stopped
+    changing (so a half-written file isn't read). If the changed config is invalid, the previous config is kept.
+
+    Args:
+        config_file: The config file to watch (defaults to ``CONFIG_FILE``).
+        interval: Seconds between checks.
+    """
+
+    def __init__(self, config_file: Optional[Path] = None, interval: float = 1.0) -> None:
+        self.config_file = config_file or CONFIG_FILE
+        self.interval = interval
+        self._loaded_stat = self._last_stat = self._stat()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.config_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> Optional[Config]:
+        """Return the new config if the config file has changed (and is valid), otherwise ``None``."""
+        stat = self._stat()
+        if stat != self._last_stat:
+            self._last_stat = stat  # still changing, check again next time
+            return None
+        if stat is None or stat == self._loaded_stat:
+            return None
+        self._loaded_stat = stat
+        try:
+            config = read_config(self.config_file)
+        except ConfigError as e:
+            logger.error(f"{e}. Keeping the previous config.")
+            return None
+        logger.info(f"Reloaded config from {self.config_file}")
+        return config
 
-    # Convert to Config object
-    config = Config(config_parser)
-    return config
+    async def watch(self, on_reload: Callable[[Config], None]) -> None:
+        """Call ``on_reload`` with the new config each time the config file changes (until cancelled)."""
+        while True:
+            await asyncio.sleep(self.interval)
+            config = self.check()
+            if config is not None:
+                on_reload(config)
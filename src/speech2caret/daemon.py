@@ -0,0 +1,186 @@
+"""Keep one speech-to-text model loaded, and serve transcriptions to clients over a Unix domain socket.
+
+Protocol (all integers are big-endian):
+
+- Request: the number of bytes of audio (uint32), followed by the audio as little-endian float32 mono PCM sampled
+  at ``MODEL_SAMPLE_RATE``.
+- Response: a status (uint8, 0 for success), the number of bytes of the message (uint32), followed by the message:
+  the transcribed text (UTF-8) if successful, otherwise the error.
+
+A connection can be used for any number of requests.
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import sys
+import wave
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from speech2caret.audio import MODEL_SAMPLE_RATE, load_wav, to_model_input
+from speech2caret.backends.base import Backend
+from speech2caret.config import get_config
+from speech2caret.speech_to_text import SpeechToText
+from speech2caret.transcription_cache import TranscriptionCache
+
+REQUEST_HEADER = struct.Struct("!I")
+RESPONSE_HEADER = struct.Struct("!BI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+MAX_AUDIO_BYTES = 4 * 16000 * 60 * 30  # 30 minutes of float32 audio at 16 kHz
+AUDIO_DTYPE = np.dtype("<f4")
+
+
+PEER_CREDENTIALS = struct.Struct("3i")  # struct ucred: pid, uid, gid
+
+
+def connect(socket_path: Path) -> socket.socket:
+    """Connect to the daemon listening on ``socket_path``.
+
+    Raises:
+        PermissionError: If the daemon is run by another user. Another user could otherwise create the socket first
+            (e.g. in a shared directory), receive the audio, and choose the text that's typed.
+        OSError: If the connection fails (e.g. no daemon is listening).
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+        _, uid, _ = PEER_CREDENTIALS.unpack(
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size)
+        )
+        if uid != os.getuid():
+            raise PermissionError(f"{socket_path} is served by another user (uid {uid}), so it won't be used")
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def is_running(socket_path: Path) -> bool:
+    """Check whether a daemon (run by the current user) is listening on ``socket_path``."""
+    try:
+        connect(socket_path).close()
+    except PermissionError as e:
+        logger.warning(str(e))
+        return False
+    except OSError:
+        return False
+    return True
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, message: str) -> None:
+    payload = message.encode()
+    writer.write(RESPONSE_HEADER.pack(status, len(payload)) + payload)
+    await writer.drain()
+
+
+async def _handle_client(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, stt: SpeechToText, lock: asyncio.Lock
+) -> None:
+    try:
+        while True:
+            try:
+                (n_bytes,) = REQUEST_HEADER.unpack(await reader.readexactly(REQUEST_HEADER.size))
+            except asyncio.IncompleteReadError:
+                break  # client disconnected
+            if n_bytes > MAX_AUDIO_BYTES or n_bytes % AUDIO_DTYPE.itemsize:
+                # The rest of the request can't be read reliably, so respond and close the connection.
+                await _respond(writer, STATUS_ERROR, f"Invalid audio size: {n_bytes} bytes")
+                break
+            audio = np.frombuffer(await reader.readexactly(n_bytes), dtype=AUDIO_DTYPE)
+            try:
+                # The model is shared by all clients, so only transcribe one request at a time.
+                async with lock:
+                    text = await asyncio.to_thread(stt.transcribe_array, audio)
+            except Exception as e:
+                logger.exception("Transcription failed")
+                await _respond(writer, STATUS_ERROR, str(e))
+            else:
+                await _respond(writer, STATUS_OK, text)
+    finally:
+        writer.close()
+
+
+async def serve(stt: SpeechToText, socket_path: Path) -> None:
+    """Serve transcription requests on ``socket_path`` until cancelled."""
+    if is_running(socket_path):
+        raise RuntimeError(f"A transcription daemon is already listening on {socket_path}")
+    # Only the current user can access the default directory if there's no XDG_RUNTIME_DIR (see DAEMON_SOCKET_PATH)
+    socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    socket_path.unlink(missing_ok=True)  # remove a stale socket (e.g. if a previous daemon was killed)
+    lock = asyncio.Lock()
+    # Only the current user can connect. The socket is created with these permissions (rather than changed after
+    # it's bound), so other users can't connect in between.
+    old_umask = os.umask(0o177)
+    try:
+        server = await asyncio.start_unix_server(
+            lambda reader, writer: _handle_client(reader, writer, stt, lock), path=str(socket_path)
+        )
+    finally:
+        os.umask(old_umask)
+    logger.info(f"Transcription daemon listening on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        socket_path.unlink(missing_ok=True)
+
+
+class DaemonBackend(Backend):
+    """Transcribe using the model of a running daemon (see ``serve``), instead of loading one."""
+
+    def __init__(self, socket_path: Path) -> None:
+        self.socket_path = socket_path
+
+    def transcribe(self, audio_fp: Path) -> str:
+        # The daemon only receives audio, so the file is decoded here (WAV files, e.g. recordings, without ffmpeg)
+        try:
+            data, sample_rate = load_wav(audio_fp)
+            audio = to_model_input(data, sample_rate)
+        except (wave.Error, EOFError):
+            from transformers.pipelines.audio_utils import ffmpeg_read
+
+            audio = ffmpeg_read(audio_fp.read_bytes(), MODEL_SAMPLE_RATE)
+        return self.transcribe_array(audio)
+
+    def transcribe_array(self, audio: np.ndarray) -> str:
+        payload = audio.astype(AUDIO_DTYPE, copy=False).tobytes()
+        with connect(self.socket_path) as sock:
+            sock.sendall(REQUEST_HEADER.pack(len(payload)) + payload)
+            status, n_bytes = RESPONSE_HEADER.unpack(_recv_exactly(sock, RESPONSE_HEADER.size))
+            message = _recv_exactly(sock, n_bytes).decode()
+        if status != STATUS_OK:
+            raise RuntimeError(f"Transcription daemon error: {message}")
+        return message
+
+
+def _recv_exactly(sock: socket.socket, n_bytes: int) -> bytes:
+    data = bytearray()
+    while len(data) < n_bytes:
+        chunk = sock.recv(n_bytes - len(data))
+        if not chunk:
+            raise ConnectionError("Transcription daemon closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+def main() -> None:  # pragma: no cover
+    """Keep the speech-to-text model loaded, so speech2caret (and other clients) don't each need to load it."""
+    config = get_config()
+    stt = SpeechToText(
+        config.model_name,
+        config.backend,
+        load_in_background=True,
+        warm_up=True,
+        cache=TranscriptionCache(max_size_mb=config.cache_max_size_mb) if config.cache else None,
+        **config.backend_options,
+    )
+    try:
+        asyncio.run(serve(stt, config.daemon_socket_path))
+    except KeyboardInterrupt:
+        logger.info("Successfully exited speech2caret-daemon. Goodbye!")
+        sys.exit(0)
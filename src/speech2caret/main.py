@@ -1,97 +1,246 @@
+import argparse
 import asyncio
 import sys
-import tempfile
+import time
 from pathlib import Path
+from typing import Any, Coroutine, Optional, TypeVar
 
+import numpy as np
 from loguru import logger
 
-from speech2caret import utils
-from speech2caret.config import Config, get_config
+from speech2caret import daemon, utils
+from speech2caret.audio import SilenceDetector
+from speech2caret.config import CACHE_DIR, Config, ConfigWatcher, get_config
+from speech2caret.metrics import Metrics
+from speech2caret.profiling import Profiler
 from speech2caret.recorder import Recorder
+from speech2caret.sound_cues import SoundCues
 from speech2caret.speech_to_text import SpeechToText
+from speech2caret.streaming import StreamingTranscriber
+from speech2caret.transcription_cache import TranscriptionCache
 from speech2caret.virtual_keyboard import VirtualKeyboard
 
+T = TypeVar("T")
 
-async def listen_keyboard_events(config: Config) -> None:  # pragma: no cover
+
+async def listen_keyboard_events(config: Config, profiler: Optional[Profiler] = None) -> None:  # pragma: no cover
     import evdev
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        tmp_audio_fp = Path(temp_dir) / "speech2caret.wav"
-        recorder = Recorder(tmp_audio_fp)
-        stt: SpeechToText = SpeechToText()
-        vkeyboard = VirtualKeyboard(config.keyboard_device_path)
-
-        logger.info(f"Listening on {config.keyboard_device_path}")
-        logger.info(f"Start/Stop: {config.start_stop_key}")
-        logger.info(f"Resume/Pause: {config.resume_pause_key}")
-        logger.info(f"Start Recording audio path: {config.start_recording_audio_path}")
-        logger.info(f"Stop Recording audio path: {config.stop_recording_audio_path}")
-        logger.info(f"Resume Recording audio path: {config.resume_recording_audio_path}")
-        logger.info(f"Pause Recording audio path: {config.pause_recording_audio_path}")
-        logger.info(f"Word replacements: {config.word_replacements}")
-        logger.info(f"Temporary audio file: {tmp_audio_fp}\n")
-
-        # This variable will hold the asyncio.Task for the transcription process.
-        # It's used to check if a transcription is in progress and to cancel it if needed.
-        transcribe_and_type_task = None
-
-        try:
-            async for event in vkeyboard.device.async_read_loop():
-                # We only need to process key_down events
-                if event.type == evdev.ecodes.EV_KEY:  # if input event is a keyboard key event
-                    key_event: evdev.KeyEvent = evdev.categorize(event)  # type: ignore
-                    if key_event.keystate == evdev.events.KeyEvent.key_down:
-                        # === Start/Stop Recording ===
-                        if key_event.keycode == config.start_stop_key:
-                            if not recorder.is_recording and not recorder.is_paused:
-                                # If there's an ongoing transcription task from a previous recording,
-                                # cancel it (allows interrupting long transcriptions)
-                                if transcribe_and_type_task and not transcribe_and_type_task.done():
-                                    logger.info("Interrupting transcription...")
-                                    transcribe_and_type_task.cancel()
-
-                                logger.info("\n=== Start recording ===")
-                                utils.play_audio(config.start_recording_audio_path)
-                                # Start the recording in a new asyncio task so it doesn't block the event loop.
-                                asyncio.create_task(recorder.start_recording())
-
-                            else:
-                                logger.info("Stopping recording...")
-                                utils.play_audio(config.stop_recording_audio_path)
+    recorder = Recorder(config.save_audio_path, config.sample_rate, config.channels)
+    stt: SpeechToText
+    if daemon.is_running(config.daemon_socket_path):
+        # Use the daemon's (already loaded) model
+        logger.info(f"Using the transcription daemon at {config.daemon_socket_path}")
+        stt = SpeechToText(config.model_name, daemon.DaemonBackend(config.daemon_socket_path))
+    else:
+        # Load the model in the background, so key presses (and recording) work immediately.
+        stt = SpeechToText(
+            config.model_name,
+            config.backend,
+            load_in_background=True,
+            warm_up=True,
+            cache=TranscriptionCache(max_size_mb=config.cache_max_size_mb) if config.cache else None,
+            **config.backend_options,
+        )
+    # Decode the sounds now, so playing them doesn't delay anything
+    sound_cues = SoundCues.from_config(config)
+    vkeyboard = VirtualKeyboard(
+        config.keyboard_device_path,
+        config.chars_per_report,
+        config.report_delay,
+        config.output,
+        config.paste_threshold,
+        config.paste_keycodes,
+    )
+
+    logger.info(f"Listening on {config.keyboard_device_path}")
+    logger.info(f"Start/Stop: {config.start_stop_key}")
+    logger.info(f"Resume/Pause: {config.resume_pause_key}")
+    logger.info(f"Start Recording audio path: {config.start_recording_audio_path}")
+    logger.info(f"Stop Recording audio path: {config.stop_recording_audio_path}")
+    logger.info(f"Resume Recording audio path: {config.resume_recording_audio_path}")
+    logger.info(f"Pause Recording audio path: {config.pause_recording_audio_path}")
+    logger.info(f"Word replacements: {config.word_replacements}")
+    logger.info(f"Model: {config.model_name} ({config.backend} backend, {config.backend_options})")
+    logger.info(f"Recording format: {config.sample_rate} Hz, {config.channels} channel(s)")
+    logger.info(
+        f"Typing output: {config.output} (paste threshold: {config.paste_threshold}, keys: {config.paste_keys})"
+    )
+    logger.info(f"Streaming: {config.streaming}")
+    logger.info(f"Auto-stop: {config.auto_stop} (after {config.auto_stop_silence_seconds}s of silence)")
+    logger.info(f"Transcription cache: {config.cache} (up to {config.cache_max_size_mb} MB)")
+    logger.info(f"Metrics: port {config.metrics_port or 'disabled'}, JSONL {config.metrics_jsonl_path or 'disabled'}")
+    logger.info(f"Save audio path: {config.save_audio_path}\n")
+
+    def reload_config(new_config: Config) -> None:
+        # Swap the whole config at once (this runs in the event loop, so never part way through handling a key press).
+        nonlocal config, sound_cues
+        changed = [name for name in Config.RESTART_REQUIRED if getattr(new_config, name) != getattr(config, name)]
+        if changed:
+            logger.warning(f"Restart speech2caret to apply the changes to: {', '.join(changed)}")
+        config = new_config
+        # Only decode the sounds again if they changed
+        if SoundCues.paths_from_config(config) != sound_cues.paths:
+            sound_cues.close()
+            sound_cues = SoundCues.from_config(config)
+        recorder.audio_fp = config.save_audio_path
+        vkeyboard.chars_per_report = config.chars_per_report
+        vkeyboard.report_delay = config.report_delay
+        vkeyboard.paste_threshold = config.paste_threshold
+
+    # Reload the config when the config file is edited
+    config_watcher_task = asyncio.create_task(ConfigWatcher().watch(reload_config))
+    # Timings of each stage of each utterance (logged, and aggregated as histograms)
+    metrics = Metrics(config.metrics_jsonl_path)
+    metrics_task = asyncio.create_task(metrics.serve(config.metrics_port)) if config.metrics_port else None
+
+    def profiled(coroutine: Coroutine[Any, Any, T], name: str) -> Coroutine[Any, Any, T]:
+        # Only wrap the task when profiling (with --profile), so there's no overhead otherwise
+        return profiler.run(coroutine, name) if profiler is not None else coroutine
+
+    # This variable will hold the asyncio.Task for the transcription process.
+    # It's used to check if a transcription is in progress and to cancel it if needed.
+    transcribe_and_type_task = None
+    # In streaming mode, segments are transcribed by this task while recording continues.
+    streamer = None
+    streaming_task = None
+    # In auto-stop mode, each utterance (ended by silence) is put on this queue, to be transcribed and typed.
+    utterances: Optional[asyncio.Queue[Optional[np.ndarray]]] = None
+
+    def end_utterance() -> None:
+        if utterances is not None and recorder.is_recording:
+            logger.info("=== End of utterance ===")
+            utterances.put_nowait(recorder.split_recording())
+
+    try:
+        async for event in vkeyboard.device.async_read_loop():
+            # We only need to process key_down events. This runs for every key pressed (and released), so check the
+            # raw event (rather than e.g. evdev.categorize, which creates a KeyEvent for every event).
+            if event.type == evdev.ecodes.EV_KEY and event.value == evdev.KeyEvent.key_down:
+                # === Start/Stop Recording ===
+                if event.code == config.start_stop_keycode:
+                    if not recorder.is_recording and not recorder.is_paused:
+                        # If there's an ongoing transcription task from a previous recording,
+                        # cancel it (allows interrupting long transcriptions)
+                        if transcribe_and_type_task and not transcribe_and_type_task.done():
+                            logger.info("Interrupting transcription...")
+                            transcribe_and_type_task.cancel()
+
+                        logger.info("\n=== Start recording ===")
+                        sound_cues.play("start")
+                        if config.streaming:
+                            streamer = StreamingTranscriber(stt, recorder.sample_rate, config.streaming_segment_seconds)
+                            recorder.chunk_queue = streamer.queue
+                            streaming_task = asyncio.create_task(streamer.run())
+                        elif config.auto_stop:
+                            utterances = asyncio.Queue()
+                            recorder.silence_detector = SilenceDetector(
+                                recorder.sample_rate, config.auto_stop_silence_seconds
+                            )
+                            recorder.on_silence = end_utterance
+                            # Each utterance is profiled separately (the task lasts until recording stops)
+                            transcribe_and_type_task = asyncio.create_task(
+                                utils.transcribe_utterances_and_type(
+                                    utterances, stt, vkeyboard, config, metrics, profiler
+                                )
+                            )
+                        # Start the recording in a new asyncio task so it doesn't block the event loop.
+                        asyncio.create_task(recorder.start_recording())
+
+                    else:
+                        logger.info("Stopping recording...")
+                        if utterances is not None:
+                            # Each utterance is timed as it's transcribed (see utils.transcribe_utterances_and_type)
+                            sound_cues.play("stop")
+                            recorder.stop_recording()
+                            if recorder.audio_fp is not None:
                                 recorder.save_recording()
-                                # utils.play_sound(recorder.audio_fp)  # Play recording
-                                # Start the transcribe_and_type in a new asyncio task so it doesn't block the event loop.
-                                transcribe_and_type_task = asyncio.create_task(
-                                    utils.transcribe_and_type(recorder, stt, vkeyboard, config)
+                            # Transcribe what's left, unless it's just the silence after the last utterance.
+                            if recorder.silence_detector is not None and recorder.silence_detector.has_speech:
+                                utterances.put_nowait(recorder.get_audio())
+                            utterances.put_nowait(None)
+                            recorder.silence_detector = recorder.on_silence = None
+                            utterances = None
+                            continue
+
+                        # Time the utterance from the key press
+                        timer = metrics.utterance("streaming" if streamer else "recording", event.timestamp())
+                        timer.add("key_press", time.time() - event.timestamp())
+                        with timer.span("capture_stop"):
+                            sound_cues.play("stop")
+                            recorder.stop_recording()
+                        if recorder.audio_fp is not None:
+                            with timer.span("finalize"):
+                                recorder.save_recording()
+                        if streamer is not None and streaming_task is not None:
+                            recorder.chunk_queue = None
+                            # Only the last (partial) segment is left to transcribe.
+                            transcribe_and_type_task = asyncio.create_task(
+                                profiled(
+                                    utils.finish_streaming_and_type(streamer, streaming_task, vkeyboard, config, timer),
+                                    "streaming",
                                 )
-
-                        # === Resume/Pause Recording ===
-                        elif key_event.keycode == config.resume_pause_key:
-                            if not recorder.is_recording and recorder.is_paused:
-                                logger.info("Resuming recording...")
-                                utils.play_audio(config.resume_recording_audio_path)
-                                asyncio.create_task(recorder.start_recording(is_resume=True))
-
-                            elif recorder.is_recording and not recorder.is_paused:
-                                logger.info("Pausing recording...")
-                                utils.play_audio(config.pause_recording_audio_path)
-                                recorder.pause_recording()
-
-                            elif not recorder.is_recording and not recorder.is_paused:
-                                logger.warning("You must start recording before resume/pause")
-
-        except Exception:
-            logger.exception("An unexpected error occurred in the event loop.")
-
-
-def main() -> None:  # pragma: no cover
+                            )
+                            streamer = streaming_task = None
+                        else:
+                            # Start the transcribe_and_type in a new asyncio task so it doesn't block the event loop.
+                            transcribe_and_type_task = asyncio.create_task(
+                                profiled(
+                                    utils.transcribe_and_type(recorder, stt, vkeyboard, config, timer), "recording"
+                                )
+                            )
+
+                # === Resume/Pause Recording ===
+                elif event.code == config.resume_pause_keycode:
+                    if not recorder.is_recording and recorder.is_paused:
+                        logger.info("Resuming recording...")
+                        sound_cues.play("resume")
+                        asyncio.create_task(recorder.start_recording(is_resume=True))
+
+                    elif recorder.is_recording and not recorder.is_paused:
+                        logger.info("Pausing recording...")
+                        sound_cues.play("pause")
+                        recorder.pause_recording()
+
+                    elif not recorder.is_recording and not recorder.is_paused:
+                        logger.warning("You must start recording before resume/pause")
+
+    except Exception:
+        logger.exception("An unexpected error occurred in the event loop.")
+    finally:
+        config_watcher_task.cancel()
+        if metrics_task is not None:
+            metrics_task.cancel()
+        sound_cues.close()
+        vkeyboard.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:  # pragma: no cover
     """Use your speech to write the current caret position!"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile transcribing and typing each utterance (with cProfile and torch.profiler)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        default=CACHE_DIR / "profiles",
+        help="where to save the profiles (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile-keep", type=int, default=20, help="the number of profiles to keep (default: %(default)s)"
+    )
+    args = parser.parse_args(argv)
+
     # Get/validate config
     config = get_config()
+    profiler = Profiler(args.profile_dir, args.profile_keep) if args.profile else None
 
     # Start listening for keyboard events
     try:
-        asyncio.run(listen_keyboard_events(config))
+        asyncio.run(listen_keyboard_events(config, profiler))
     except KeyboardInterrupt:
         logger.info("Successfully exited speech2caret. Goodbye!")
         sys.exit(0)
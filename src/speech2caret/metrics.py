@@ -0,0 +1,218 @@
+"""Time each stage of transcribing an utterance, and aggregate the timings as histograms.
+
+The histograms can be served in the Prometheus text format (see ``Metrics.serve``), and the timings of each utterance
+appended to a JSONL file.
+"""
+
+import asyncio
+import bisect
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from loguru import logger
+
+# The stages of an utterance, in order
+STAGES = (
+    "key_press",  # from the key press (the kernel's timestamp) until it's handled
+    "capture_stop",  # stopping the recording
+    "finalize",  # saving the recording (if enabled), and getting the audio
+    "vad",  # removing silence (if enabled)
+    "model_load",  # waiting for the model to finish loading (in the background), e.g. for the first utterance
+    "inference",  # transcribing
+    "replace_words",
+    "typing",
+    "total",  # from the key press (or the end of the utterance, in auto-stop mode) until the text is typed
+)
+# How an utterance ended
+OUTCOMES = (
+    "typed",
+    "no_text",  # transcribed, but there was no text to type
+    "no_speech",  # all silence (removed by VAD), so not transcribed
+    "cancelled",  # e.g. interrupted by a new recording
+    "error",
+)
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+AUDIO_SECONDS_BUCKETS = (1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+REAL_TIME_FACTOR_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+
+class Histogram:
+    """Count observations in buckets (cumulatively, as Prometheus histograms do), with their count and sum."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)  # not cumulative (see cumulative_counts)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> list[int]:
+        """The number of observations <= each bucket (the +Inf bucket is ``count``)."""
+        counts, total = [], 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            counts.append(total)
+        return counts
+
+    def prometheus_lines(self, name: str, labels: str = "") -> list[str]:
+        separator = "," if labels else ""
+        les = [f"{bucket:g}" for bucket in self.buckets] + ["+Inf"]
+        counts = self.cumulative_counts() + [self.count]
+        lines = [f'{name}_bucket{{{labels}{separator}le="{le}"}} {count}' for le, count in zip(les, counts)]
+        braces = f"{{{labels}}}" if labels else ""
+        return lines + [f"{name}_sum{braces} {self.sum:g}", f"{name}_count{braces} {self.count}"]
+
+
+class UtteranceTimer:
+    """Time the stages (see ``STAGES``) of transcribing and typing one utterance.
+
+    A stage can be timed more than once (e.g. ``inference`` for each segment): the times are added up.
+
+    Args:
+        metrics: Where the timings are recorded when the utterance is finished (see ``finish``).
+        mode: How the utterance was recorded (e.g. "auto_stop"), for the JSONL file.
+        started_at: When the utterance started (a ``time.time()``, e.g. from the key event), for the ``total`` stage.
+            Defaults to now.
+    """
+
+    def __init__(self, metrics: Optional["Metrics"] = None, mode: str = "", started_at: Optional[float] = None) -> None:
+        self.metrics = metrics
+        self.mode = mode
+        self.started_at = time.time() if started_at is None else started_at
+        self.stages: dict[str, float] = {}
+        self.audio_seconds: Optional[float] = None
+        self.outcome: Optional[str] = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the code in this context as (part of) ``stage``."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start_time)
+
+    @property
+    def real_time_factor(self) -> Optional[float]:
+        """The time spent transcribing, relative to the duration of the audio (below 1 is faster than real time)."""
+        if not self.audio_seconds or "inference" not in self.stages:
+            return None
+        return self.stages["inference"] / self.audio_seconds
+
+    def finish(self, outcome: str = "typed") -> None:
+        """Stop timing, log the timings and record them (in ``metrics``).
+
+        Args:
+            outcome: How the utterance ended (see ``OUTCOMES``).
+        """
+        self.outcome = outcome
+        self.stages["total"] = time.time() - self.started_at
+        timings = ", ".join(f"{stage} {self.stages[stage] * 1000:.0f} ms" for stage in STAGES if stage in self.stages)
+        rtf = f" (real-time factor {self.real_time_factor:.2f})" if self.real_time_factor is not None else ""
+        logger.info(f"Timings ({outcome}): {timings}{rtf}")
+        if self.metrics is not None:
+            self.metrics.record(self)
+
+
+class Metrics:
+    """Aggregate the timings of utterances (see ``UtteranceTimer``) as histograms.
+
+    Args:
+        jsonl_path: If set, the timings of each utterance are also appended (as a line of JSON) to this file.
+    """
+
+    def __init__(self, jsonl_path: Optional[Path] = None) -> None:
+        self.jsonl_path = jsonl_path
+        self.stage_seconds = {stage: Histogram(SECONDS_BUCKETS) for stage in STAGES}
+        self.audio_seconds = Histogram(AUDIO_SECONDS_BUCKETS)
+        self.real_time_factor = Histogram(REAL_TIME_FACTOR_BUCKETS)
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+
+    def utterance(self, mode: str = "", started_at: Optional[float] = None) -> UtteranceTimer:
+        """Start timing an utterance (recorded here when it's finished)."""
+        return UtteranceTimer(self, mode, started_at)
+
+    def record(self, timer: UtteranceTimer) -> None:
+        if timer.outcome is not None:
+            self.outcomes[timer.outcome] = self.outcomes.get(timer.outcome, 0) + 1
+        for stage, seconds in timer.stages.items():
+            self.stage_seconds.setdefault(stage, Histogram(SECONDS_BUCKETS)).observe(seconds)
+        if timer.audio_seconds is not None:
+            self.audio_seconds.observe(timer.audio_seconds)
+        if timer.real_time_factor is not None:
+            self.real_time_factor.observe(timer.real_time_factor)
+        if self.jsonl_path is not None:
+            record = {
+                "timestamp": timer.started_at,
+                "mode": timer.mode,
+                "outcome": timer.outcome,
+                "stages": timer.stages,
+                "audio_seconds": timer.audio_seconds,
+                "real_time_factor": timer.real_time_factor,
+            }
+            try:
+                with open(self.jsonl_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError:
+                logger.exception(f"Failed to write metrics to {self.jsonl_path}")
+
+    def prometheus_text(self) -> str:
+        """The histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP speech2caret_stage_seconds Time spent in each stage of transcribing and typing an utterance.",
+            "# TYPE speech2caret_stage_seconds histogram",
+        ]
+        for stage, histogram in self.stage_seconds.items():
+            lines += histogram.prometheus_lines("speech2caret_stage_seconds", f'stage="{stage}"')
+        lines += [
+            "# HELP speech2caret_audio_seconds Duration of the transcribed audio.",
+            "# TYPE speech2caret_audio_seconds histogram",
+            *self.audio_seconds.prometheus_lines("speech2caret_audio_seconds"),
+            "# HELP speech2caret_real_time_factor Transcription time relative to the duration of the audio.",
+            "# TYPE speech2caret_real_time_factor histogram",
+            *self.real_time_factor.prometheus_lines("speech2caret_real_time_factor"),
+            "# HELP speech2caret_utterances_total Number of utterances, by how they ended.",
+            "# TYPE speech2caret_utterances_total counter",
+            *(f'speech2caret_utterances_total{{outcome="{outcome}"}} {n}' for outcome, n in self.outcomes.items()),
+        ]
+        return "\n".join(lines) + "\n"
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # Ignore the request headers
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode(errors="replace").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/metrics":
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4", self.prometheus_text()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", "Not found (see /metrics)\n"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Serve the histograms (see ``prometheus_text``) at ``http://host:port/metrics`` until cancelled."""
+        server = await asyncio.start_server(self._handle_request, host, port)
+        logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,78 @@
+import cProfile
+import pstats
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Iterator, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class Profiler:
+    """Profile transcribing and typing each utterance, with both ``cProfile`` and ``torch.profiler``.
+
+    Each profile is saved in its own directory (in ``directory``), containing:
+
+    - ``profile.pstats``: the ``cProfile`` stats (e.g. ``python -m pstats profile.pstats``, or snakeviz).
+    - ``profile.txt``: the functions the most time was spent in (including the functions they called).
+    - ``trace.json``: the ``torch.profiler`` trace (open it in https://ui.perfetto.dev or chrome://tracing), showing
+      e.g. the feature extraction, encoder and decoder steps.
+
+    Both profilers record every thread (transcription and typing run in worker threads), so only one utterance is
+    profiled at a time.
+
+    Args:
+        directory: Where to save the profiles.
+        keep: The number of profiles to keep (older ones are deleted).
+    """
+
+    def __init__(self, directory: Path, keep: int = 20) -> None:
+        self.directory = directory
+        self.keep = keep
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Profile the code in this context, saving the profile in a directory named after the time and ``name``."""
+        import torch.profiler
+
+        cprofile = cProfile.Profile()
+        try:
+            cprofile.enable()
+        except ValueError:  # e.g. the previous utterance is still being profiled
+            logger.warning(f"Not profiling {name}: another profiler is already running")
+            yield
+            return
+        torch_profiler = torch.profiler.profile(
+            activities=[torch.profiler.ProfilerActivity.CPU],
+            with_stack=True,
+            experimental_config=torch._C._profiler._ExperimentalConfig(profile_all_threads=True),
+        )
+        torch_profiler.start()
+        try:
+            yield
+        finally:
+            torch_profiler.stop()
+            cprofile.disable()
+            profile_dir = self.directory / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}"
+            profile_dir.mkdir()
+            cprofile.dump_stats(profile_dir / "profile.pstats")
+            with open(profile_dir / "profile.txt", "w") as f:
+                pstats.Stats(cprofile, stream=f).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(50)
+            torch_profiler.export_chrome_trace(str(profile_dir / "trace.json"))
+            logger.info(f"Saved profile: {profile_dir}")
+            self._rotate()
+
+    async def run(self, awaitable: Awaitable[T], name: str) -> T:
+        """Await ``awaitable`` (e.g. ``utils.transcribe_and_type(...)``) while profiling it."""
+        with self.profile(name):
+            return await awaitable
+
+    def _rotate(self) -> None:
+        # The directory names start with the time, so sort oldest first
+        profile_dirs = sorted(path for path in self.directory.iterdir() if path.is_dir())
+        for profile_dir in profile_dirs[: max(len(profile_dirs) - self.keep, 0)]:
+            shutil.rmtree(profile_dir, ignore_errors=True)
@@ -1,45 +1,85 @@
 import asyncio
+import threading
 import wave
 from pathlib import Path
-from typing import List
+from typing import Callable, Optional
 
 import numpy as np
 import sounddevice
 from _sounddevice import ffi
 from loguru import logger
 
+from speech2caret import audio
+from speech2caret.audio import MODEL_SAMPLE_RATE
+
 
 class Recorder:
-    def __init__(self, audio_fp: Path):
+    def __init__(
+        self,
+        audio_fp: Optional[Path] = None,
+        sample_rate: int = MODEL_SAMPLE_RATE,
+        channels: int = 1,
+        audio_format: str = "float32",
+    ):
+        # Only needed to save recordings to disk (see save_recording); transcription uses get_audio.
         self.audio_fp = audio_fp
-        self.channels = 2  # stereo
-        self.sampwidth = 2  # 2 bytes (16-bit audio)
-        self.sample_rate = 44100
-        self.audio_format = "int16"
-        self.audio_data: List[np.ndarray] = []
+        # By default, record in the format the model expects (16 kHz mono), so no conversion is needed.
+        self.channels = channels
+        self.sampwidth = 2  # 2 bytes (16-bit audio) when saving to a WAV file
+        self.sample_rate = sample_rate
+        self.audio_format = audio_format
+        self.initial_buffer_seconds = 60
+        self.buffer = self._new_buffer()
+        # The buffer is written to in the PortAudio thread (see _callback), and replaced in the event loop (see
+        # split_recording), so both hold this lock (briefly)
+        self._buffer_lock = threading.Lock()
         self.is_recording = False
         self.is_paused = False
+        # When set (e.g. by a StreamingTranscriber), each recorded block is also put on this queue
+        self.chunk_queue: Optional[asyncio.Queue[Optional[np.ndarray]]] = None
+        # When set (e.g. in auto-stop mode), each recorded block is passed to this detector, and on_silence is called
+        # (in the event loop) when speech ends
+        self.silence_detector: Optional[audio.SilenceDetector] = None
+        self.on_silence: Optional[Callable[[], None]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         # Use an asyncio.Event to signal when recording should stop
         self._stop_event = asyncio.Event()
 
+    def _new_buffer(self) -> audio.AudioBuffer:
+        return audio.AudioBuffer(self.channels, self.audio_format, self.initial_buffer_seconds * self.sample_rate)
+
     def delete_audio_file(self) -> None:
+        if self.audio_fp is None:
+            return
         logger.info(f"Deleting audio file: {self.audio_fp}")
         self.audio_fp.unlink(missing_ok=True)
 
     def _callback(self, indata: np.ndarray, frames: int, time: ffi.CData, status: sounddevice.CallbackFlags) -> None:
         if status:
             logger.debug(status)
-        self.audio_data.append(indata.copy())
+        with self._buffer_lock:
+            block = self.buffer.write(indata)
+        if self.chunk_queue is not None and self._loop is not None:
+            # The callback runs in the PortAudio thread, so hand the block to the event loop thread-safely.
+            self._loop.call_soon_threadsafe(self.chunk_queue.put_nowait, block)
+        if self.silence_detector is not None and self.silence_detector.process(block):
+            if self.on_silence is not None and self._loop is not None:
+                self._loop.call_soon_threadsafe(self.on_silence)
 
     async def start_recording(self, is_resume: bool = False) -> None:
         self.is_recording = True
         self.is_paused = False
         # Clear the stop event flag, allowing the recording loop to run.
         self._stop_event.clear()
+        self._loop = asyncio.get_running_loop()
 
-        # If we're starting a new recording, clear the old audio data.
+        # If we're starting a new recording, start a new buffer. The old one isn't reused, as the previous
+        # recording may still be being transcribed.
         if not is_resume:
-            self.audio_data = []
+            self.buffer = self._new_buffer()
+        elif self.silence_detector is not None:
+            # Don't count the silence before the pause towards the silence after it
+            self.silence_detector.reset()
 
         with sounddevice.InputStream(
             samplerate=self.sample_rate, channels=self.channels, dtype=self.audio_format, callback=self._callback
@@ -53,14 +93,35 @@ class Recorder:
         # Signal the event to stop the recording loop.
         self._stop_event.set()
 
-    def save_recording(self) -> None:
+    def stop_recording(self) -> None:
         self.is_recording = False
         self.is_paused = False
         # Signal the event to stop the recording loop.
         self._stop_event.set()
 
-        # Convert the list to a numpy array
-        audio_data = np.concatenate(self.audio_data, axis=0)
+    def get_audio(self) -> np.ndarray:
+        """Get the recorded audio, ready to be passed to ``SpeechToText.transcribe_array``.
+
+        When recording at 16 kHz mono float32 (the default), this is a view of the buffer, so no copy is made.
+        """
+        return audio.to_model_input(self.buffer.get(), self.sample_rate)
+
+    def split_recording(self) -> np.ndarray:
+        """Get the audio recorded so far (like ``get_audio``), and carry on recording into a new buffer."""
+        new_buffer = self._new_buffer()
+        with self._buffer_lock:
+            buffer, self.buffer = self.buffer, new_buffer
+        return audio.to_model_input(buffer.get(), self.sample_rate)
+
+    def save_recording(self) -> None:
+        """Stop recording and save it as a WAV file to ``audio_fp`` (useful for debugging/archiving)."""
+        if self.audio_fp is None:
+            raise ValueError("Recorder has no audio_fp to save the recording to")
+        self.stop_recording()
+
+        audio_data = self.buffer.get()
+        if np.issubdtype(audio_data.dtype, np.floating):
+            audio_data = (np.clip(audio_data, -1, 1) * np.iinfo(np.int16).max).astype(np.int16)
 
         # Save the recorded data as a WAV file
         with wave.open(str(self.audio_fp), "wb") as wf:
@@ -0,0 +1,85 @@
+import shutil
+import subprocess  # nosec
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import sounddevice
+from loguru import logger
+
+from speech2caret.audio import load_wav
+from speech2caret.config import Config
+
+
+class SoundCues:
+    """Play the sounds that signal recording has started, stopped, resumed or paused, without blocking.
+
+    WAV files are decoded once (here), and played with ``sounddevice``. Other files (e.g. MP3) are played with
+    ``paplay``, without waiting for it to finish (a thread of its own waits for it, so it doesn't linger as a zombie
+    process). Either way, the sound is started in a worker thread, so ``play`` returns immediately (and never delays
+    e.g. ``Recorder.start_recording``).
+
+    Args:
+        start: The sound played when recording starts (sounds that don't exist aren't played).
+        stop: The sound played when recording stops.
+        resume: The sound played when recording resumes.
+        pause: The sound played when recording pauses.
+    """
+
+    NAMES = ("start", "stop", "resume", "pause")
+
+    def __init__(self, start: Path, stop: Path, resume: Path, pause: Path) -> None:
+        self.paths = (start, stop, resume, pause)
+        self._paplay = shutil.which("paplay")
+        self._cues = {name: self._load(audio_fp) for name, audio_fp in zip(self.NAMES, self.paths)}
+        # A single thread, so sounds are played in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speech2caret-sound-cues")
+
+    @staticmethod
+    def paths_from_config(config: Config) -> Tuple[Path, Path, Path, Path]:
+        """The paths of the sounds (in the order of ``NAMES``), e.g. to check whether they changed."""
+        return (
+            config.start_recording_audio_path,
+            config.stop_recording_audio_path,
+            config.resume_recording_audio_path,
+            config.pause_recording_audio_path,
+        )
+
+    @classmethod
+    def from_config(cls, config: Config) -> "SoundCues":
+        return cls(*cls.paths_from_config(config))
+
+    def close(self) -> None:
+        """Stop the worker thread, once it has started playing any sounds waiting to be played."""
+        self._executor.shutdown(wait=False)
+
+    def _load(self, audio_fp: Path) -> Optional[Union[Tuple[np.ndarray, int], Path]]:
+        if not audio_fp.is_file():
+            return None
+        try:
+            return load_wav(audio_fp)
+        except (wave.Error, EOFError):
+            if self._paplay is None:
+                logger.warning(f"Can't play {audio_fp}: only WAV files are supported without paplay")
+                return None
+            return audio_fp
+
+    def _play(self, cue: Union[Tuple[np.ndarray, int], Path]) -> None:
+        try:
+            if isinstance(cue, Path):
+                process = subprocess.Popen([str(self._paplay), cue])  # nosec
+                # Reap it once it exits, without delaying the next sound
+                threading.Thread(target=process.wait, name="speech2caret-paplay", daemon=True).start()
+            else:
+                sounddevice.play(*cue)
+        except Exception:
+            logger.exception("Failed to play sound")
+
+    def play(self, name: str) -> None:
+        """Start playing a sound (one of ``NAMES``), and return immediately."""
+        cue = self._cues[name]
+        if cue is not None:
+            self._executor.submit(self._play, cue)
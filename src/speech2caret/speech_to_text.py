@@ -1,21 +1,151 @@
+import threading
+import time
 from pathlib import Path
+from typing import Any, Iterator, Optional, Union
 
-import torch
-from transformers import pipeline
+import numpy as np
+from loguru import logger
+
+from speech2caret.audio import MODEL_SAMPLE_RATE
+from speech2caret.backends import create_backend
+from speech2caret.backends.base import Backend
+from speech2caret.transcription_cache import (
+    CachedTranscription,
+    TranscriptionCache,
+    fingerprint,
+)
 
 
 class SpeechToText:
-    def __init__(self, model_name: str = "openai/whisper-base.en") -> None:
-        self.pipe = pipeline(
-            "automatic-speech-recognition",
-            model=model_name,
-            # assistant_model="openai/whisper-tiny.en",
-            device="cpu",
-            torch_dtype=torch.float32,
-            chunk_length_s=30,  # split audio into 30 s pieces (allowing for longer audio)
-            ignore_warning=True,  # ignore warnings about chunk length todo explore this further
-        )
-
-    def transcribe(self, audio_fp: Path) -> str:
-        result = self.pipe(str(audio_fp), batch_size=1)
-        return result["text"].strip()  # type: ignore
+    """Transcribe speech with a whisper model.
+
+    The heavy dependencies (e.g. torch, transformers) are only imported when the model is loaded.
+
+    Args:
+        model_name: The Hugging Face name of the model.
+        backend: The backend to run the model with (see ``speech2caret.backends.BACKENDS``), or an already
+            created backend (e.g. a ``speech2caret.daemon.DaemonBackend``).
+        load_in_background: Load the model in a background thread, so this returns immediately. Transcribing
+            waits until the model has loaded.
+        warm_up: Run one dummy transcription after loading, so the first real one isn't slower.
+        cache: Cache transcriptions, so transcribing the same audio (with the same model and options) again returns
+            the cached text. Each method can bypass the cache with ``use_cache=False``.
+        **options: Options for the backend (see ``speech2caret.backends.create_backend``).
+    """
+
+    def __init__(
+        self,
+        model_name: str = "openai/whisper-base.en",
+        backend: Union[str, Backend] = "transformers",
+        load_in_background: bool = False,
+        warm_up: bool = False,
+        cache: Optional[TranscriptionCache] = None,
+        **options: Any,
+    ) -> None:
+        self.model_name = model_name
+        self._options = options
+        self.cache = cache
+        # Everything (other than the audio) that affects the transcription
+        backend_name = backend if isinstance(backend, str) else type(backend).__name__
+        self._cache_params = {"model_name": model_name, "backend": backend_name, **options}
+        self._warm_up = warm_up
+        self._backend: Optional[Backend] = None
+        self._load_error: Optional[Exception] = None
+        self._loaded = threading.Event()
+        if isinstance(backend, Backend):
+            self._backend = backend
+            self._loaded.set()
+            return
+        self._backend_name = backend
+        if load_in_background:
+            threading.Thread(target=self._load_in_background, name="speech2caret-model-loader", daemon=True).start()
+        else:
+            self._load()
+            if self._load_error is not None:
+                raise self._load_error
+
+    def _load(self) -> None:
+        try:
+            start_time = time.perf_counter()
+            backend = create_backend(self._backend_name, self.model_name, **self._options)
+            if self._warm_up:
+                backend.transcribe_array(np.zeros(MODEL_SAMPLE_RATE, dtype=np.float32))
+            self._backend = backend
+            logger.info(f"Model loaded in {time.perf_counter() - start_time:.1f}s")
+        except Exception as e:
+            self._load_error = e
+        finally:
+            self._loaded.set()
+
+    def _load_in_background(self) -> None:
+        self._load()
+        if self._load_error is not None:
+            logger.opt(exception=self._load_error).error(f"Failed to load the model: {self.model_name}")
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    def wait_until_loaded(self) -> None:
+        """Wait for the model to load, if it's loading in the background (raising the error if it failed to load)."""
+        self._loaded.wait()
+        if self._load_error is not None:
+            raise self._load_error
+
+    @property
+    def backend(self) -> Backend:
+        """The backend, waiting for the model to load if it's loading in the background."""
+        self.wait_until_loaded()
+        assert self._backend is not None  # nosec
+        return self._backend
+
+    def _cache_key(self, method: str, audio: Union[np.ndarray, Path], use_cache: bool) -> Optional[str]:
+        if self.cache is None or not use_cache:
+            return None
+        data = audio.read_bytes() if isinstance(audio, Path) else audio
+        return fingerprint(data, {"method": method, **self._cache_params})
+
+    def _cached(self, key: Optional[str]) -> Optional[CachedTranscription]:
+        if key is None or self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Using the cached transcription ({self.cache.hits} hits, {self.cache.misses} misses)")
+        return cached
+
+    def _cache(self, key: Optional[str], value: CachedTranscription) -> None:
+        if key is not None and self.cache is not None:
+            self.cache.put(key, value)
+
+    def transcribe(self, audio_fp: Path, use_cache: bool = True) -> str:
+        key = self._cache_key("transcribe", audio_fp, use_cache)
+        cached = self._cached(key)
+        if isinstance(cached, str):
+            return cached
+        text = self.backend.transcribe(audio_fp)
+        self._cache(key, text)
+        return text
+
+    def transcribe_array(self, audio: np.ndarray, use_cache: bool = True) -> str:
+        """Transcribe float32 mono audio sampled at ``MODEL_SAMPLE_RATE`` (see ``audio.to_model_input``)."""
+        key = self._cache_key("transcribe_array", audio, use_cache)
+        cached = self._cached(key)
+        if isinstance(cached, str):
+            return cached
+        text = self.backend.transcribe_array(audio)
+        self._cache(key, text)
+        return text
+
+    def transcribe_segments(self, audio: np.ndarray, use_cache: bool = True) -> Iterator[str]:
+        """Transcribe audio (like ``transcribe_array``), yielding the text of each segment as soon as it is final."""
+        key = self._cache_key("transcribe_segments", audio, use_cache)
+        cached = self._cached(key)
+        if isinstance(cached, list):
+            yield from cached
+            return
+        texts = []
+        for text in self.backend.transcribe_segments(audio):
+            texts.append(text)
+            yield text
+        # Only cache complete transcriptions (not if e.g. transcribe_and_type is cancelled part way through)
+        self._cache(key, texts)
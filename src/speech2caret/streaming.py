@@ -0,0 +1,56 @@
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+
+from speech2caret import audio
+from speech2caret.speech_to_text import SpeechToText
+
+
+class StreamingTranscriber:
+    """Transcribe audio in segments while the recording is still in progress.
+
+    Audio blocks are put on ``queue`` (see ``Recorder.chunk_queue``). Once roughly ``segment_seconds`` of audio has
+    accumulated, it is split at the quietest point near the end and the finished segment is transcribed in a worker
+    thread, while recording continues. Putting ``None`` on the queue (see ``finish``) transcribes the remaining audio.
+    """
+
+    def __init__(
+        self, stt: SpeechToText, sample_rate: int, segment_seconds: float = 10.0, search_seconds: float = 2.0
+    ) -> None:
+        self.stt = stt
+        self.sample_rate = sample_rate
+        self.segment_samples = int(segment_seconds * sample_rate)
+        self.search_seconds = min(search_seconds, segment_seconds)
+        self.queue: asyncio.Queue[Optional[np.ndarray]] = asyncio.Queue()
+        self.texts: List[str] = []
+
+    def finish(self) -> None:
+        """Signal that recording has stopped."""
+        self.queue.put_nowait(None)
+
+    async def _transcribe_segment(self, segment: np.ndarray) -> None:
+        model_input = audio.to_model_input(segment, self.sample_rate)
+        text = await asyncio.to_thread(self.stt.transcribe_array, model_input)
+        logger.info(f"Transcribed segment: {text}")
+        if text:
+            self.texts.append(text)
+
+    async def run(self) -> str:
+        """Consume audio blocks until ``finish`` is called, then return the full transcription."""
+        blocks: List[np.ndarray] = []
+        n_pending = 0
+        while (block := await self.queue.get()) is not None:
+            blocks.append(block)
+            n_pending += len(block)
+            if n_pending >= self.segment_samples:
+                pending = np.concatenate(blocks, axis=0)
+                split = audio.find_split_point(pending, self.sample_rate, self.search_seconds)
+                blocks = [pending[split:]]
+                n_pending = len(blocks[0])
+                await self._transcribe_segment(pending[:split])
+
+        if n_pending:
+            await self._transcribe_segment(np.concatenate(blocks, axis=0))
+        return " ".join(self.texts)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+from speech2caret.config import CACHE_DIR
+
+CachedTranscription = Union[str, list[str]]  # a transcription, or the text of each segment
+
+
+def fingerprint(data: Union[np.ndarray, bytes], params: dict[str, Any]) -> str:
+    """Hash audio (float32 samples, or the bytes of an audio file) together with the parameters that affect its
+    transcription (e.g. the model name), to give a key for ``TranscriptionCache``."""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode())
+    if isinstance(data, np.ndarray):
+        digest.update(np.ascontiguousarray(data, dtype=np.float32).data)  # hash the samples without copying them
+    else:
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Cache transcriptions on disk (one JSON file per transcription), keyed by ``fingerprint``.
+
+    When the cache is bigger than ``max_size_mb``, the least recently used transcriptions are deleted. Which
+    transcriptions are cached (and when they were last used, from their modification times) is read from disk once,
+    so looking up a transcription only reads (and touches) its file.
+
+    Args:
+        cache_dir: Where to store the transcriptions (defaults to ``CACHE_DIR / "transcriptions"``).
+        max_size_mb: The maximum total size of the cached transcriptions.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_size_mb: float = 100) -> None:
+        self.cache_dir = cache_dir or CACHE_DIR / "transcriptions"
+        self.max_size_bytes = int(max_size_mb * 1024**2)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = [
+            (Path(entry.name).stem, entry.stat())
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(".json")
+        ]
+        entries.sort(key=lambda entry: entry[1].st_mtime_ns)
+        # key -> size (bytes), least recently used first
+        self._sizes: OrderedDict[str, int] = OrderedDict((key, stat.st_size) for key, stat in entries)
+        self.size_bytes = sum(self._sizes.values())
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[CachedTranscription]:
+        """Get a cached transcription (counting it as a hit or a miss), or ``None`` if it isn't cached."""
+        with self._lock:
+            if key in self._sizes:
+                try:
+                    value: CachedTranscription = json.loads(self._path(key).read_bytes())
+                    os.utime(self._path(key))  # most recently used
+                    self._sizes.move_to_end(key)
+                    self.hits += 1
+                    return value
+                except (OSError, ValueError):
+                    logger.warning(f"Removing unreadable cached transcription: {self._path(key)}")
+                    self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: CachedTranscription) -> None:
+        """Cache a transcription, deleting the least recently used ones if the cache is too big."""
+        data = json.dumps(value).encode()
+        with self._lock:
+            if key in self._sizes:
+                self._remove(key)
+            # Write to a temporary file first, so a cached transcription is never partly written.
+            tmp_fp = self._path(key).with_suffix(".tmp")
+            tmp_fp.write_bytes(data)
+            tmp_fp.replace(self._path(key))
+            self._sizes[key] = len(data)
+            self.size_bytes += len(data)
+            self._evict()
+
+    def clear(self) -> None:
+        """Delete all the cached transcriptions (the hit and miss counts are kept)."""
+        with self._lock:
+            while self._sizes:
+                self._remove(next(iter(self._sizes)))
+
+    def _remove(self, key: str) -> None:
+        self.size_bytes -= self._sizes.pop(key)
+        self._path(key).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self.size_bytes > self.max_size_bytes and self._sizes:
+            self._remove(next(iter(self._sizes)))
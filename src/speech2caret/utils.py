@@ -1,46 +1,196 @@
 import asyncio
-import re
-import subprocess  # nosec
-from pathlib import Path
+import contextlib
+from typing import ContextManager, Optional, Union
 
+import numpy as np
 from loguru import logger
 
+from speech2caret.audio import MODEL_SAMPLE_RATE, trim_silence
 from speech2caret.config import Config
+from speech2caret.metrics import Metrics, UtteranceTimer
+from speech2caret.profiling import Profiler
 from speech2caret.recorder import Recorder
 from speech2caret.speech_to_text import SpeechToText
+from speech2caret.streaming import StreamingTranscriber
 from speech2caret.virtual_keyboard import VirtualKeyboard
+from speech2caret.word_replacer import WordReplacer
 
 
-def play_audio(audio_fp: Path) -> None:
-    if audio_fp.exists() and audio_fp.is_file():
-        subprocess.run(["paplay", audio_fp])  # nosec
-
-
-def replace_words(text: str, word_replacements: dict[str, str]) -> str:
+def replace_words(text: str, word_replacements: Union[dict[str, str], WordReplacer]) -> str:
     """Replace words in a string with other words.
 
     Args:
         text: The string to process.
-        word_replacements: A dictionary of words to replace and their replacements.
+        word_replacements: A dictionary of words to replace and their replacements, or a ``WordReplacer`` (which is
+            faster if the same replacements are used repeatedly, e.g. ``Config.word_replacer``).
 
     Returns:
         The processed string.
     """
-    for word, replacement in word_replacements.items():
-        # Use \b for word boundaries, and re.IGNORECASE for case-insensitivity
-        text = re.sub(r"\b" + re.escape(word) + r"\b", replacement, text, flags=re.IGNORECASE)
-    return text
+    if not isinstance(word_replacements, WordReplacer):
+        word_replacements = WordReplacer(word_replacements)
+    return word_replacements.replace(text)
+
+
+def _span(timer: Optional[UtteranceTimer], stage: str) -> ContextManager[None]:
+    return timer.span(stage) if timer is not None else contextlib.nullcontext()
+
+
+async def _transcribe_segments(
+    stt: SpeechToText,
+    audio: np.ndarray,
+    queue: "asyncio.Queue[Optional[str]]",
+    timer: Optional[UtteranceTimer] = None,
+) -> None:
+    """Put the text of each segment on ``queue`` as soon as it is transcribed, followed by ``None``."""
+    try:
+        segments = stt.transcribe_segments(audio)
+        while True:
+            # Transcribe each segment in a worker thread, so the event loop (and typing) isn't blocked.
+            with _span(timer, "inference"):
+                text = await asyncio.to_thread(next, segments, None)
+            if text is None:
+                break
+            logger.info(f"Transcribed segment: {text}")
+            queue.put_nowait(text)
+    finally:
+        queue.put_nowait(None)
 
 
 async def transcribe_and_type(
-    recorder: Recorder, stt: SpeechToText, vkeyboard: VirtualKeyboard, config: Config
+    recorder: Recorder,
+    stt: SpeechToText,
+    vkeyboard: VirtualKeyboard,
+    config: Config,
+    timer: Optional[UtteranceTimer] = None,
+) -> None:
+    """Transcribe the recording, typing the text of each segment while the following segments are transcribed."""
+    # Take the audio now, before a new recording can replace it.
+    with _span(timer, "finalize"):
+        audio = recorder.get_audio()
+    await transcribe_audio_and_type(audio, stt, vkeyboard, config, timer=timer)
+
+
+async def transcribe_audio_and_type(
+    audio: np.ndarray,
+    stt: SpeechToText,
+    vkeyboard: VirtualKeyboard,
+    config: Config,
+    prefix: str = "",
+    timer: Optional[UtteranceTimer] = None,
+) -> bool:
+    """Transcribe audio (see ``Recorder.get_audio``), typing the text of each segment while the following segments
+    are transcribed.
+
+    Args:
+        audio: The audio to transcribe.
+        stt: The model to transcribe with.
+        vkeyboard: The keyboard to type with.
+        config: The config (for the word replacements and VAD options).
+        prefix: Typed before the text (if there is any text), e.g. a space to separate it from previous text.
+        timer: Times each stage, and is finished (with how the utterance ended) once the text has been typed, or if
+            there's no speech, it's cancelled or it fails.
+
+    Returns:
+        Whether any text was typed.
+    """
+    if timer is not None:
+        timer.audio_seconds = len(audio) / MODEL_SAMPLE_RATE
+    outcome = "error"
+    producer: Optional[asyncio.Task[None]] = None
+    try:
+        if config.vad:
+            n_samples = len(audio)
+            with _span(timer, "vad"):
+                audio = trim_silence(
+                    audio,
+                    MODEL_SAMPLE_RATE,
+                    config.vad_threshold_db,
+                    config.vad_padding_seconds,
+                    config.vad_max_pause_seconds,
+                )
+            logger.info(
+                f"Removed silence: {n_samples / MODEL_SAMPLE_RATE:.1f}s -> {len(audio) / MODEL_SAMPLE_RATE:.1f}s"
+            )
+            if not len(audio):
+                logger.info("No speech detected")
+                outcome = "no_speech"
+                return False
+        if not stt.is_loaded:
+            logger.info("Waiting for the model to load...")
+            # Timed separately, so it doesn't count towards (and inflate the real-time factor of) inference
+            with _span(timer, "model_load"):
+                await asyncio.to_thread(stt.wait_until_loaded)
+        queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+        producer = asyncio.create_task(_transcribe_segments(stt, audio, queue, timer))
+        typed = False
+        while (text := await queue.get()) is not None:
+            with _span(timer, "replace_words"):
+                text = replace_words(text, config.word_replacer)
+            logger.info(f"Post-processed text: {text}")
+            if not text:
+                continue
+            with _span(timer, "typing"):
+                await asyncio.to_thread(vkeyboard.type_text, f" {text}" if typed else f"{prefix}{text}")
+            typed = True
+        await producer  # raise any transcription error
+        outcome = "typed" if typed else "no_text"
+        return typed
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        if producer is not None:
+            producer.cancel()
+        if timer is not None:
+            timer.finish(outcome)
+
+
+async def transcribe_utterances_and_type(
+    utterances: "asyncio.Queue[Optional[np.ndarray]]",
+    stt: SpeechToText,
+    vkeyboard: VirtualKeyboard,
+    config: Config,
+    metrics: Optional[Metrics] = None,
+    profiler: Optional[Profiler] = None,
+) -> None:
+    """Transcribe and type each utterance put on ``utterances`` (in order), until ``None`` is put on it.
+
+    If ``profiler`` is given, each utterance is profiled (rather than the time spent waiting for the next one).
+    """
+    typed = False
+    while (audio := await utterances.get()) is not None:
+        # Each utterance is timed from when it's taken off the queue (its key press stages don't apply).
+        timer = metrics.utterance("auto_stop") if metrics is not None else None
+        prefix = " " if typed else ""
+        coroutine = transcribe_audio_and_type(audio, stt, vkeyboard, config, prefix, timer)
+        typed = await (profiler.run(coroutine, "auto_stop") if profiler is not None else coroutine) or typed
+
+
+async def finish_streaming_and_type(
+    streamer: StreamingTranscriber,
+    streaming_task: "asyncio.Task[str]",
+    vkeyboard: VirtualKeyboard,
+    config: Config,
+    timer: Optional[UtteranceTimer] = None,
 ) -> None:
+    """Wait for a streaming transcription to finish its last segment, then type the result."""
+    streamer.finish()
+    outcome = "error"
     try:
-        text = await asyncio.to_thread(stt.transcribe, recorder.audio_fp)
+        # Only the last segment is transcribed after recording stops
+        with _span(timer, "inference"):
+            text = await streaming_task
         logger.info(f"Transcribed text: {text}")
-        text = replace_words(text, config.word_replacements)
+        with _span(timer, "replace_words"):
+            text = replace_words(text, config.word_replacer)
         logger.info(f"Post-processed text: {text}")
-        await asyncio.to_thread(vkeyboard.type_text, text)
+        with _span(timer, "typing"):
+            await asyncio.to_thread(vkeyboard.type_text, text)
+        outcome = "typed" if text else "no_text"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
     finally:
-        # delete the temporary file (if successful, failed, or cancelled).
-        recorder.delete_audio_file()
+        if timer is not None:
+            timer.finish(outcome)
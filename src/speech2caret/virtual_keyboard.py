@@ -1,12 +1,89 @@
+import os
+import shutil
+import string
+import subprocess  # nosec
+import threading
 import time
 from pathlib import Path
+from typing import List, Optional, Sequence, Set, Tuple, Union
 
 import evdev
+from loguru import logger
+
+OUTPUTS = ("device", "uinput")
+# How long to wait after pasting before restoring the clipboard (applications read the clipboard after the key press)
+CLIPBOARD_RESTORE_DELAY = 0.5
+
+
+def build_key_table(char_map: dict[str, str], shift_chars: str) -> dict[str, Tuple[int, bool]]:
+    """Map each typeable character to its (keycode, whether shift is needed)."""
+    key_table = {char: (evdev.ecodes.ecodes[f"KEY_{char.upper()}"], char.isupper()) for char in string.ascii_letters}
+    key_table.update({char: (evdev.ecodes.ecodes[f"KEY_{char}"], False) for char in string.digits})
+    key_table.update({char: (evdev.ecodes.ecodes[key], char in shift_chars) for char, key in char_map.items()})
+    return key_table
+
+
+def _clipboard_commands() -> List[Tuple[List[str], List[str]]]:
+    """The (copy, read) commands of the clipboard tools, in order of preference."""
+    if os.environ.get("WAYLAND_DISPLAY"):
+        return [(["wl-copy"], ["wl-paste", "--no-newline"])]
+    return [
+        (["xclip", "-selection", "clipboard"], ["xclip", "-selection", "clipboard", "-o"]),
+        (["xsel", "--clipboard", "--input"], ["xsel", "--clipboard", "--output"]),
+    ]
+
+
+def copy_to_clipboard(text: str) -> bool:
+    """Copy text to the clipboard with wl-copy (Wayland), xclip or xsel (X11). Returns whether it succeeded."""
+    commands = [copy_command for copy_command, _ in _clipboard_commands()]
+    for command in commands:
+        if shutil.which(command[0]) is None:
+            continue
+        try:
+            subprocess.run(command, input=text.encode(), check=True, timeout=5)  # nosec
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Failed to copy text to the clipboard with {command[0]}: {e}")
+            return False
+        return True
+    logger.warning(f"Can't paste text, as none of these are installed: {', '.join(c[0] for c in commands)}")
+    return False
+
+
+def read_clipboard() -> Optional[str]:
+    """Get the text on the clipboard, or None if it can't be read (e.g. it's empty, or an image)."""
+    for _, command in _clipboard_commands():
+        if shutil.which(command[0]) is None:
+            continue
+        try:
+            result = subprocess.run(command, capture_output=True, check=True, timeout=5)  # nosec
+            return result.stdout.decode()
+        except (OSError, subprocess.SubprocessError, UnicodeDecodeError):
+            return None
+    return None
 
 
 class VirtualKeyboard:
-    def __init__(self, keyboard_device_path: Path):
-        self.device = evdev.InputDevice(keyboard_device_path)
+    """Type text by writing key events to a keyboard device.
+
+    Rather than synchronising (and sleeping) after every character, key events for up to ``chars_per_report``
+    characters are sent in each report (SYN_REPORT), with ``report_delay`` seconds between reports. A key is never
+    pressed twice in the same report, so repeated letters (and consecutive capitals) aren't merged. As each report
+    has at most one space, prose is typed about a word per report, so ``report_delay`` mostly sets the typing speed
+    (with the defaults, over 10x faster than a 10 ms delay per character).
+
+    Text of at least ``paste_threshold`` characters is instead copied to the clipboard and pasted (by pressing
+    ``paste_keys``), which takes the same time however long the text is. The text previously on the clipboard is
+    restored shortly afterwards.
+
+    Args:
+        keyboard_device_path: The path of the keyboard device (key presses are read from this device).
+        chars_per_report: The maximum number of characters per report.
+        report_delay: Seconds to wait after each report, which helps prevent the letters from getting jumbled up.
+        output: Where key events are written: ``"device"`` (the keyboard device), or ``"uinput"`` (a dedicated
+            virtual keyboard, which needs write access to /dev/uinput).
+        paste_threshold: Paste (rather than type) text of at least this many characters (0 never pastes).
+        paste_keys: The codes of the keys pressed (in order) to paste, e.g. Ctrl+Shift+V for terminals.
+    """
 
     CHAR_MAP = {
         " ": "KEY_SPACE",
@@ -22,27 +99,138 @@ class VirtualKeyboard:
         "!": "KEY_1",
         "?": "KEY_SLASH",
         "£": "KEY_3",
+        "\n": "KEY_ENTER",
+        "\t": "KEY_TAB",
+        "`": "KEY_GRAVE",
+        "~": "KEY_GRAVE",
+        "@": "KEY_2",
+        "$": "KEY_4",
+        "%": "KEY_5",
+        "^": "KEY_6",
+        "&": "KEY_7",
+        "*": "KEY_8",
+        "(": "KEY_9",
+        ")": "KEY_0",
+        "=": "KEY_EQUAL",
+        "+": "KEY_EQUAL",
+        "[": "KEY_LEFTBRACE",
+        "]": "KEY_RIGHTBRACE",
+        "{": "KEY_LEFTBRACE",
+        "}": "KEY_RIGHTBRACE",
+        "\\": "KEY_BACKSLASH",
+        "|": "KEY_BACKSLASH",
+        "<": "KEY_COMMA",
+        ">": "KEY_DOT",
     }
+    SHIFT_CHARS = '!?:"_£~@$%^&*()+{}|<>'
+    KEY_TABLE = build_key_table(CHAR_MAP, SHIFT_CHARS)
+
+    def __init__(
+        self,
+        keyboard_device_path: Path,
+        chars_per_report: int = 8,
+        report_delay: float = 0.004,
+        output: str = "device",
+        paste_threshold: int = 0,
+        paste_keys: Sequence[int] = (evdev.ecodes.KEY_LEFTCTRL, evdev.ecodes.KEY_V),
+    ):
+        if output not in OUTPUTS:
+            raise ValueError(f"Unknown output: {output}. Choose from: {', '.join(OUTPUTS)}")
+        self.device = evdev.InputDevice(keyboard_device_path)
+        self.uinput: Optional[evdev.UInput] = None
+        if output == "uinput":
+            keycodes = {keycode for keycode, _ in self.KEY_TABLE.values()}
+            keycodes |= {evdev.ecodes.KEY_LEFTSHIFT, *paste_keys}
+            self.uinput = evdev.UInput({evdev.ecodes.EV_KEY: sorted(keycodes)}, name="speech2caret")
+        self.output_device: Union[evdev.InputDevice[str], evdev.UInput] = self.uinput or self.device
+        self.chars_per_report = chars_per_report
+        self.report_delay = report_delay
+        self.paste_threshold = paste_threshold
+        self.paste_keys = tuple(paste_keys)
+        # The clipboard text to restore after pasting, and the timer that restores it
+        self._clipboard_lock = threading.Lock()
+        self._saved_clipboard: Optional[str] = None
+        self._restore_clipboard_timer: Optional[threading.Timer] = None
+        self._n_pastes = 0
 
-    def _send_key(self, key_event: str, shift: bool = False) -> None:
-        if shift:
-            self.device.write(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 1)
-        self.device.write(evdev.ecodes.EV_KEY, evdev.ecodes.ecodes[key_event], 1)
-        self.device.write(evdev.ecodes.EV_KEY, evdev.ecodes.ecodes[key_event], 0)
-        if shift:
-            self.device.write(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 0)
+    def close(self) -> None:
+        """Restore the clipboard (if text was just pasted), and remove the virtual keyboard (if ``output="uinput"``)."""
+        if self._restore_clipboard_timer is not None and self._restore_clipboard_timer.is_alive():
+            self._restore_clipboard_timer.cancel()
+            self._restore_clipboard(self._n_pastes)
+        if self.uinput is not None:
+            self.uinput.close()  # type: ignore[no-untyped-call, unused-ignore]
+
+    def _send_report(self, keys: List[Tuple[int, bool]]) -> None:
+        write = self.output_device.write
+        for keycode, shift in keys:
+            if shift:
+                write(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 1)
+            write(evdev.ecodes.EV_KEY, keycode, 1)
+            write(evdev.ecodes.EV_KEY, keycode, 0)
+            if shift:
+                write(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 0)
 
         # Process the above write events
-        self.device.syn()  # type: ignore
-        time.sleep(0.01)  # this helps prevent the letters from getting jumbled up
+        self.output_device.syn()  # type: ignore[no-untyped-call, unused-ignore]
+        time.sleep(self.report_delay)
+
+    def paste_text(self, text: str) -> bool:
+        """Copy text to the clipboard and press ``paste_keys``. Returns whether the text could be copied."""
+        with self._clipboard_lock:
+            if self._restore_clipboard_timer is not None and self._restore_clipboard_timer.is_alive():
+                # The clipboard still has the previously pasted text, so keep the text saved before that
+                self._restore_clipboard_timer.cancel()
+            else:
+                self._saved_clipboard = read_clipboard()
+            if not copy_to_clipboard(text):
+                return False
+            self._n_pastes += 1
+            write = self.output_device.write
+            for keycode in self.paste_keys:
+                write(evdev.ecodes.EV_KEY, keycode, 1)
+            self.output_device.syn()  # type: ignore[no-untyped-call, unused-ignore]
+            time.sleep(self.report_delay)
+            for keycode in reversed(self.paste_keys):
+                write(evdev.ecodes.EV_KEY, keycode, 0)
+            self.output_device.syn()  # type: ignore[no-untyped-call, unused-ignore]
+
+            if self._saved_clipboard is not None:
+                self._restore_clipboard_timer = threading.Timer(
+                    CLIPBOARD_RESTORE_DELAY, self._restore_clipboard, args=(self._n_pastes,)
+                )
+                self._restore_clipboard_timer.daemon = True
+                self._restore_clipboard_timer.start()
+        return True
+
+    def _restore_clipboard(self, n_pastes: int) -> None:
+        with self._clipboard_lock:
+            # Unless text has been pasted since this restore was scheduled (it'll be restored after that paste)
+            if n_pastes == self._n_pastes and self._saved_clipboard is not None:
+                copy_to_clipboard(self._saved_clipboard)
+                self._saved_clipboard = None
 
     def type_text(self, text: str) -> None:
+        if 0 < self.paste_threshold <= len(text) and self.paste_text(text):
+            return
+        report: List[Tuple[int, bool]] = []
+        pressed: Set[int] = set()
         for char in text:
-            if char.isalpha():
-                key = f"KEY_{char.upper()}"
-                self._send_key(key, shift=char.isupper())
-            elif char.isdigit():
-                self._send_key(f"KEY_{char}")
-            elif char in self.CHAR_MAP:
-                shift = char in '!?:"_£'
-                self._send_key(self.CHAR_MAP[char], shift)
+            key = self.KEY_TABLE.get(char)
+            if key is None:
+                continue
+            keycode, shift = key
+            if (
+                len(report) == self.chars_per_report
+                or keycode in pressed
+                or (shift and evdev.ecodes.KEY_LEFTSHIFT in pressed)
+            ):
+                self._send_report(report)
+                report = []
+                pressed = set()
+            report.append(key)
+            pressed.add(keycode)
+            if shift:
+                pressed.add(evdev.ecodes.KEY_LEFTSHIFT)
+        if report:
+            self._send_report(report)
@@ -0,0 +1,52 @@
+import re
+from typing import Any
+
+
+def _trie_pattern(trie: dict[str, Any]) -> str:
+    """Build a regex matching the words in ``trie``, preferring the longest match (see ``WordReplacer``)."""
+    alternatives = [re.escape(char) + _trie_pattern(child) for char, child in sorted(trie.items()) if char]
+    if not alternatives:
+        return ""
+    pattern = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+    if "" in trie:  # a word ends here, but (greedily) try to match a longer word first
+        pattern = f"(?:{pattern})?"
+    return pattern
+
+
+class WordReplacer:
+    """Replace words (or phrases) in text, case-insensitively and on word boundaries, in a single pass.
+
+    All the words are combined into one regex (structured as a trie, so matching doesn't slow down as more words are
+    added), which is compiled once. Where words overlap, the longest match wins (e.g. with replacements for both
+    "new" and "new line", "new line" is replaced). Replaced text isn't searched again, so replacements don't chain.
+
+    The replacements are ``re.sub`` templates, so escapes are expanded (e.g. "\\n" is replaced with a newline). They're
+    expanded once, here, rather than for each match.
+
+    Args:
+        word_replacements: A dictionary of words to replace and their replacements.
+
+    Raises:
+        re.error: If a replacement is an invalid template (e.g. it has a group reference, such as "\\1").
+    """
+
+    def __init__(self, word_replacements: dict[str, str]) -> None:
+        self.replacements = {
+            word.lower(): re.sub("", replacement, "") for word, replacement in word_replacements.items() if word
+        }
+        trie: dict[str, Any] = {}
+        for word in self.replacements:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self.pattern = re.compile(rf"\b{_trie_pattern(trie)}\b", flags=re.IGNORECASE) if trie else None
+
+    def _replacement(self, match: re.Match[str]) -> str:
+        return self.replacements.get(match.group(0).lower(), match.group(0))
+
+    def replace(self, text: str) -> str:
+        """Replace all the words in ``text``."""
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._replacement, text)
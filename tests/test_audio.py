@@ -0,0 +1,194 @@
+import numpy as np
+
+from speech2caret.audio import (
+    MODEL_SAMPLE_RATE,
+    AudioBuffer,
+    SilenceDetector,
+    find_split_point,
+    resample,
+    split_into_segments,
+    to_model_input,
+    trim_silence,
+)
+
+
+class TestResample:
+    def test_same_rate_is_unchanged(self):
+        audio = np.linspace(-1, 1, 100, dtype=np.float32)
+        np.testing.assert_array_equal(resample(audio, 16000, 16000), audio)
+
+    def test_output_length(self):
+        audio = np.zeros(44100, dtype=np.float32)
+        assert len(resample(audio, 44100, 16000)) == 16000
+
+    @staticmethod
+    def tone_amplitude(frequency, orig_sample_rate=44100, target_sample_rate=16000):
+        """The amplitude of a resampled (unit amplitude) tone, away from the start and end."""
+        t = np.arange(orig_sample_rate) / orig_sample_rate
+        resampled = resample(np.sin(2 * np.pi * frequency * t).astype(np.float32), orig_sample_rate, target_sample_rate)
+        return np.sqrt(2 * np.mean(resampled[1000:-1000] ** 2))
+
+    def test_keeps_tone_below_nyquist(self):
+        assert 0.99 < self.tone_amplitude(1000) < 1.01
+
+    def test_attenuates_tone_above_nyquist(self):
+        # 12 kHz is above 16 kHz's Nyquist frequency, so without a low-pass filter it'd alias to 4 kHz
+        assert self.tone_amplitude(12000) < 0.01
+
+    def test_upsample(self):
+        audio = np.sin(2 * np.pi * 1000 * np.arange(16000) / 16000).astype(np.float32)
+        expected = np.sin(2 * np.pi * 1000 * np.arange(48000) / 48000)
+        np.testing.assert_allclose(resample(audio, 16000, 48000)[500:-500], expected[500:-500], atol=2e-3)
+
+
+class TestToModelInput:
+    def test_int16_stereo_to_float_mono(self):
+        audio = np.full((MODEL_SAMPLE_RATE, 2), 32767, dtype=np.int16)
+        model_input = to_model_input(audio, MODEL_SAMPLE_RATE)
+        assert model_input.dtype == np.float32
+        assert model_input.shape == (MODEL_SAMPLE_RATE,)
+        np.testing.assert_allclose(model_input, 1.0)
+
+    def test_resamples_to_model_rate(self):
+        audio = np.zeros((44100, 1), dtype=np.int16)
+        assert to_model_input(audio, 44100).shape == (MODEL_SAMPLE_RATE,)
+
+
+class TestFindSplitPoint:
+    def test_splits_in_quiet_region(self):
+        sample_rate = 1000
+        audio = np.ones(3 * sample_rate, dtype=np.float32)
+        audio[2000:2100] = 0  # a short pause
+        split = find_split_point(audio, sample_rate, search_seconds=2)
+        assert 2000 <= split < 2100
+
+    def test_only_searches_end_of_audio(self):
+        sample_rate = 1000
+        audio = np.ones(3 * sample_rate, dtype=np.float32)
+        audio[:100] = 0  # quiet, but outside the search window
+        assert find_split_point(audio, sample_rate, search_seconds=1) >= 2000
+
+    def test_short_audio(self):
+        audio = np.ones(10, dtype=np.float32)
+        assert find_split_point(audio, 1000, search_seconds=1) == 10
+
+
+def speech(seconds, sample_rate=1000, amplitude=0.5):
+    """A tone, standing in for speech."""
+    return (amplitude * np.sin(np.arange(int(seconds * sample_rate), dtype=np.float32))).astype(np.float32)
+
+
+def silence(seconds, sample_rate=1000, amplitude=0.001):
+    """Quiet noise."""
+    rng = np.random.default_rng(0)
+    return (amplitude * rng.standard_normal(int(seconds * sample_rate))).astype(np.float32)
+
+
+class TestTrimSilence:
+    def test_trims_leading_and_trailing_silence(self):
+        audio = np.concatenate([silence(2), speech(1), silence(3)])
+        trimmed = trim_silence(audio, 1000, padding_seconds=0.2)
+        assert 1.0 <= len(trimmed) / 1000 <= 1.5
+
+    def test_shortens_long_pauses(self):
+        audio = np.concatenate([speech(1), silence(5), speech(1), silence(0.3), speech(1)])
+        trimmed = trim_silence(audio, 1000, padding_seconds=0, max_pause_seconds=0.5)
+        # The 5 s pause is shortened to 0.5 s, the 0.3 s pause is kept
+        assert 3.7 <= len(trimmed) / 1000 <= 3.9
+
+    def test_independent_of_gain(self):
+        audio = np.concatenate([silence(2), speech(1), silence(2)])
+        quiet_trimmed = trim_silence(audio * 0.05, 1000)
+        np.testing.assert_array_equal(quiet_trimmed, trim_silence(audio, 1000) * 0.05)
+
+    def test_silent_audio(self):
+        assert len(trim_silence(np.zeros(1000, dtype=np.float32), 1000)) == 0
+
+    def test_empty_audio(self):
+        assert len(trim_silence(np.zeros(0, dtype=np.float32), 1000)) == 0
+
+    def test_all_speech_is_unchanged(self):
+        audio = speech(2)
+        np.testing.assert_array_equal(trim_silence(audio, 1000), audio)
+
+
+def process_in_blocks(detector, audio, block_size=100):
+    """Return the times (in seconds, at 1 kHz) that speech ended."""
+    return [i / 1000 for i in range(0, len(audio), block_size) if detector.process(audio[i : i + block_size])]
+
+
+class TestSilenceDetector:
+    def test_detects_end_of_speech(self):
+        audio = np.concatenate([silence(1), speech(1), silence(0.5), speech(1), silence(2)])
+        detector = SilenceDetector(1000, silence_seconds=1)
+        # The 0.5 s pause isn't long enough
+        assert process_in_blocks(detector, audio) == [4.4]
+        assert not detector.has_speech
+
+    def test_no_speech(self):
+        detector = SilenceDetector(1000, silence_seconds=0.5)
+        assert process_in_blocks(detector, np.concatenate([silence(2), np.zeros(1000, dtype=np.float32)])) == []
+        assert not detector.has_speech
+
+    def test_speech_not_ended(self):
+        detector = SilenceDetector(1000, silence_seconds=1)
+        assert process_in_blocks(detector, np.concatenate([silence(1), speech(1)])) == []
+        assert detector.has_speech
+
+    def test_int16_stereo_blocks(self):
+        audio = np.concatenate([silence(1), speech(1), silence(2)])
+        audio = np.repeat((audio * 32767).astype(np.int16)[:, None], 2, axis=1)
+        detector = SilenceDetector(1000, silence_seconds=1)
+        assert len(process_in_blocks(detector, audio, block_size=64)) == 1
+
+    def test_reset(self):
+        detector = SilenceDetector(1000, silence_seconds=1)
+        assert process_in_blocks(detector, np.concatenate([silence(1), speech(1), silence(0.8)])) == []
+        detector.reset()
+        # The silence before the reset isn't counted, but the speech before it still ends
+        assert process_in_blocks(detector, silence(0.5)) == []
+        assert process_in_blocks(detector, silence(1)) == [0.4]
+
+
+class TestSplitIntoSegments:
+    def test_splits_at_quiet_points(self):
+        sample_rate = 1000
+        audio = np.ones(25 * sample_rate, dtype=np.float32)
+        audio[9500:9600] = 0  # a short pause near the end of the first segment
+        segments = split_into_segments(audio, sample_rate, segment_seconds=10)
+        assert all(len(segment) <= 10 * sample_rate for segment in segments)
+        assert 9500 <= len(segments[0]) < 9600
+        np.testing.assert_array_equal(np.concatenate(segments), audio)
+
+    def test_short_audio_is_one_segment(self):
+        audio = np.ones(1000, dtype=np.float32)
+        segments = split_into_segments(audio, 1000, segment_seconds=10)
+        assert len(segments) == 1
+        np.testing.assert_array_equal(segments[0], audio)
+
+
+class TestAudioBuffer:
+    def test_write_and_get(self):
+        buffer = AudioBuffer(channels=1, dtype="float32", initial_frames=10)
+        block = np.arange(4, dtype=np.float32).reshape(-1, 1)
+        written = buffer.write(block)
+        buffer.write(block)
+
+        np.testing.assert_array_equal(written, block)
+        np.testing.assert_array_equal(buffer.get(), np.concatenate([block, block]))
+
+    def test_grows_when_full(self):
+        buffer = AudioBuffer(channels=2, dtype="int16", initial_frames=3)
+        blocks = [np.full((2, 2), i, dtype=np.int16) for i in range(5)]
+        views = [buffer.write(block) for block in blocks]
+
+        assert buffer.n_frames == 10
+        np.testing.assert_array_equal(buffer.get(), np.concatenate(blocks))
+        # Views of earlier blocks remain valid after the buffer has grown
+        for view, block in zip(views, blocks):
+            np.testing.assert_array_equal(view, block)
+
+    def test_get_is_a_view(self):
+        buffer = AudioBuffer(channels=1, dtype="float32", initial_frames=10)
+        written = buffer.write(np.ones((5, 1), dtype=np.float32))
+        assert np.shares_memory(buffer.get(), written)
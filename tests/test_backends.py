@@ -0,0 +1,383 @@
+from collections import namedtuple
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from speech2caret.backends import create_backend
+from speech2caret.backends.base import Backend
+
+Segment = namedtuple("Segment", "text")
+
+
+class TestCreateBackend:
+    @mock.patch("speech2caret.backends.transformers_backend.TransformersBackend")
+    def test_transformers(self, mock_backend_class):
+        backend = create_backend("transformers", "openai/whisper-base.en")
+        mock_backend_class.assert_called_once_with("openai/whisper-base.en")
+        assert backend is mock_backend_class.return_value
+
+    @mock.patch("speech2caret.backends.faster_whisper_backend.FasterWhisperBackend")
+    def test_faster_whisper(self, mock_backend_class):
+        backend = create_backend("faster-whisper", "openai/whisper-base.en")
+        mock_backend_class.assert_called_once_with("openai/whisper-base.en")
+        assert backend is mock_backend_class.return_value
+
+    @mock.patch("speech2caret.backends.onnx_backend.OnnxBackend")
+    def test_onnx(self, mock_backend_class):
+        backend = create_backend("onnx", "openai/whisper-base.en")
+        mock_backend_class.assert_called_once_with("openai/whisper-base.en")
+        assert backend is mock_backend_class.return_value
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError, match="Unknown backend"):
+            create_backend("spam", "openai/whisper-base.en")
+
+
+class TestBackend:
+    def test_transcribe_segments(self):
+        """Long audio is transcribed (and yielded) in segments of at most 30 s."""
+
+        class LengthBackend(Backend):
+            def transcribe(self, audio_fp):
+                raise NotImplementedError
+
+            def transcribe_array(self, audio):
+                return str(len(audio))
+
+        audio = np.ones(75 * 16000, dtype=np.float32)
+        lengths = [int(text) for text in LengthBackend().transcribe_segments(audio)]
+        assert len(lengths) == 3
+        assert all(length <= 30 * 16000 for length in lengths)
+        assert sum(lengths) == len(audio)
+
+
+class TestFasterWhisperBackend:
+    def test_model_name(self):
+        from speech2caret.backends.faster_whisper_backend import (
+            faster_whisper_model_name,
+        )
+
+        assert faster_whisper_model_name("openai/whisper-base.en") == "base.en"
+        assert faster_whisper_model_name("Systran/faster-whisper-small") == "Systran/faster-whisper-small"
+
+    @mock.patch("speech2caret.backends.faster_whisper_backend.WhisperModel")
+    def test_transcribe_array(self, mock_model_class):
+        from speech2caret.backends.faster_whisper_backend import FasterWhisperBackend
+
+        mock_model_class.return_value.transcribe.return_value = ([Segment(" hello"), Segment(" world")], None)
+        audio = np.zeros(16000, dtype=np.float32)
+
+        backend = FasterWhisperBackend("openai/whisper-base.en")
+
+        assert backend.transcribe_array(audio) == "hello world"
+        mock_model_class.assert_called_once_with("base.en", device="cpu", compute_type="int8", cpu_threads=0)
+        mock_model_class.return_value.transcribe.assert_called_once_with(audio)
+
+    @mock.patch("speech2caret.backends.faster_whisper_backend.WhisperModel")
+    def test_transcribe_segments(self, mock_model_class):
+        from speech2caret.backends.faster_whisper_backend import FasterWhisperBackend
+
+        mock_model_class.return_value.transcribe.return_value = (iter([Segment(" hello"), Segment(" world")]), None)
+
+        backend = FasterWhisperBackend("openai/whisper-base.en")
+
+        assert list(backend.transcribe_segments(np.zeros(16000, dtype=np.float32))) == ["hello", "world"]
+
+    @mock.patch("speech2caret.backends.faster_whisper_backend.BatchedInferencePipeline")
+    @mock.patch("speech2caret.backends.faster_whisper_backend.WhisperModel")
+    def test_batched(self, mock_model_class, mock_batched_class):
+        from speech2caret.backends.faster_whisper_backend import FasterWhisperBackend
+
+        mock_batched_class.return_value.transcribe.return_value = (iter([Segment(" hello")]), None)
+        audio = np.zeros(16000, dtype=np.float32)
+
+        backend = FasterWhisperBackend("openai/whisper-base.en", batch_size=8)
+
+        assert backend.transcribe_array(audio) == "hello"
+        mock_batched_class.assert_called_once_with(mock_model_class.return_value)
+        mock_batched_class.return_value.transcribe.assert_called_once_with(audio, batch_size=8)
+        mock_model_class.return_value.transcribe.assert_not_called()
+
+    @pytest.mark.parametrize("batch_size", [1, 8])
+    @mock.patch("speech2caret.backends.faster_whisper_backend.BatchedInferencePipeline")
+    @mock.patch("speech2caret.backends.faster_whisper_backend.WhisperModel")
+    def test_initial_prompt(self, mock_model_class, mock_batched_class, batch_size):
+        """The prompt is tokenized once (except for BatchedInferencePipeline, which only accepts text)."""
+        from speech2caret.backends.faster_whisper_backend import FasterWhisperBackend
+
+        model = mock_model_class.return_value
+        model.hf_tokenizer.encode.return_value.ids = [1, 2, 3]
+        for mock_model in (model, mock_batched_class.return_value):
+            mock_model.transcribe.return_value = (iter([Segment(" hello")]), None)
+
+        backend = FasterWhisperBackend("openai/whisper-base.en", batch_size=batch_size, initial_prompt="PyTorch")
+        backend.transcribe_array(np.zeros(16000, dtype=np.float32))
+
+        if batch_size == 1:
+            model.hf_tokenizer.encode.assert_called_once_with(" PyTorch", add_special_tokens=False)
+            assert model.transcribe.call_args.kwargs["initial_prompt"] == [1, 2, 3]
+        else:
+            assert mock_batched_class.return_value.transcribe.call_args.kwargs["initial_prompt"] == "PyTorch"
+
+
+class TestTransformersBackend:
+    def test_load_quantized_model_is_cached(self, tmp_path):
+        import torch
+
+        from speech2caret.backends import transformers_backend
+
+        with (
+            mock.patch.object(transformers_backend, "CACHE_DIR", tmp_path),
+            mock.patch.object(transformers_backend, "AutoModelForSpeechSeq2Seq") as mock_model_class,
+            mock.patch.object(transformers_backend, "AutoConfig"),
+            mock.patch.object(transformers_backend, "GenerationConfig"),
+        ):
+            mock_model_class.from_pretrained.return_value = torch.nn.Sequential(torch.nn.Linear(4, 4))
+            mock_model_class.from_config.return_value = torch.nn.Sequential(torch.nn.Linear(4, 4))
+            model = transformers_backend.load_quantized_model("openai/whisper-base.en")
+            cached_model = transformers_backend.load_quantized_model("openai/whisper-base.en")
+
+        # Only the first call loads the float32 weights
+        mock_model_class.from_pretrained.assert_called_once()
+        assert isinstance(cached_model[0], torch.ao.nn.quantized.dynamic.Linear)
+        x = torch.randn(2, 4)
+        torch.testing.assert_close(cached_model(x), model(x))
+
+    @pytest.mark.parametrize(
+        "batch_size, n_seconds, expected_pipeline_calls, expected_generate_calls",
+        [(1, 75, 0, 3), (4, 75, 1, 0), (4, 20, 0, 1)],
+    )
+    def test_transcribe_segments(self, batch_size, n_seconds, expected_pipeline_calls, expected_generate_calls):
+        """Long audio is transcribed in batches of overlapping chunks (by the pipeline) when batch_size > 1, otherwise
+        a segment at a time (by calling generate directly)."""
+        from transformers import WhisperFeatureExtractor
+
+        from speech2caret.backends import transformers_backend
+
+        with (
+            mock.patch.object(transformers_backend, "AutoProcessor") as mock_processor_class,
+            mock.patch.object(transformers_backend, "AutoModelForSpeechSeq2Seq") as mock_model_class,
+            mock.patch.object(transformers_backend, "pipeline") as mock_pipeline,
+        ):
+            mock_processor_class.from_pretrained.return_value.feature_extractor = WhisperFeatureExtractor()
+            backend = transformers_backend.TransformersBackend(
+                "openai/whisper-base.en", batch_size=batch_size, stride_seconds=3
+            )
+        mock_pipeline.return_value.return_value = {"text": " hello"}
+        backend.tokenizer.decode.return_value = " hello"
+
+        texts = list(backend.transcribe_segments(np.zeros(n_seconds * 16000, dtype=np.float32)))
+
+        assert texts == ["hello"] * (expected_pipeline_calls + expected_generate_calls)
+        assert mock_pipeline.call_args.kwargs["chunk_length_s"] == 30
+        assert mock_pipeline.call_args.kwargs["stride_length_s"] == 3
+        assert mock_pipeline.return_value.call_count == expected_pipeline_calls
+        for call in mock_pipeline.return_value.call_args_list:
+            assert call.kwargs == {"batch_size": batch_size}
+        mock_generate = mock_model_class.from_pretrained.return_value.generate
+        assert mock_generate.call_count == expected_generate_calls
+        for call in mock_generate.call_args_list:
+            assert call.kwargs["input_features"].shape == (1, 80, 3000)
+            assert call.kwargs["generation_config"] is mock_pipeline.return_value.generation_config
+
+    @pytest.mark.parametrize("assistant_model_name", [None, "openai/whisper-tiny.en"])
+    def test_assistant_model(self, assistant_model_name):
+        """The assistant model (if any) is loaded like the model, and decoding is the same either way."""
+        from transformers import WhisperFeatureExtractor
+
+        from speech2caret.backends import transformers_backend
+
+        with (
+            mock.patch.object(transformers_backend, "AutoProcessor") as mock_processor_class,
+            mock.patch.object(transformers_backend, "AutoModelForSpeechSeq2Seq") as mock_model_class,
+            mock.patch.object(transformers_backend, "pipeline") as mock_pipeline,
+        ):
+            mock_processor_class.from_pretrained.return_value.feature_extractor = WhisperFeatureExtractor()
+            transformers_backend.TransformersBackend(
+                "openai/whisper-base.en", num_beams=1, assistant_model_name=assistant_model_name
+            )
+
+        loaded = [call.args[0] for call in mock_model_class.from_pretrained.call_args_list]
+        assert loaded == ["openai/whisper-base.en"] + ([assistant_model_name] if assistant_model_name else [])
+        expected_assistant = mock_model_class.from_pretrained.return_value if assistant_model_name else None
+        assert mock_pipeline.call_args.kwargs["assistant_model"] is expected_assistant
+        assert mock_pipeline.call_args.kwargs["num_beams"] == 1
+
+    @pytest.mark.parametrize("num_beams", [0, 5])
+    def test_assistant_model_needs_greedy_decoding(self, num_beams):
+        """Assisted decoding only supports greedy decoding, so the text would differ from beam search without it."""
+        from speech2caret.backends.transformers_backend import TransformersBackend
+
+        with pytest.raises(ValueError, match="num_beams"):
+            TransformersBackend(
+                "openai/whisper-base.en", num_beams=num_beams, assistant_model_name="openai/whisper-tiny.en"
+            )
+
+    @pytest.mark.parametrize("num_beams, expected", [(0, None), (1, 1), (3, 3)])
+    def test_num_beams(self, num_beams, expected):
+        """num_beams is passed to the pipeline (whose generation config _generate also uses), 0 keeps the default."""
+        from transformers import WhisperFeatureExtractor
+
+        from speech2caret.backends import transformers_backend
+
+        with (
+            mock.patch.object(transformers_backend, "AutoProcessor") as mock_processor_class,
+            mock.patch.object(transformers_backend, "AutoModelForSpeechSeq2Seq"),
+            mock.patch.object(transformers_backend, "pipeline") as mock_pipeline,
+        ):
+            mock_processor_class.from_pretrained.return_value.feature_extractor = WhisperFeatureExtractor()
+            transformers_backend.TransformersBackend("openai/whisper-base.en", num_beams=num_beams)
+
+        assert mock_pipeline.call_args.kwargs.get("num_beams") == expected
+
+    @pytest.mark.parametrize("n_seconds, expected_n_frames", [(2, 300), (5.5, 700), (29, None)])
+    def test_crop_encoder(self, n_seconds, expected_n_frames):
+        """Short audio is encoded (cropped) before generate, longer audio (of nearly 30 s) is encoded in full."""
+        from transformers import WhisperFeatureExtractor
+
+        from speech2caret.backends import transformers_backend
+
+        with (
+            mock.patch.object(transformers_backend, "AutoProcessor") as mock_processor_class,
+            mock.patch.object(transformers_backend, "AutoModelForSpeechSeq2Seq") as mock_model_class,
+            mock.patch.object(transformers_backend, "pipeline"),
+            mock.patch.object(transformers_backend, "encode_cropped") as mock_encode_cropped,
+        ):
+            mock_processor_class.from_pretrained.return_value.feature_extractor = WhisperFeatureExtractor()
+            backend = transformers_backend.TransformersBackend("openai/whisper-base.en", crop_encoder=True)
+            backend.transcribe_array(np.zeros(int(n_seconds * 16000), dtype=np.float32))
+
+        model = mock_model_class.from_pretrained.return_value
+        generate_kwargs = model.generate.call_args.kwargs
+        if expected_n_frames is None:
+            mock_encode_cropped.assert_not_called()
+            assert generate_kwargs["input_features"].shape == (1, 80, 3000)
+        else:
+            mock_encode_cropped.assert_called_once_with(model.model.encoder, mock.ANY, expected_n_frames)
+            assert generate_kwargs["encoder_outputs"] is mock_encode_cropped.return_value
+            assert "input_features" not in generate_kwargs
+            assert generate_kwargs["attention_mask"].shape == (1, expected_n_frames)
+
+    def test_encode_cropped(self):
+        """The encoder outputs are the same as the encoder's for 30 s, and one per 2 frames when cropped."""
+        import torch
+        from transformers import WhisperConfig, WhisperForConditionalGeneration
+
+        from speech2caret.backends.transformers_backend import encode_cropped
+
+        torch.manual_seed(0)
+        config = WhisperConfig(
+            d_model=16,
+            encoder_layers=2,
+            encoder_attention_heads=2,
+            encoder_ffn_dim=32,
+            decoder_layers=1,
+            decoder_attention_heads=2,
+            decoder_ffn_dim=32,
+        )
+        encoder = WhisperForConditionalGeneration(config).eval().model.encoder
+        input_features = torch.randn(1, 80, 3000)
+
+        with torch.inference_mode():
+            expected = encoder(input_features).last_hidden_state
+            torch.testing.assert_close(encode_cropped(encoder, input_features, 3000).last_hidden_state, expected)
+            assert encode_cropped(encoder, input_features, 400).last_hidden_state.shape == (1, 200, 16)
+
+    def test_initial_prompt(self):
+        """The prompt is tokenized once (keeping the last tokens of long prompts), and passed to generate (and the
+        pipeline)."""
+        import torch
+        from transformers import WhisperFeatureExtractor
+
+        from speech2caret.backends import transformers_backend
+
+        with (
+            mock.patch.object(transformers_backend, "AutoProcessor") as mock_processor_class,
+            mock.patch.object(transformers_backend, "AutoModelForSpeechSeq2Seq") as mock_model_class,
+            mock.patch.object(transformers_backend, "pipeline") as mock_pipeline,
+        ):
+            processor = mock_processor_class.from_pretrained.return_value
+            processor.feature_extractor = WhisperFeatureExtractor()
+            processor.tokenizer.get_prompt_ids.return_value = torch.arange(300)  # <|startofprev|> is 0
+            model = mock_model_class.from_pretrained.return_value
+            model.config.max_target_positions = 448
+            backend = transformers_backend.TransformersBackend("openai/whisper-base.en", initial_prompt="PyTorch")
+            backend.transcribe_array(np.zeros(16000, dtype=np.float32))
+            backend.transcribe_array(np.zeros(31 * 16000, dtype=np.float32))
+
+        processor.tokenizer.get_prompt_ids.assert_called_once_with("PyTorch", return_tensors="pt")
+        expected_prompt_ids = torch.cat([torch.tensor([0]), torch.arange(300 - 223, 300)])
+        torch.testing.assert_close(model.generate.call_args.kwargs["prompt_ids"], expected_prompt_ids)
+        pipeline_kwargs = mock_pipeline.return_value.call_args.kwargs
+        assert pipeline_kwargs["generate_kwargs"]["prompt_ids"] is model.generate.call_args.kwargs["prompt_ids"]
+
+    @pytest.mark.parametrize("current_num_interop_threads", [1, 4])
+    def test_num_interop_threads_already_set(self, current_num_interop_threads):
+        """num_interop_threads can only be set once, so it isn't set again (and an error is only logged)."""
+        from transformers import WhisperFeatureExtractor
+
+        from speech2caret.backends import transformers_backend
+
+        with (
+            mock.patch.object(transformers_backend, "AutoProcessor") as mock_processor_class,
+            mock.patch.object(transformers_backend, "AutoModelForSpeechSeq2Seq"),
+            mock.patch.object(transformers_backend, "pipeline"),
+            mock.patch("torch.get_num_interop_threads", return_value=current_num_interop_threads),
+            mock.patch("torch.set_num_interop_threads", side_effect=RuntimeError("already set")) as mock_set,
+        ):
+            mock_processor_class.from_pretrained.return_value.feature_extractor = WhisperFeatureExtractor()
+            transformers_backend.TransformersBackend("openai/whisper-base.en", num_interop_threads=4)
+
+        assert mock_set.call_count == (current_num_interop_threads != 4)
+
+    def test_crop_encoder_with_assistant_model(self):
+        from speech2caret.backends import transformers_backend
+
+        with pytest.raises(ValueError, match="assistant"):
+            transformers_backend.TransformersBackend(
+                "openai/whisper-base.en", assistant_model_name="openai/whisper-tiny.en", crop_encoder=True
+            )
+
+
+class TestLogMelSpectrogram:
+    @pytest.mark.parametrize("n_samples", [0, 100, 16000, 5 * 16000 + 7, 30 * 16000 - 100, 30 * 16000, 40 * 16000])
+    def test_same_as_feature_extractor(self, n_samples):
+        """The features are the same as WhisperFeatureExtractor's (which computes every frame of the padded 30 s)."""
+        from transformers import WhisperFeatureExtractor
+
+        from speech2caret.backends.log_mel import LogMelSpectrogram
+
+        feature_extractor = WhisperFeatureExtractor()
+        audio = np.random.default_rng(0).uniform(-0.5, 0.5, n_samples).astype(np.float32)
+
+        features = LogMelSpectrogram(feature_extractor)(audio)
+
+        expected = feature_extractor(audio, sampling_rate=16000, return_tensors="pt").input_features
+        assert features.shape == expected.shape == (1, 80, 3000)
+        np.testing.assert_allclose(features.numpy(), expected.numpy(), atol=1e-6)
+
+
+class TestOnnxBackend:
+    def test_quantized_model_dir_is_cached(self, tmp_path):
+        onnx_backend = pytest.importorskip("speech2caret.backends.onnx_backend")
+
+        def save_pretrained(export_dir):
+            for name in ("encoder_model.onnx", "config.json"):
+                (Path(export_dir) / name).touch()
+
+        with (
+            mock.patch.object(onnx_backend, "CACHE_DIR", tmp_path),
+            mock.patch.object(onnx_backend, "ORTModelForSpeechSeq2Seq") as mock_model_class,
+            mock.patch.object(onnx_backend, "quantize_dynamic") as mock_quantize,
+        ):
+            mock_model_class.from_pretrained.return_value.save_pretrained.side_effect = save_pretrained
+            model_dir = onnx_backend.quantized_model_dir("openai/whisper-base.en")
+            onnx_backend.quantized_model_dir("openai/whisper-base.en")
+
+        assert model_dir == tmp_path / "onnx/openai--whisper-base.en"
+        assert (model_dir / "config.json").is_file()
+        # Only exported/quantized the first time
+        mock_model_class.from_pretrained.assert_called_once_with("openai/whisper-base.en", export=True)
+        mock_quantize.assert_called_once()
@@ -1,10 +1,21 @@
+import asyncio
 import configparser
+import itertools
+import os
 from pathlib import Path
 from unittest import mock
 
+import evdev
 import pytest
 
-from speech2caret.config import Config, get_config
+from speech2caret.config import (
+    DAEMON_SOCKET_PATH,
+    Config,
+    ConfigError,
+    ConfigWatcher,
+    get_config,
+    read_config,
+)
 
 
 @pytest.fixture
@@ -86,6 +97,229 @@ class TestConfigInit:
         assert config.resume_recording_audio_path == Path(".")
         assert config.pause_recording_audio_path == Path(".")
         assert config.word_replacements == {}
+        assert config.save_audio_path is None
+        assert config.sample_rate == 16000
+        assert config.channels == 1
+        assert config.backend == "transformers"
+        assert config.model_name == "openai/whisper-base.en"
+        assert config.chars_per_report == 8
+        assert config.report_delay == 0.004
+        assert config.output == "device"
+        assert config.paste_threshold == 0
+        assert config.paste_keycodes == (evdev.ecodes.KEY_LEFTCTRL, evdev.ecodes.KEY_V)
+        assert config.daemon_socket_path == DAEMON_SOCKET_PATH
+        assert config.vad is False
+        assert config.auto_stop is False
+        assert config.streaming is False
+        assert config.streaming_segment_seconds == 10.0
+
+    def test_with_save_audio_path(self, mock_valid_config_parser):
+        """Test that save_audio_path is parsed correctly."""
+        mock_valid_config_parser["recording"] = {"save_audio_path": "/path/to/recording.wav"}
+        config = Config(mock_valid_config_parser)
+        assert config.save_audio_path == Path("/path/to/recording.wav")
+
+    def test_with_recording_format(self, mock_valid_config_parser):
+        """Test that the recording format is parsed correctly."""
+        mock_valid_config_parser["recording"] = {"sample_rate": "44100", "channels": "2"}
+        config = Config(mock_valid_config_parser)
+        assert config.sample_rate == 44100
+        assert config.channels == 2
+
+    def test_invalid_recording_format(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when the recording format is invalid."""
+        mock_valid_config_parser["recording"] = {"channels": "0"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_invalid_word_replacement(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when a word replacement is an invalid template."""
+        mock_valid_config_parser["word_replacements"] = {"first": "\\1"}
+        with pytest.raises(ConfigError, match="word_replacements"):
+            Config(mock_valid_config_parser)
+
+    def test_with_model(self, mock_valid_config_parser):
+        """Test that the model options are parsed correctly."""
+        mock_valid_config_parser["model"] = {"backend": "faster-whisper", "model_name": "openai/whisper-small.en"}
+        config = Config(mock_valid_config_parser)
+        assert config.backend == "faster-whisper"
+        assert config.model_name == "openai/whisper-small.en"
+
+    def test_backend_options(self, mock_valid_config_parser):
+        """Test that only the options the configured backend supports are passed to it."""
+        mock_valid_config_parser["model"] = {
+            "quantize": "true",
+            "num_threads": "4",
+            "compile": "true",
+            "batch_size": "4",
+        }
+        config = Config(mock_valid_config_parser)
+        assert config.backend_options == {
+            "num_threads": 4,
+            "batch_size": 4,
+            "initial_prompt": None,
+            "num_interop_threads": 0,
+            "stride_seconds": 5.0,
+            "quantize": True,
+            "compile": True,
+            "num_beams": 0,
+            "assistant_model_name": None,
+            "crop_encoder": False,
+        }
+
+        mock_valid_config_parser["model"]["backend"] = "faster-whisper"
+        config = Config(mock_valid_config_parser)
+        assert config.backend_options == {"num_threads": 4, "batch_size": 4, "initial_prompt": None}
+
+    @pytest.mark.parametrize("option, value", [("batch_size", "0"), ("stride_seconds", "15")])
+    def test_invalid_batching(self, mock_valid_config_parser, option, value):
+        """Test that ConfigError is raised when batch_size or stride_seconds is invalid."""
+        mock_valid_config_parser["model"] = {option: value}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    @pytest.mark.parametrize(
+        "option, value", [("backend", "faster-whisper"), ("batch_size", "4"), ("num_beams", "0"), ("num_beams", "5")]
+    )
+    def test_invalid_assistant_model(self, mock_valid_config_parser, option, value):
+        """Test that ConfigError is raised when assisted decoding isn't supported (by the backend, batching or beam
+        search)."""
+        mock_valid_config_parser["model"] = {"assistant_model_name": "openai/whisper-tiny.en", "num_beams": "1"}
+        assert Config(mock_valid_config_parser).backend_options["assistant_model_name"] == "openai/whisper-tiny.en"
+
+        mock_valid_config_parser["model"][option] = value
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    @pytest.mark.parametrize("option, value", [("backend", "onnx"), ("assistant_model_name", "openai/whisper-tiny.en")])
+    def test_invalid_crop_encoder(self, mock_valid_config_parser, option, value):
+        """Test that ConfigError is raised when encoder cropping isn't supported (by the backend or assisted
+        decoding)."""
+        mock_valid_config_parser["model"] = {"crop_encoder": "true"}
+        assert Config(mock_valid_config_parser).backend_options["crop_encoder"] is True
+
+        mock_valid_config_parser["model"][option] = value
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    @pytest.mark.parametrize("backend", ["transformers", "faster-whisper", "onnx"])
+    def test_initial_prompt(self, mock_valid_config_parser, backend):
+        """Test that the initial prompt is passed to every backend."""
+        mock_valid_config_parser["model"] = {"backend": backend, "initial_prompt": " Glossary: PyTorch, asyncio. "}
+        assert Config(mock_valid_config_parser).backend_options["initial_prompt"] == "Glossary: PyTorch, asyncio."
+
+    def test_negative_num_beams(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when num_beams is negative."""
+        mock_valid_config_parser["model"] = {"num_beams": "-1"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_negative_num_threads(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when num_threads is negative."""
+        mock_valid_config_parser["model"] = {"num_threads": "-1"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_unknown_backend(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when the backend is unknown."""
+        mock_valid_config_parser["model"] = {"backend": "spam"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_invalid_typing(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when chars_per_report is less than 1."""
+        mock_valid_config_parser["typing"] = {"chars_per_report": "0"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_with_uinput_output_and_paste(self, mock_valid_config_parser):
+        """Test that the typing output options are parsed correctly."""
+        mock_valid_config_parser["typing"] = {
+            "output": "uinput",
+            "paste_threshold": "200",
+            "paste_keys": "KEY_LEFTCTRL + KEY_LEFTSHIFT + KEY_V",
+        }
+        config = Config(mock_valid_config_parser)
+        assert config.output == "uinput"
+        assert config.paste_threshold == 200
+        assert config.paste_keycodes == (evdev.ecodes.KEY_LEFTCTRL, evdev.ecodes.KEY_LEFTSHIFT, evdev.ecodes.KEY_V)
+
+    def test_unknown_paste_key(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when a paste key is unknown."""
+        mock_valid_config_parser["typing"] = {"paste_keys": "KEY_LEFTCTRL+V"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_invalid_typing_output(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when the typing output is unknown."""
+        mock_valid_config_parser["typing"] = {"output": "spam"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_with_vad(self, mock_valid_config_parser):
+        """Test that the VAD options are parsed correctly."""
+        mock_valid_config_parser["vad"] = {"enabled": "true", "threshold_db": "-30", "max_pause_seconds": "1"}
+        config = Config(mock_valid_config_parser)
+        assert config.vad is True
+        assert config.vad_threshold_db == -30.0
+        assert config.vad_padding_seconds == 0.2
+        assert config.vad_max_pause_seconds == 1.0
+
+    def test_with_auto_stop(self, mock_valid_config_parser):
+        """Test that the auto-stop options are parsed correctly."""
+        mock_valid_config_parser["vad"] = {"auto_stop": "true", "auto_stop_silence_seconds": "0.5"}
+        config = Config(mock_valid_config_parser)
+        assert config.auto_stop is True
+        assert config.auto_stop_silence_seconds == 0.5
+
+    def test_auto_stop_with_streaming(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when both auto-stop and streaming are enabled."""
+        mock_valid_config_parser["vad"] = {"auto_stop": "true"}
+        mock_valid_config_parser["streaming"] = {"enabled": "true"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_invalid_vad(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when the VAD threshold is positive."""
+        mock_valid_config_parser["vad"] = {"threshold_db": "10"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_with_streaming(self, mock_valid_config_parser):
+        """Test that the streaming options are parsed correctly."""
+        mock_valid_config_parser["streaming"] = {"enabled": "true", "segment_seconds": "5"}
+        config = Config(mock_valid_config_parser)
+        assert config.streaming is True
+        assert config.streaming_segment_seconds == 5.0
+
+    def test_invalid_streaming_segment_seconds(self, mock_valid_config_parser):
+        """Test that ConfigError is raised when segment_seconds is not positive."""
+        mock_valid_config_parser["streaming"] = {"segment_seconds": "0"}
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_with_cache(self, mock_valid_config_parser):
+        """Test that the cache options are parsed correctly (and validated)."""
+        mock_valid_config_parser["cache"] = {"enabled": "true", "max_size_mb": "10"}
+        config = Config(mock_valid_config_parser)
+        assert config.cache is True
+        assert config.cache_max_size_mb == 10.0
+
+        mock_valid_config_parser["cache"]["max_size_mb"] = "0"
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
+
+    def test_with_metrics(self, mock_valid_config_parser):
+        """Test that the metrics options are parsed correctly (and validated)."""
+        assert Config(mock_valid_config_parser).metrics_jsonl_path is None
+        mock_valid_config_parser["metrics"] = {"port": "9464", "jsonl_path": "/tmp/timings.jsonl"}
+        config = Config(mock_valid_config_parser)
+        assert config.metrics_port == 9464
+        assert config.metrics_jsonl_path == Path("/tmp/timings.jsonl")
+
+        mock_valid_config_parser["metrics"]["port"] = "70000"
+        with pytest.raises(ConfigError):
+            Config(mock_valid_config_parser)
 
     def test_with_audio_paths(self, mock_valid_config_parser):
         """Test that audio paths are parsed correctly."""
@@ -102,29 +336,127 @@ class TestConfigInit:
         assert config.pause_recording_audio_path == Path("/path/to/pause.wav")
 
     def test_no_keyboard_device_path(self, mock_valid_config_parser):
-        """Test that SystemExit is raised when keyboard_device_path is missing."""
+        """Test that ConfigError is raised when keyboard_device_path is missing."""
         mock_valid_config_parser["main"]["keyboard_device_path"] = ""
-        with pytest.raises(SystemExit) as e:
+        with pytest.raises(ConfigError):
             Config(mock_valid_config_parser)
-        assert e.value.code == 1
 
     def test_nonexistent_keyboard_device_path(self, mock_valid_config_parser):
-        """Test that SystemExit is raised when keyboard_device_path does not exist."""
+        """Test that ConfigError is raised when keyboard_device_path does not exist."""
         mock_valid_config_parser["main"]["keyboard_device_path"] = "/dev/nonexistent"
-        with pytest.raises(SystemExit) as e:
+        with pytest.raises(ConfigError):
             Config(mock_valid_config_parser)
-        assert e.value.code == 1
 
     def test_no_start_stop_key(self, mock_valid_config_parser):
-        """Test that SystemExit is raised when start_stop_key is missing."""
+        """Test that ConfigError is raised when start_stop_key is missing."""
         mock_valid_config_parser["main"]["start_stop_key"] = ""
-        with pytest.raises(SystemExit) as e:
+        with pytest.raises(ConfigError):
             Config(mock_valid_config_parser)
-        assert e.value.code == 1
 
     def test_no_resume_pause_key(self, mock_valid_config_parser):
-        """Test that SystemExit is raised when resume_pause_key is missing."""
+        """Test that ConfigError is raised when resume_pause_key is missing."""
         mock_valid_config_parser["main"]["resume_pause_key"] = ""
-        with pytest.raises(SystemExit) as e:
+        with pytest.raises(ConfigError):
             Config(mock_valid_config_parser)
-        assert e.value.code == 1
+
+    def test_resolves_keycodes(self, mock_valid_config_parser):
+        """Test that the key names are resolved to key codes."""
+        config = Config(mock_valid_config_parser)
+        assert config.start_stop_keycode == evdev.ecodes.KEY_A
+        assert config.resume_pause_keycode == evdev.ecodes.KEY_B
+
+    @pytest.mark.parametrize("key_name", ["KEY_SPAM", "EV_KEY", "f11"])
+    def test_unknown_key(self, mock_valid_config_parser, key_name):
+        """Test that ConfigError is raised when a key name is unknown."""
+        mock_valid_config_parser["main"]["start_stop_key"] = key_name
+        with pytest.raises(ConfigError, match="Unknown key"):
+            Config(mock_valid_config_parser)
+
+
+class TestReadConfig:
+    def test_invalid_file(self, tmp_path):
+        """Test that ConfigError (rather than SystemExit) is raised when the config file is invalid."""
+        config_file = tmp_path / "config.ini"
+        config_file.write_text("[main]\nkeyboard_device_path = /dev/null\n")
+        with pytest.raises(ConfigError, match="Invalid config file"):
+            read_config(config_file)
+
+
+mtimes = itertools.count(1_000_000_000)
+
+
+def write_config(config_file, start_stop_key="KEY_F1"):
+    config_parser = configparser.ConfigParser()
+    config_parser["main"] = {
+        "keyboard_device_path": "/dev/null",
+        "start_stop_key": start_stop_key,
+        "resume_pause_key": "KEY_F2",
+    }
+    config_parser["audio"] = {
+        "start_recording_audio_path": "",
+        "stop_recording_audio_path": "",
+        "resume_recording_audio_path": "",
+        "pause_recording_audio_path": "",
+    }
+    config_parser["word_replacements"] = {}
+    with open(config_file, "w") as f:
+        config_parser.write(f)
+    os.utime(config_file, ns=(0, next(mtimes)))  # a distinct mtime, however quickly it's rewritten
+
+
+class TestConfigWatcher:
+    def test_reloads_when_file_changes(self, tmp_path):
+        """Test that the config is reloaded once the file has changed (and stopped changing)."""
+        config_file = tmp_path / "config.ini"
+        write_config(config_file)
+        watcher = ConfigWatcher(config_file)
+        assert watcher.check() is None
+
+        write_config(config_file, start_stop_key="KEY_F3")
+        assert watcher.check() is None  # still changing
+        config = watcher.check()
+        assert config is not None
+        assert config.start_stop_key == "KEY_F3"
+        assert watcher.check() is None  # only reloaded once
+
+    def test_keeps_previous_config_when_invalid(self, tmp_path):
+        """Test that an invalid edit doesn't exit (the previous config is kept)."""
+        config_file = tmp_path / "config.ini"
+        write_config(config_file)
+        watcher = ConfigWatcher(config_file)
+
+        write_config(config_file, start_stop_key="")
+        watcher.check()
+        assert watcher.check() is None
+
+        write_config(config_file, start_stop_key="KEY_F4")
+        watcher.check()
+        assert watcher.check().start_stop_key == "KEY_F4"
+
+    def test_deleted_file(self, tmp_path):
+        config_file = tmp_path / "config.ini"
+        write_config(config_file)
+        watcher = ConfigWatcher(config_file)
+
+        config_file.unlink()
+        watcher.check()
+        assert watcher.check() is None
+
+    @pytest.mark.asyncio
+    async def test_watch(self, tmp_path):
+        config_file = tmp_path / "config.ini"
+        write_config(config_file)
+        watcher = ConfigWatcher(config_file, interval=0.01)
+        reloaded = asyncio.Event()
+        configs = []
+
+        def on_reload(config):
+            configs.append(config)
+            reloaded.set()
+
+        task = asyncio.create_task(watcher.watch(on_reload))
+        write_config(config_file, start_stop_key="KEY_F3")
+        await asyncio.wait_for(reloaded.wait(), timeout=5)
+        task.cancel()
+
+        assert [config.start_stop_key for config in configs] == ["KEY_F3"]
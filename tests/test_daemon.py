@@ -0,0 +1,122 @@
+import asyncio
+import os
+import struct
+import wave
+from unittest import mock
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from speech2caret.audio import MODEL_SAMPLE_RATE
+from speech2caret.daemon import DaemonBackend, is_running, serve
+
+
+@pytest_asyncio.fixture
+async def daemon(tmp_path):
+    """Run a daemon (with a mocked model) in the background."""
+    socket_path = tmp_path / "speech2caret.sock"
+    mock_stt = mock.Mock()
+    task = asyncio.create_task(serve(mock_stt, socket_path))
+    while not socket_path.exists():
+        await asyncio.sleep(0.01)
+    yield socket_path, mock_stt
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+@pytest.mark.asyncio
+class TestDaemon:
+    async def test_transcribe_array(self, daemon):
+        socket_path, mock_stt = daemon
+        mock_stt.transcribe_array.return_value = "hello wörld"
+        audio = np.linspace(-1, 1, 16000, dtype=np.float32)
+
+        backend = DaemonBackend(socket_path)
+        text = await asyncio.to_thread(backend.transcribe_array, audio)
+
+        assert text == "hello wörld"
+        np.testing.assert_array_equal(mock_stt.transcribe_array.call_args.args[0], audio)
+
+    async def test_transcribe_file(self, daemon, tmp_path):
+        socket_path, mock_stt = daemon
+        mock_stt.transcribe_array.return_value = "hello"
+        audio_fp = tmp_path / "audio.wav"
+        with wave.open(str(audio_fp), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(MODEL_SAMPLE_RATE)
+            wf.writeframes(np.array([0, 16384, -16384], dtype=np.int16).tobytes())
+
+        text = await asyncio.to_thread(DaemonBackend(socket_path).transcribe, audio_fp)
+
+        assert text == "hello"
+        np.testing.assert_allclose(mock_stt.transcribe_array.call_args.args[0], [0, 0.5, -0.5], atol=1e-4)
+
+    async def test_socket_permissions(self, daemon):
+        socket_path, _ = daemon
+        assert socket_path.stat().st_mode & 0o777 == 0o600
+
+    async def test_transcription_error(self, daemon):
+        socket_path, mock_stt = daemon
+        mock_stt.transcribe_array.side_effect = ValueError("Model failed")
+
+        backend = DaemonBackend(socket_path)
+        with pytest.raises(RuntimeError, match="Model failed"):
+            await asyncio.to_thread(backend.transcribe_array, np.zeros(10, dtype=np.float32))
+
+    async def test_multiple_requests_per_connection(self, daemon):
+        socket_path, mock_stt = daemon
+        mock_stt.transcribe_array.side_effect = ["one", "two"]
+
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+        texts = []
+        for _ in range(2):
+            writer.write(struct.pack("!I", 8) + np.zeros(2, dtype="<f4").tobytes())
+            status, n_bytes = struct.unpack("!BI", await reader.readexactly(5))
+            assert status == 0
+            texts.append((await reader.readexactly(n_bytes)).decode())
+        writer.close()
+
+        assert texts == ["one", "two"]
+
+    async def test_invalid_request(self, daemon):
+        socket_path, mock_stt = daemon
+
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+        writer.write(struct.pack("!I", 3))  # not a whole number of float32 samples
+        status, n_bytes = struct.unpack("!BI", await reader.readexactly(5))
+        writer.close()
+
+        assert status == 1
+        mock_stt.transcribe_array.assert_not_called()
+
+    async def test_is_running(self, daemon, tmp_path):
+        socket_path, _ = daemon
+        assert await asyncio.to_thread(is_running, socket_path)
+        assert not is_running(tmp_path / "missing.sock")
+
+    async def test_only_one_daemon(self, daemon):
+        socket_path, _ = daemon
+        with pytest.raises(RuntimeError, match="already listening"):
+            await serve(mock.Mock(), socket_path)
+
+    async def test_other_users_daemon(self, daemon):
+        """A socket served by another user (which could read the audio and choose the text) isn't used."""
+        socket_path, mock_stt = daemon
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            assert not await asyncio.to_thread(is_running, socket_path)
+            with pytest.raises(PermissionError, match="another user"):
+                await asyncio.to_thread(DaemonBackend(socket_path).transcribe_array, np.zeros(16, dtype=np.float32))
+        mock_stt.transcribe_array.assert_not_called()
+
+    async def test_creates_private_directory(self, tmp_path):
+        socket_path = tmp_path / "speech2caret-1000" / "speech2caret.sock"
+        task = asyncio.create_task(serve(mock.Mock(), socket_path))
+        while not socket_path.exists():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert socket_path.parent.stat().st_mode & 0o777 == 0o700
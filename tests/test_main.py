@@ -16,7 +16,7 @@ def test_main(mock_asyncio_run, mock_get_config):
     mock_get_config.return_value = mock_config
 
     # Act
-    main.main()
+    main.main([])
 
     # Assert
     mock_get_config.assert_called_once()
@@ -40,9 +40,28 @@ def test_main_keyboard_interrupt(mock_sys_exit, mock_asyncio_run, mock_get_confi
     mock_get_config.return_value = mock_config
 
     # Act
-    main.main()
+    main.main([])
 
     # Assert
     mock_get_config.assert_called_once()
     mock_asyncio_run.assert_called_once()
     mock_sys_exit.assert_called_once_with(0)
+
+
+@patch("speech2caret.main.get_config")
+@patch("speech2caret.main.listen_keyboard_events")
+@patch("asyncio.run")
+def test_main_profile(mock_asyncio_run, mock_listen_keyboard_events, mock_get_config, tmp_path):
+    """
+    GIVEN the main function
+    WHEN it is called with --profile
+    THEN listen_keyboard_events should be given a Profiler saving to --profile-dir
+    """
+    # Act
+    main.main(["--profile", "--profile-dir", str(tmp_path), "--profile-keep", "3"])
+
+    # Assert
+    config, profiler = mock_listen_keyboard_events.call_args.args
+    assert config is mock_get_config.return_value
+    assert profiler.directory == tmp_path
+    assert profiler.keep == 3
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import socket
+import time
+
+import pytest
+
+from speech2caret.metrics import Histogram, Metrics, UtteranceTimer
+
+
+class TestHistogram:
+    def test_observe(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+
+        assert histogram.cumulative_counts() == [2, 3]  # buckets are "less than or equal"
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(5.65)
+
+    def test_prometheus_lines(self):
+        histogram = Histogram((0.1, 1.0))
+        histogram.observe(0.5)
+
+        assert histogram.prometheus_lines("latency_seconds", 'stage="typing"') == [
+            'latency_seconds_bucket{stage="typing",le="0.1"} 0',
+            'latency_seconds_bucket{stage="typing",le="1"} 1',
+            'latency_seconds_bucket{stage="typing",le="+Inf"} 1',
+            'latency_seconds_sum{stage="typing"} 0.5',
+            'latency_seconds_count{stage="typing"} 1',
+        ]
+
+
+class TestUtteranceTimer:
+    def test_stages_add_up(self):
+        timer = UtteranceTimer()
+        with timer.span("inference"):
+            time.sleep(0.01)
+        timer.add("inference", 1.0)
+        timer.audio_seconds = 10.0
+
+        assert 1.01 <= timer.stages["inference"] < 1.5
+        assert timer.real_time_factor == pytest.approx(timer.stages["inference"] / 10)
+
+    def test_finish_records(self, tmp_path):
+        metrics = Metrics(tmp_path / "timings.jsonl")
+        timer = metrics.utterance("recording", started_at=time.time() - 2)
+        timer.add("inference", 0.5)
+        timer.audio_seconds = 5.0
+
+        timer.finish()
+        metrics.utterance("auto_stop").finish("no_speech")
+
+        assert metrics.stage_seconds["inference"].count == 1
+        assert metrics.stage_seconds["total"].count == 2
+        assert metrics.real_time_factor.sum == pytest.approx(0.1)
+        records = [json.loads(line) for line in (tmp_path / "timings.jsonl").read_text().splitlines()]
+        assert [record["mode"] for record in records] == ["recording", "auto_stop"]
+        assert [record["outcome"] for record in records] == ["typed", "no_speech"]
+        assert metrics.outcomes["no_speech"] == 1
+        assert records[0]["stages"]["total"] >= 2
+        assert records[0]["audio_seconds"] == 5.0
+
+
+@pytest.mark.asyncio
+class TestMetrics:
+    async def test_serve(self):
+        metrics = Metrics()
+        timer = metrics.utterance()
+        timer.add("typing", 0.02)
+        timer.finish()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server_task = asyncio.create_task(metrics.serve(port))
+        await asyncio.sleep(0.1)
+
+        try:
+            responses = []
+            for path in ("/metrics", "/"):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+                responses.append((await reader.read()).decode())
+                writer.close()
+        finally:
+            server_task.cancel()
+
+        assert responses[0].startswith("HTTP/1.1 200 OK")
+        assert "# TYPE speech2caret_stage_seconds histogram" in responses[0]
+        assert 'speech2caret_stage_seconds_bucket{stage="typing",le="0.025"} 1' in responses[0]
+        assert 'speech2caret_stage_seconds_count{stage="total"} 1' in responses[0]
+        assert 'speech2caret_utterances_total{outcome="typed"} 1' in responses[0]
+        assert responses[1].startswith("HTTP/1.1 404 Not Found")
@@ -0,0 +1,58 @@
+import cProfile
+import json
+import pstats
+import threading
+
+import pytest
+import torch
+
+from speech2caret.profiling import Profiler
+
+
+def _work() -> None:
+    torch.mm(torch.ones(8, 8), torch.ones(8, 8))
+
+
+def test_profile(tmp_path):
+    profiler = Profiler(tmp_path)
+
+    with profiler.profile("recording"):
+        # Transcription runs in a worker thread
+        thread = threading.Thread(target=_work)
+        thread.start()
+        thread.join()
+
+    (profile_dir,) = tmp_path.iterdir()
+    assert profile_dir.name.endswith("-recording")
+    function_names = {function[2] for function in pstats.Stats(str(profile_dir / "profile.pstats")).stats}
+    assert "_work" in function_names
+    assert "_work" in (profile_dir / "profile.txt").read_text()
+    trace = json.loads((profile_dir / "trace.json").read_text())
+    assert any(event.get("name") == "aten::mm" for event in trace["traceEvents"])
+
+
+@pytest.mark.asyncio
+async def test_run_keeps_latest(tmp_path):
+    profiler = Profiler(tmp_path, keep=2)
+
+    async def transcribe_and_type(text: str) -> str:
+        _work()
+        return text
+
+    results = [await profiler.run(transcribe_and_type(str(i)), f"utterance{i}") for i in range(3)]
+
+    assert results == ["0", "1", "2"]
+    assert sorted(path.name.split("-")[-1] for path in tmp_path.iterdir()) == ["utterance1", "utterance2"]
+
+
+def test_another_profiler_running(tmp_path):
+    profiler = Profiler(tmp_path)
+    other_profiler = cProfile.Profile()
+    other_profiler.enable()
+    try:
+        with profiler.profile("recording"):
+            _work()
+    finally:
+        other_profiler.disable()
+
+    assert list(tmp_path.iterdir()) == []
@@ -1,4 +1,5 @@
 import asyncio
+import threading
 import wave
 from unittest import mock
 
@@ -20,7 +21,7 @@ def test_delete_audio_file(fake_audio_fp):
 
 @pytest.mark.asyncio
 async def test_recording_cycle(fake_audio_fp):
-    recorder = Recorder(audio_fp=fake_audio_fp)
+    recorder = Recorder(audio_fp=fake_audio_fp, sample_rate=44100, channels=2, audio_format="int16")
 
     # Fake audio data to simulate the callback
     dummy_audio_data = np.random.randint(-32768, 32767, (4410, 2), dtype=np.int16)
@@ -59,3 +60,138 @@ async def test_recording_cycle(fake_audio_fp):
             np.frombuffer(recorded_bytes, dtype=np.int16).reshape(-1, 2),
             np.concatenate([dummy_audio_data, dummy_audio_data], axis=0),
         )
+
+
+@pytest.mark.asyncio
+async def test_callback_puts_blocks_on_chunk_queue(fake_audio_fp):
+    recorder = Recorder(audio_fp=fake_audio_fp)
+    recorder.chunk_queue = asyncio.Queue()
+    dummy_audio_data = np.ones((160, 1), dtype=np.float32)
+
+    with mock.patch("sounddevice.InputStream"):
+
+        async def simulate_recording():
+            recorder._callback(dummy_audio_data, None, None, None)
+            recorder.stop_recording()
+
+        await asyncio.gather(recorder.start_recording(), simulate_recording())
+
+    block = await asyncio.wait_for(recorder.chunk_queue.get(), timeout=1)
+    np.testing.assert_array_equal(block, dummy_audio_data)
+    assert not fake_audio_fp.read_bytes()  # stop_recording doesn't write the WAV file
+
+
+def test_get_audio():
+    recorder = Recorder()
+    dummy_audio_data = np.random.uniform(-1, 1, (1600, 1)).astype(np.float32)
+    recorder._callback(dummy_audio_data, None, None, None)
+    recorder._callback(dummy_audio_data, None, None, None)
+
+    audio = recorder.get_audio()
+
+    # Already float32 mono at 16 kHz, so no conversion is needed
+    assert audio.dtype == np.float32
+    np.testing.assert_array_equal(audio, np.concatenate([dummy_audio_data, dummy_audio_data])[:, 0])
+
+
+def test_get_audio_converts_format():
+    recorder = Recorder(sample_rate=44100, channels=2, audio_format="int16")
+    recorder._callback(np.full((44100, 2), 32767, dtype=np.int16), None, None, None)
+
+    audio = recorder.get_audio()
+
+    # float32 mono, resampled to 16 kHz
+    assert audio.dtype == np.float32
+    assert audio.shape == (16000,)
+    # (the resampling filter rings at the start and end, where the audio steps from/to silence)
+    np.testing.assert_allclose(audio[10:-10], 1.0, rtol=1e-5)
+
+
+def test_save_recording_float32(fake_audio_fp):
+    recorder = Recorder(audio_fp=fake_audio_fp)
+    recorder._callback(np.full((1600, 1), 2.0, dtype=np.float32), None, None, None)
+    recorder.save_recording()
+
+    with wave.open(str(fake_audio_fp), "rb") as wf:
+        assert wf.getnchannels() == 1
+        assert wf.getframerate() == 16000
+        recorded = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    np.testing.assert_array_equal(recorded, 32767)  # clipped to [-1, 1]
+
+
+def test_get_audio_no_recording():
+    assert Recorder().get_audio().size == 0
+
+
+def test_save_recording_without_audio_fp():
+    with pytest.raises(ValueError):
+        Recorder().save_recording()
+
+
+def test_delete_audio_file_without_audio_fp():
+    Recorder().delete_audio_file()  # no-op
+
+
+@pytest.mark.asyncio
+async def test_callback_calls_on_silence():
+    recorder = Recorder()
+    recorder.silence_detector = mock.Mock()
+    recorder.silence_detector.process.side_effect = [False, True]
+    recorder.on_silence = mock.Mock()
+    recorder._loop = asyncio.get_running_loop()
+    block = np.zeros((160, 1), dtype=np.float32)
+
+    recorder._callback(block, None, None, None)
+    recorder._callback(block, None, None, None)
+    await asyncio.sleep(0)
+
+    assert recorder.silence_detector.process.call_count == 2
+    recorder.on_silence.assert_called_once_with()
+
+
+def test_split_recording():
+    recorder = Recorder()
+    block = np.full((160, 1), 0.5, dtype=np.float32)
+    recorder._callback(block, None, None, None)
+
+    audio = recorder.split_recording()
+    recorder._callback(block * 0.5, None, None, None)
+
+    np.testing.assert_array_equal(audio, np.full(160, 0.5, dtype=np.float32))
+    np.testing.assert_array_equal(recorder.get_audio(), np.full(160, 0.25, dtype=np.float32))
+
+
+def test_split_recording_while_recording():
+    recorder = Recorder()
+    block = np.full((160, 1), 0.5, dtype=np.float32)
+    n_blocks = 2000
+
+    def record():
+        for _ in range(n_blocks):
+            recorder._callback(block, None, None, None)
+
+    # The callback runs in the PortAudio thread, so no block should be lost when the recording is split meanwhile
+    thread = threading.Thread(target=record)
+    thread.start()
+    parts = []
+    while thread.is_alive():
+        parts.append(recorder.split_recording())
+    thread.join()
+    parts.append(recorder.split_recording())
+
+    assert sum(len(part) for part in parts) == n_blocks * len(block)
+
+
+@pytest.mark.asyncio
+async def test_resume_resets_silence_detector():
+    recorder = Recorder()
+    recorder.silence_detector = mock.Mock()
+
+    with mock.patch("sounddevice.InputStream"):
+
+        async def simulate_resume():
+            recorder.stop_recording()
+
+        await asyncio.gather(recorder.start_recording(is_resume=True), simulate_resume())
+
+    recorder.silence_detector.reset.assert_called_once_with()
@@ -0,0 +1,144 @@
+import subprocess
+import threading
+import time
+import wave
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from speech2caret.audio import load_wav
+from speech2caret.sound_cues import SoundCues
+
+
+def write_wav(audio_fp, data, sample_rate=22050):
+    with wave.open(str(audio_fp), "wb") as wf:
+        wf.setnchannels(data.shape[1])
+        wf.setsampwidth(data.dtype.itemsize)
+        wf.setframerate(sample_rate)
+        wf.writeframes(data.tobytes())
+
+
+@pytest.fixture
+def wav_fp(tmp_path):
+    audio_fp = tmp_path / "start.wav"
+    write_wav(audio_fp, np.arange(200, dtype=np.int16).reshape(100, 2))
+    return audio_fp
+
+
+def make_sound_cues(start=Path(""), stop=Path("")):
+    return SoundCues(start, stop, Path(""), Path(""))
+
+
+def test_load_wav(wav_fp):
+    data, sample_rate = load_wav(wav_fp)
+    assert sample_rate == 22050
+    assert data.dtype == np.int16
+    np.testing.assert_array_equal(data, np.arange(200, dtype=np.int16).reshape(100, 2))
+
+
+@mock.patch("sounddevice.play")
+def test_plays_decoded_wav(mock_play, wav_fp):
+    sound_cues = make_sound_cues(start=wav_fp)
+
+    sound_cues.play("start")
+    sound_cues._executor.shutdown(wait=True)
+
+    data, sample_rate = mock_play.call_args.args
+    assert sample_rate == 22050
+    assert data.shape == (100, 2)
+
+
+@mock.patch("sounddevice.play")
+def test_play_does_not_block(mock_play, wav_fp):
+    """Test that play returns while the sound is still being started."""
+    started = threading.Event()
+    mock_play.side_effect = lambda *args: started.wait(timeout=5)
+    sound_cues = make_sound_cues(start=wav_fp)
+
+    sound_cues.play("start")
+    assert not started.is_set()
+
+    started.set()
+    sound_cues._executor.shutdown(wait=True)
+    mock_play.assert_called_once()
+
+
+@mock.patch("shutil.which", return_value="/usr/bin/paplay")
+@mock.patch("subprocess.Popen")
+def test_plays_other_formats_with_paplay(mock_popen, mock_which, tmp_path):
+    mp3_fp = tmp_path / "stop.mp3"
+    mp3_fp.write_bytes(b"ID3 not a wav file")
+    sound_cues = make_sound_cues(stop=mp3_fp)
+
+    sound_cues.play("stop")
+    sound_cues._executor.shutdown(wait=True)
+
+    mock_popen.assert_called_once_with(["/usr/bin/paplay", mp3_fp])
+
+
+def test_paplay_is_reaped(tmp_path):
+    """paplay isn't waited for, but it's reaped once it exits (so it isn't left as a zombie process)."""
+    mp3_fp = tmp_path / "stop.mp3"
+    mp3_fp.write_bytes(b"ID3 not a wav file")
+    with mock.patch("shutil.which", return_value="true"):
+        sound_cues = make_sound_cues(stop=mp3_fp)
+    processes = []
+    popen = subprocess.Popen
+
+    def start_process(*args, **kwargs):
+        processes.append(popen(*args, **kwargs))
+        return processes[-1]
+
+    with mock.patch("subprocess.Popen", side_effect=start_process):
+        sound_cues.play("stop")
+        sound_cues._executor.shutdown(wait=True)
+    (process,) = processes
+    # Only waiting for the process (which nothing else here does) sets its returncode
+    for _ in range(100):
+        if process.returncode is not None:
+            break
+        time.sleep(0.01)
+    assert process.returncode == 0
+
+
+@mock.patch("sounddevice.play")
+@mock.patch("subprocess.Popen")
+def test_missing_files_are_not_played(mock_popen, mock_play):
+    sound_cues = make_sound_cues(start=Path("/path/to/nonexistent/file.wav"))
+
+    for name in SoundCues.NAMES:
+        sound_cues.play(name)
+    sound_cues._executor.shutdown(wait=True)
+
+    mock_play.assert_not_called()
+    mock_popen.assert_not_called()
+
+
+@mock.patch("sounddevice.play")
+def test_close(mock_play, wav_fp):
+    """Test that closing stops the worker thread (without waiting for sounds to finish)."""
+    sound_cues = make_sound_cues(start=wav_fp)
+    sound_cues.play("start")
+
+    sound_cues.close()
+
+    sound_cues._executor.shutdown(wait=True)  # the sound already submitted is still played
+    mock_play.assert_called_once()
+    with pytest.raises(RuntimeError):
+        sound_cues.play("start")
+
+
+def test_paths_from_config(wav_fp):
+    config = mock.Mock(
+        start_recording_audio_path=wav_fp,
+        stop_recording_audio_path=Path("stop.wav"),
+        resume_recording_audio_path=Path("resume.wav"),
+        pause_recording_audio_path=Path("pause.wav"),
+    )
+
+    sound_cues = SoundCues.from_config(config)
+
+    assert sound_cues.paths == SoundCues.paths_from_config(config)
+    assert sound_cues.paths == (wav_fp, Path("stop.wav"), Path("resume.wav"), Path("pause.wav"))
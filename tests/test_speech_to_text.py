@@ -1,6 +1,21 @@
+import subprocess  # nosec
+import sys
+import threading
 from pathlib import Path
+from unittest import mock
 
+import numpy as np
+import pytest
+from transformers.pipelines.audio_utils import ffmpeg_read
+
+from speech2caret.audio import MODEL_SAMPLE_RATE
+from speech2caret.backends.base import Backend
 from speech2caret.speech_to_text import SpeechToText
+from speech2caret.transcription_cache import TranscriptionCache
+
+JFK_TRANSCRIPTION = (
+    "And so my fellow Americans, ask not what your country can do for you, ask what you can do for your country."
+)
 
 
 def test__transcribe_returns_correctly(fake_audio_fp):
@@ -11,3 +26,110 @@ def test__transcribe_returns_correctly(fake_audio_fp):
         stt.transcribe(test_fp)
         == "And so my fellow Americans, ask not what your country can do for you, ask what you can do for your country."
     )
+
+
+def test__transcribe_array_returns_correctly():
+    test_fp = Path(__file__).parent / "data/jfk.flac"
+    audio = ffmpeg_read(test_fp.read_bytes(), MODEL_SAMPLE_RATE)
+    stt = SpeechToText()
+
+    assert stt.transcribe_array(audio) == JFK_TRANSCRIPTION
+
+
+@mock.patch("speech2caret.speech_to_text.create_backend")
+def test__uses_configured_backend(mock_create_backend):
+    stt = SpeechToText("openai/whisper-tiny.en", backend="faster-whisper")
+
+    mock_create_backend.assert_called_once_with("faster-whisper", "openai/whisper-tiny.en")
+    assert stt.transcribe_array(mock.sentinel.audio) is mock_create_backend.return_value.transcribe_array.return_value
+
+
+@mock.patch("speech2caret.speech_to_text.create_backend")
+def test__load_in_background(mock_create_backend):
+    loading = threading.Event()
+    mock_create_backend.side_effect = lambda *args, **kwargs: loading.wait() and mock.DEFAULT
+
+    stt = SpeechToText(load_in_background=True, warm_up=True)
+    assert not stt.is_loaded  # returns before the model has loaded
+
+    loading.set()
+    assert stt.transcribe_array(mock.sentinel.audio) is mock_create_backend.return_value.transcribe_array.return_value
+    assert stt.is_loaded
+    # One dummy transcription to warm up, then the real one
+    assert mock_create_backend.return_value.transcribe_array.call_count == 2
+
+
+@mock.patch("speech2caret.speech_to_text.create_backend", side_effect=OSError("Model not found"))
+def test__load_in_background_fails(mock_create_backend):
+    stt = SpeechToText(load_in_background=True)
+
+    with pytest.raises(OSError, match="Model not found"):
+        stt.wait_until_loaded()
+    with pytest.raises(OSError, match="Model not found"):
+        stt.transcribe_array(mock.sentinel.audio)
+
+
+@mock.patch("speech2caret.speech_to_text.create_backend", side_effect=OSError("Model not found"))
+def test__load_fails(mock_create_backend):
+    with pytest.raises(OSError, match="Model not found"):
+        SpeechToText()
+
+
+def test__import_is_lightweight():
+    """Importing doesn't import the heavy dependencies (they're imported when the model is loaded)."""
+    code = "import sys, speech2caret.speech_to_text; print(any(m in sys.modules for m in ('torch', 'transformers')))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)  # nosec
+    assert result.stdout.strip() == "False"
+
+
+def test__with_backend_instance():
+    mock_backend = mock.Mock(spec=Backend)
+
+    stt = SpeechToText(backend=mock_backend)
+
+    assert stt.is_loaded
+    assert stt.transcribe_array(mock.sentinel.audio) is mock_backend.transcribe_array.return_value
+
+
+def test__transcribe_segments():
+    mock_backend = mock.Mock(spec=Backend)
+    mock_backend.transcribe_segments.return_value = iter(["hello", "world"])
+
+    stt = SpeechToText(backend=mock_backend)
+
+    assert list(stt.transcribe_segments(mock.sentinel.audio)) == ["hello", "world"]
+    mock_backend.transcribe_segments.assert_called_once_with(mock.sentinel.audio)
+
+
+def test__transcribe_with_cache(tmp_path):
+    mock_backend = mock.Mock(spec=Backend)
+    mock_backend.transcribe_array.return_value = "hello"
+    mock_backend.transcribe_segments.side_effect = lambda audio: iter(["hello", "world"])
+    cache = TranscriptionCache(tmp_path)
+    stt = SpeechToText(backend=mock_backend, cache=cache)
+    audio = np.zeros(MODEL_SAMPLE_RATE, dtype=np.float32)
+
+    assert stt.transcribe_array(audio) == stt.transcribe_array(audio.copy()) == "hello"
+    assert list(stt.transcribe_segments(audio)) == list(stt.transcribe_segments(audio)) == ["hello", "world"]
+    # The second transcriptions were cached
+    mock_backend.transcribe_array.assert_called_once()
+    mock_backend.transcribe_segments.assert_called_once()
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # Different audio isn't cached, and the cache can be bypassed
+    assert stt.transcribe_array(audio + 0.1) == stt.transcribe_array(audio, use_cache=False) == "hello"
+    assert mock_backend.transcribe_array.call_count == 3
+
+
+def test__transcribe_segments_caches_only_complete_transcriptions(tmp_path):
+    mock_backend = mock.Mock(spec=Backend)
+    mock_backend.transcribe_segments.side_effect = lambda audio: iter(["hello", "world"])
+    stt = SpeechToText(backend=mock_backend, cache=TranscriptionCache(tmp_path))
+    audio = np.zeros(MODEL_SAMPLE_RATE, dtype=np.float32)
+
+    segments = stt.transcribe_segments(audio)
+    assert next(segments) == "hello"
+    segments.close()  # e.g. transcribe_and_type was cancelled
+
+    assert list(stt.transcribe_segments(audio)) == ["hello", "world"]
+    assert mock_backend.transcribe_segments.call_count == 2
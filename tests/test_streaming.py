@@ -0,0 +1,44 @@
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from speech2caret.streaming import StreamingTranscriber
+
+
+@pytest.mark.asyncio
+class TestStreamingTranscriber:
+    async def test_transcribes_segments_while_recording(self):
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_array.side_effect = ["hello", "world"]
+        sample_rate = 16000
+        streamer = StreamingTranscriber(mock_stt, sample_rate, segment_seconds=1, search_seconds=0.5)
+
+        block = np.ones((sample_rate // 2, 1), dtype=np.int16)
+        for _ in range(3):
+            streamer.queue.put_nowait(block)
+        streamer.finish()
+
+        assert await streamer.run() == "hello world"
+        assert mock_stt.transcribe_array.call_count == 2
+        # All recorded audio is transcribed exactly once
+        transcribed = sum(len(call.args[0]) for call in mock_stt.transcribe_array.call_args_list)
+        assert transcribed == 3 * len(block)
+
+    async def test_no_audio(self):
+        mock_stt = mock.Mock()
+        streamer = StreamingTranscriber(mock_stt, 16000)
+        streamer.finish()
+
+        assert await streamer.run() == ""
+        mock_stt.transcribe_array.assert_not_called()
+
+    async def test_skips_empty_segments(self):
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_array.return_value = ""
+        streamer = StreamingTranscriber(mock_stt, 16000)
+        streamer.queue.put_nowait(np.zeros((100, 1), dtype=np.int16))
+        streamer.finish()
+
+        assert await streamer.run() == ""
+        assert streamer.texts == []
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+
+from speech2caret.transcription_cache import TranscriptionCache, fingerprint
+
+
+def test_fingerprint():
+    audio = np.linspace(-1, 1, 16000, dtype=np.float32)
+    key = fingerprint(audio, {"model_name": "openai/whisper-base.en"})
+
+    assert key == fingerprint(audio.copy(), {"model_name": "openai/whisper-base.en"})
+    assert key == fingerprint(audio.astype(np.float64), {"model_name": "openai/whisper-base.en"})  # same samples
+    assert key != fingerprint(audio[::-1], {"model_name": "openai/whisper-base.en"})
+    assert key != fingerprint(audio, {"model_name": "openai/whisper-tiny.en"})
+    assert key != fingerprint(audio.tobytes(), {"model_name": "openai/whisper-tiny.en"})
+
+
+def test_get_and_put(tmp_path):
+    cache = TranscriptionCache(tmp_path)
+
+    assert cache.get("a") is None
+    cache.put("a", "hello")
+    cache.put("b", ["hello", "world"])
+
+    assert cache.get("a") == "hello"
+    assert cache.get("b") == ["hello", "world"]
+    assert (cache.hits, cache.misses) == (2, 1)
+    # Persisted on disk
+    assert TranscriptionCache(tmp_path).get("b") == ["hello", "world"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    entry_size = len(b'"hello"')
+    cache = TranscriptionCache(tmp_path, max_size_mb=2.5 * entry_size / 1024**2)
+    cache.put("a", "hello")
+    cache.put("b", "hello")
+    cache.get("a")  # so b is the least recently used
+
+    cache.put("c", "hello")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "hello"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.json", "c.json"]
+    assert cache.size_bytes == 2 * entry_size
+
+
+def test_reads_last_used_from_disk(tmp_path):
+    cache = TranscriptionCache(tmp_path)
+    cache.put("a", "hello")
+    cache.put("b", "hello")
+    os.utime(tmp_path / "b.json", ns=(0, 0))  # b was used before a
+
+    entry_size = len(b'"hello"')
+    cache = TranscriptionCache(tmp_path, max_size_mb=1.5 * entry_size / 1024**2)
+
+    assert cache.get("a") == "hello"
+    assert not (tmp_path / "b.json").exists()
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = TranscriptionCache(tmp_path)
+    cache.put("a", "hello")
+    (tmp_path / "a.json").write_text("not json")
+
+    assert cache.get("a") is None
+    assert cache.misses == 1
+    assert not (tmp_path / "a.json").exists()
+
+
+def test_clear(tmp_path):
+    cache = TranscriptionCache(tmp_path)
+    cache.put("a", "hello")
+
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert cache.size_bytes == 0
+    assert list(tmp_path.iterdir()) == []
@@ -1,34 +1,20 @@
-from pathlib import Path
+import asyncio
+import contextlib
+import threading
+import time
 from unittest import mock
 
+import numpy as np
 import pytest
 
-from speech2caret.utils import play_audio, replace_words, transcribe_and_type
-
-
-class TestPlayAudio:
-    @mock.patch("subprocess.run")
-    def test_calls_paplay(self, mock_subprocess_run, tmp_path):
-        """Test that play_audio calls paplay with the correct file path."""
-        audio_file = tmp_path / "test.wav"
-        audio_file.touch()
-
-        play_audio(audio_file)
-
-        mock_subprocess_run.assert_called_once_with(["paplay", audio_file])
-
-    @mock.patch("subprocess.run")
-    def test_file_does_not_exist(self, mock_subprocess_run):
-        """Test that play_audio does not call paplay if the file does not exist."""
-        audio_fp = Path("/path/to/nonexistent/file.wav")
-        play_audio(audio_fp)
-        mock_subprocess_run.assert_not_called()
-
-    @mock.patch("subprocess.run")
-    def test_is_directory(self, mock_subprocess_run, tmp_path):
-        """Test that play_audio does not call paplay if the path is a directory."""
-        play_audio(tmp_path)
-        mock_subprocess_run.assert_not_called()
+from speech2caret.metrics import Metrics
+from speech2caret.utils import (
+    finish_streaming_and_type,
+    replace_words,
+    transcribe_and_type,
+    transcribe_utterances_and_type,
+)
+from speech2caret.word_replacer import WordReplacer
 
 
 class TestReplaceWords:
@@ -62,6 +48,21 @@ class TestReplaceWords:
         replacements = {"a test": "an example"}
         assert replace_words(text, replacements) == "this is an example phrase"
 
+    def test_longest_match_first(self):
+        text = "new line and new lines"
+        replacements = {"new": "old", "new line": "\n"}
+        assert replace_words(text, replacements) == "\n and old lines"
+
+    def test_replacements_do_not_chain(self):
+        text = "a b"
+        replacements = {"a": "b", "b": "c"}
+        assert replace_words(text, replacements) == "b c"
+
+    def test_with_word_replacer(self):
+        text = "hello world"
+        replacements = WordReplacer({"hello": "goodbye"})
+        assert replace_words(text, replacements) == "goodbye world"
+
     def test_empty_replacements(self):
         text = "hello world"
         replacements = {}
@@ -72,63 +73,296 @@ class TestReplaceWords:
 class TestTranscribeAndType:
     async def test_happy_path(self):
         """Test the normal execution of transcribe_and_type."""
+        audio = np.zeros(16000, dtype=np.float32)
         mock_recorder = mock.Mock()
-        mock_recorder.audio_fp = "/path/to/audio.wav"
-        mock_recorder.delete_audio_file = mock.Mock()
+        mock_recorder.get_audio.return_value = audio
 
         mock_stt = mock.Mock()
-        mock_stt.transcribe.return_value = "hello world"
+        mock_stt.transcribe_segments.return_value = iter(["hello world"])
 
         mock_vkeyboard = mock.Mock()
         mock_vkeyboard.type_text = mock.Mock()
 
-        mock_config = mock.Mock()
-        mock_config.word_replacements = {}
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
 
         await transcribe_and_type(mock_recorder, mock_stt, mock_vkeyboard, mock_config)
 
-        mock_stt.transcribe.assert_called_once_with("/path/to/audio.wav")
+        mock_stt.transcribe_segments.assert_called_once_with(audio)
+        mock_stt.transcribe.assert_not_called()  # no WAV file round-trip
         mock_vkeyboard.type_text.assert_called_once_with("hello world")
-        mock_recorder.delete_audio_file.assert_called_once()
+
+    async def test_types_each_segment(self):
+        """Test that each segment is post-processed and typed (separated by a space)."""
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.return_value = iter(["hello world.", "", "Goodbye world."])
+
+        mock_vkeyboard = mock.Mock()
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({"world": "there"})
+
+        await transcribe_and_type(mock.Mock(), mock_stt, mock_vkeyboard, mock_config)
+
+        assert mock_vkeyboard.type_text.call_args_list == [mock.call("hello there."), mock.call(" Goodbye there.")]
+
+    async def test_types_while_transcribing(self):
+        """Test that a segment is typed before the following segment has been transcribed."""
+        typed = threading.Event()
+
+        def transcribe_segments(audio):
+            yield "hello"
+            assert typed.wait(timeout=5)
+            yield "world"
+
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.side_effect = transcribe_segments
+
+        mock_vkeyboard = mock.Mock()
+        mock_vkeyboard.type_text.side_effect = lambda text: typed.set()
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
+
+        await transcribe_and_type(mock.Mock(), mock_stt, mock_vkeyboard, mock_config)
+
+        assert mock_vkeyboard.type_text.call_args_list == [mock.call("hello"), mock.call(" world")]
+
+    async def test_cancel_stops_transcribing(self):
+        """Test that cancelling (e.g. when a new recording starts) stops transcribing and typing segments."""
+        transcribed = []
+
+        def transcribe_segments(audio):
+            for text in ["hello", "world"]:
+                time.sleep(0.05)
+                transcribed.append(text)
+                yield text
+
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.side_effect = transcribe_segments
+
+        mock_vkeyboard = mock.Mock()
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
+
+        task = asyncio.create_task(transcribe_and_type(mock.Mock(), mock_stt, mock_vkeyboard, mock_config))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.2)
+
+        assert transcribed == ["hello"]  # the segment being transcribed when cancelled is finished
+        mock_vkeyboard.type_text.assert_not_called()
 
     async def test_transcription_fails(self):
-        """Test that delete_audio_file is called even if transcription fails."""
+        """Test that nothing is typed if transcription fails."""
         mock_recorder = mock.Mock()
-        mock_recorder.audio_fp = "/path/to/audio.wav"
-        mock_recorder.delete_audio_file = mock.Mock()
 
         mock_stt = mock.Mock()
-        mock_stt.transcribe.side_effect = Exception("Transcription failed")
+        mock_stt.transcribe_segments.side_effect = Exception("Transcription failed")
 
         mock_vkeyboard = mock.Mock()
         mock_vkeyboard.type_text = mock.Mock()
 
-        mock_config = mock.Mock()
-        mock_config.word_replacements = {}
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
 
         with pytest.raises(Exception, match="Transcription failed"):
             await transcribe_and_type(mock_recorder, mock_stt, mock_vkeyboard, mock_config)
 
         mock_vkeyboard.type_text.assert_not_called()
-        mock_recorder.delete_audio_file.assert_called_once()
 
     async def test_typing_fails(self):
-        """Test that delete_audio_file is called even if typing fails."""
+        """Test that typing errors are propagated."""
         mock_recorder = mock.Mock()
-        mock_recorder.audio_fp = "/path/to/audio.wav"
-        mock_recorder.delete_audio_file = mock.Mock()
 
         mock_stt = mock.Mock()
-        mock_stt.transcribe.return_value = "hello world"
+        mock_stt.transcribe_segments.return_value = iter(["hello world"])
 
         mock_vkeyboard = mock.Mock()
         mock_vkeyboard.type_text.side_effect = Exception("Typing failed")
 
-        mock_config = mock.Mock()
-        mock_config.word_replacements = {}
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
 
         with pytest.raises(Exception, match="Typing failed"):
             await transcribe_and_type(mock_recorder, mock_stt, mock_vkeyboard, mock_config)
 
-        mock_stt.transcribe.assert_called_once_with("/path/to/audio.wav")
-        mock_recorder.delete_audio_file.assert_called_once()
+        mock_stt.transcribe_segments.assert_called_once()
+
+    async def test_times_each_stage(self):
+        """Test that each stage is timed (with a timer), and the timer is finished once the text is typed."""
+        mock_recorder = mock.Mock()
+        mock_recorder.get_audio.return_value = np.zeros(2 * 16000, dtype=np.float32)
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.return_value = iter(["hello", "world"])
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
+        metrics = Metrics()
+        timer = metrics.utterance()
+
+        await transcribe_and_type(mock_recorder, mock_stt, mock.Mock(), mock_config, timer)
+
+        assert set(timer.stages) == {"finalize", "inference", "replace_words", "typing", "total"}
+        assert timer.audio_seconds == 2.0
+        assert metrics.stage_seconds["total"].count == 1
+        assert timer.outcome == "typed"
+
+    async def test_times_model_load(self):
+        """Test that waiting for the model to load is timed separately from inference."""
+        mock_recorder = mock.Mock()
+        mock_recorder.get_audio.return_value = np.zeros(16000, dtype=np.float32)
+        mock_stt = mock.Mock(is_loaded=False)
+        mock_stt.wait_until_loaded.side_effect = lambda: time.sleep(0.05)
+        mock_stt.transcribe_segments.return_value = iter(["hello"])
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
+        timer = Metrics().utterance()
+
+        await transcribe_and_type(mock_recorder, mock_stt, mock.Mock(), mock_config, timer)
+
+        assert timer.stages["model_load"] >= 0.05
+        assert timer.stages["inference"] < 0.05
+
+    @pytest.mark.parametrize(
+        "transcribe_segments, vad, outcome",
+        [
+            (lambda audio: iter([""]), False, "no_text"),
+            (lambda audio: iter(["hello"]), True, "no_speech"),  # the audio is silent
+            (mock.Mock(side_effect=Exception("Transcription failed")), False, "error"),
+        ],
+    )
+    async def test_timer_finished_with_outcome(self, transcribe_segments, vad, outcome):
+        """Test that the timer is finished (and recorded) however the utterance ends."""
+        mock_recorder = mock.Mock()
+        mock_recorder.get_audio.return_value = np.zeros(16000, dtype=np.float32)
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.side_effect = transcribe_segments
+        mock_config = mock.Mock(vad=vad, vad_threshold_db=-35.0, vad_padding_seconds=0.2, vad_max_pause_seconds=0.5)
+        mock_config.word_replacer = WordReplacer({})
+        metrics = Metrics()
+        timer = metrics.utterance()
+
+        with contextlib.suppress(Exception):
+            await transcribe_and_type(mock_recorder, mock_stt, mock.Mock(), mock_config, timer)
+
+        assert timer.outcome == outcome
+        assert metrics.outcomes[outcome] == 1
+        assert metrics.stage_seconds["total"].count == 1
+
+    async def test_timer_finished_when_cancelled(self):
+        """Test that the timer is finished when transcribing is cancelled."""
+
+        def transcribe_segments(audio):
+            time.sleep(0.05)
+            yield "hello"
+
+        mock_recorder = mock.Mock()
+        mock_recorder.get_audio.return_value = np.zeros(16000, dtype=np.float32)
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.side_effect = transcribe_segments
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
+        timer = Metrics().utterance()
+
+        task = asyncio.create_task(transcribe_and_type(mock_recorder, mock_stt, mock.Mock(), mock_config, timer))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert timer.outcome == "cancelled"
+
+    async def test_removes_silence(self):
+        """Test that silence is removed before transcribing, when VAD is enabled."""
+        audio = np.zeros(3 * 16000, dtype=np.float32)
+        audio[16000:32000] = 0.1 * np.sin(np.arange(16000, dtype=np.float32))  # 1 s of "speech"
+        mock_recorder = mock.Mock()
+        mock_recorder.get_audio.return_value = audio
+
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.return_value = iter(["hello"])
+
+        mock_config = mock.Mock(vad=True, vad_threshold_db=-35.0, vad_padding_seconds=0.2, vad_max_pause_seconds=0.5)
+        mock_config.word_replacer = WordReplacer({})
+
+        await transcribe_and_type(mock_recorder, mock_stt, mock.Mock(), mock_config)
+
+        (trimmed,) = mock_stt.transcribe_segments.call_args.args
+        assert 16000 <= len(trimmed) < 1.5 * 16000
+
+    async def test_no_speech(self):
+        """Test that nothing is transcribed when VAD finds no speech."""
+        mock_recorder = mock.Mock()
+        mock_recorder.get_audio.return_value = np.zeros(16000, dtype=np.float32)
+        mock_stt = mock.Mock()
+        mock_vkeyboard = mock.Mock()
+        mock_config = mock.Mock(vad=True, vad_threshold_db=-35.0, vad_padding_seconds=0.2, vad_max_pause_seconds=0.5)
+
+        await transcribe_and_type(mock_recorder, mock_stt, mock_vkeyboard, mock_config)
+
+        mock_stt.transcribe_segments.assert_not_called()
+        mock_vkeyboard.type_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+class TestTranscribeUtterancesAndType:
+    async def test_types_each_utterance(self):
+        """Test that each utterance is transcribed and typed in order, separated by a space."""
+        texts = {1: ["hello there."], 2: [""], 3: ["How are", "you?"]}
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.side_effect = lambda audio: iter(texts[len(audio)])
+        mock_vkeyboard = mock.Mock()
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
+
+        utterances = asyncio.Queue()
+        for n_samples in (1, 2, 3):
+            utterances.put_nowait(np.zeros(n_samples, dtype=np.float32))
+        utterances.put_nowait(None)
+        await transcribe_utterances_and_type(utterances, mock_stt, mock_vkeyboard, mock_config)
+
+        assert mock_vkeyboard.type_text.call_args_list == [
+            mock.call("hello there."),
+            mock.call(" How are"),
+            mock.call(" you?"),
+        ]
+
+    async def test_profiles_each_utterance(self):
+        """Test that each utterance is profiled separately (not the wait for the next one)."""
+        mock_stt = mock.Mock()
+        mock_stt.transcribe_segments.side_effect = lambda audio: iter(["hello"])
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({})
+        mock_profiler = mock.Mock()
+
+        async def run(awaitable, name):
+            return await awaitable
+
+        mock_profiler.run.side_effect = run
+
+        utterances = asyncio.Queue()
+        for _ in range(2):
+            utterances.put_nowait(np.zeros(1, dtype=np.float32))
+        utterances.put_nowait(None)
+        await transcribe_utterances_and_type(utterances, mock_stt, mock.Mock(), mock_config, profiler=mock_profiler)
+
+        assert [call.args[1] for call in mock_profiler.run.call_args_list] == ["auto_stop", "auto_stop"]
+
+
+@pytest.mark.asyncio
+class TestFinishStreamingAndType:
+    async def test_happy_path(self):
+        """Test that the streamed transcription is post-processed and typed."""
+        mock_streamer = mock.Mock()
+
+        async def streaming():
+            return "hello world"
+
+        mock_vkeyboard = mock.Mock()
+        mock_config = mock.Mock(vad=False)
+        mock_config.word_replacer = WordReplacer({"world": "there"})
+
+        await finish_streaming_and_type(mock_streamer, streaming(), mock_vkeyboard, mock_config)
+
+        mock_streamer.finish.assert_called_once()
+        mock_vkeyboard.type_text.assert_called_once_with("hello there")
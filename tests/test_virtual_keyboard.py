@@ -1,9 +1,15 @@
+import subprocess
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import evdev
+import pytest
 
-from speech2caret.virtual_keyboard import VirtualKeyboard
+from speech2caret.virtual_keyboard import (
+    VirtualKeyboard,
+    copy_to_clipboard,
+    read_clipboard,
+)
 
 
 def make_mock_device():
@@ -69,3 +75,227 @@ def test_type_digits(mock_input_device):
     vk.device.write.assert_any_call(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_2, 1)
     vk.device.write.assert_any_call(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_3, 1)
     vk.device.syn.call_count == 3
+
+
+@patch("time.sleep")
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_batches_keys_per_report(mock_input_device, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), chars_per_report=8, report_delay=0.002)
+    vk.device.syn.reset_mock()
+    vk.type_text("hello world")
+
+    # "hel" | "lo wor" | "ld": a key is never pressed twice in the same report
+    assert vk.device.syn.call_count == 3
+    assert vk.device.write.call_count == 2 * len("hello world")
+    mock_sleep.assert_called_with(0.002)
+
+
+@patch("time.sleep")
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_chars_per_report(mock_input_device, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), chars_per_report=2)
+    vk.device.syn.reset_mock()
+    vk.type_text("abcde")
+
+    assert vk.device.syn.call_count == 3
+
+
+@patch("time.sleep")
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_consecutive_capitals_are_separate_reports(mock_input_device, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"))
+    vk.device.syn.reset_mock()
+    vk.type_text("AB")
+
+    assert vk.device.syn.call_count == 2
+
+
+@patch("time.sleep")
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_skips_untypeable_chars(mock_input_device, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"))
+    vk.device.write.reset_mock()
+    vk.type_text("é\N{SNOWMAN}a")
+
+    assert vk.device.write.call_args_list == [
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_A, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_A, 0),),
+    ]
+
+
+@patch("time.sleep")
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_type_symbols_and_newline(mock_input_device, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"))
+    vk.device.write.reset_mock()
+    vk.type_text("(a)\n")
+
+    assert vk.device.write.call_args_list == [
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_9, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_9, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_A, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_A, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_0, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_0, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_ENTER, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_ENTER, 0),),
+    ]
+
+
+@patch("evdev.UInput")
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_uinput_output(mock_input_device, mock_uinput):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), output="uinput")
+
+    keycodes = mock_uinput.call_args.args[0][evdev.ecodes.EV_KEY]
+    assert {evdev.ecodes.KEY_A, evdev.ecodes.KEY_LEFTSHIFT, evdev.ecodes.KEY_LEFTCTRL} <= set(keycodes)
+    vk.device.write.reset_mock()
+    vk.type_text("a")
+    vk.output_device.write.assert_any_call(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_A, 1)
+    vk.device.write.assert_not_called()
+
+    vk.close()
+    vk.output_device.close.assert_called_once()
+
+
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_unknown_output(mock_input_device):
+    with pytest.raises(ValueError):
+        VirtualKeyboard(Path("/dev/input/event0"), output="spam")
+
+
+@patch("time.sleep")
+@patch("speech2caret.virtual_keyboard.read_clipboard", return_value=None)
+@patch("speech2caret.virtual_keyboard.copy_to_clipboard", return_value=True)
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_pastes_long_text(mock_input_device, mock_copy, mock_read, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), paste_threshold=10)
+    vk.device.write.reset_mock()
+    vk.type_text("hello world")
+
+    mock_copy.assert_called_once_with("hello world")
+    assert vk.device.write.call_args_list == [
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTCTRL, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_V, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_V, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTCTRL, 0),),
+    ]
+
+
+@patch("time.sleep")
+@patch("speech2caret.virtual_keyboard.read_clipboard", return_value=None)
+@patch("speech2caret.virtual_keyboard.copy_to_clipboard", return_value=True)
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_paste_keys(mock_input_device, mock_copy, mock_read, mock_sleep):
+    paste_keys = (evdev.ecodes.KEY_LEFTCTRL, evdev.ecodes.KEY_LEFTSHIFT, evdev.ecodes.KEY_V)
+    vk = VirtualKeyboard(Path("/dev/input/event0"), paste_threshold=1, paste_keys=paste_keys)
+    vk.device.write.reset_mock()
+    vk.type_text("hello")
+
+    assert vk.device.write.call_args_list == [
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTCTRL, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_V, 1),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_V, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTSHIFT, 0),),
+        ((evdev.ecodes.EV_KEY, evdev.ecodes.KEY_LEFTCTRL, 0),),
+    ]
+
+
+@patch("time.sleep")
+@patch("speech2caret.virtual_keyboard.CLIPBOARD_RESTORE_DELAY", 0)
+@patch("speech2caret.virtual_keyboard.read_clipboard", return_value="copied by the user")
+@patch("speech2caret.virtual_keyboard.copy_to_clipboard", return_value=True)
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_restores_clipboard(mock_input_device, mock_copy, mock_read, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), paste_threshold=1)
+    vk.type_text("hello")
+    vk._restore_clipboard_timer.join()
+
+    assert [c.args[0] for c in mock_copy.call_args_list] == ["hello", "copied by the user"]
+
+
+@patch("time.sleep")
+@patch("speech2caret.virtual_keyboard.read_clipboard", return_value="copied by the user")
+@patch("speech2caret.virtual_keyboard.copy_to_clipboard", return_value=True)
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_restores_clipboard_after_consecutive_pastes(mock_input_device, mock_copy, mock_read, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), paste_threshold=1)
+    vk.type_text("hello")
+    vk.type_text("world")  # before the clipboard is restored, so it still has "hello"
+    vk.close()
+
+    mock_read.assert_called_once()
+    assert [c.args[0] for c in mock_copy.call_args_list] == ["hello", "world", "copied by the user"]
+
+
+@patch("time.sleep")
+@patch("speech2caret.virtual_keyboard.copy_to_clipboard", return_value=True)
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_types_short_text_when_pasting(mock_input_device, mock_copy, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), paste_threshold=10)
+    vk.type_text("hello")
+
+    mock_copy.assert_not_called()
+    vk.device.write.assert_any_call(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_H, 1)
+
+
+@patch("time.sleep")
+@patch("speech2caret.virtual_keyboard.read_clipboard", return_value=None)
+@patch("speech2caret.virtual_keyboard.copy_to_clipboard", return_value=False)
+@patch("evdev.InputDevice", return_value=make_mock_device())
+def test_types_when_paste_fails(mock_input_device, mock_copy, mock_read, mock_sleep):
+    vk = VirtualKeyboard(Path("/dev/input/event0"), paste_threshold=1)
+    vk.type_text("a")
+
+    vk.device.write.assert_any_call(evdev.ecodes.EV_KEY, evdev.ecodes.KEY_A, 1)
+
+
+@patch("shutil.which", return_value="/usr/bin/wl-copy")
+@patch("subprocess.run")
+def test_copy_to_clipboard_wayland(mock_run, mock_which, monkeypatch):
+    monkeypatch.setenv("WAYLAND_DISPLAY", "wayland-0")
+
+    assert copy_to_clipboard("hello") is True
+    mock_run.assert_called_once_with(["wl-copy"], input=b"hello", check=True, timeout=5)
+
+
+@patch("shutil.which", return_value=None)
+@patch("subprocess.run")
+def test_copy_to_clipboard_without_tools(mock_run, mock_which, monkeypatch):
+    monkeypatch.delenv("WAYLAND_DISPLAY", raising=False)
+
+    assert copy_to_clipboard("hello") is False
+    mock_run.assert_not_called()
+
+
+@patch("shutil.which", return_value="/usr/bin/xclip")
+@patch("subprocess.run", side_effect=subprocess.CalledProcessError(1, "xclip"))
+def test_copy_to_clipboard_failure(mock_run, mock_which, monkeypatch):
+    monkeypatch.delenv("WAYLAND_DISPLAY", raising=False)
+
+    assert copy_to_clipboard("hello") is False
+
+
+@patch("shutil.which", return_value="/usr/bin/xclip")
+@patch("subprocess.run")
+def test_read_clipboard(mock_run, mock_which, monkeypatch):
+    monkeypatch.delenv("WAYLAND_DISPLAY", raising=False)
+    mock_run.return_value.stdout = b"hello"
+
+    assert read_clipboard() == "hello"
+    mock_run.assert_called_once_with(
+        ["xclip", "-selection", "clipboard", "-o"], capture_output=True, check=True, timeout=5
+    )
+
+
+@patch("shutil.which", return_value="/usr/bin/wl-paste")
+@patch("subprocess.run", side_effect=subprocess.CalledProcessError(1, "wl-paste"))
+def test_read_empty_clipboard(mock_run, mock_which, monkeypatch):
+    monkeypatch.setenv("WAYLAND_DISPLAY", "wayland-0")
+
+    assert read_clipboard() is None
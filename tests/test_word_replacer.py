@@ -0,0 +1,43 @@
+import re
+
+import pytest
+
+from speech2caret.word_replacer import WordReplacer
+
+
+class TestWordReplacer:
+    def test_replaces_in_one_pass(self):
+        replacer = WordReplacer({"hello": "goodbye", "world": "there"})
+        assert replacer.replace("Hello world, hello!") == "goodbye there, goodbye!"
+
+    def test_longest_match_first(self):
+        replacer = WordReplacer({"new": "NEW", "newt": "NEWT", "new line": "\n"})
+        assert replacer.replace("new newt new line newts") == "NEW NEWT \n newts"
+
+    def test_falls_back_to_shorter_match_on_word_boundary(self):
+        replacer = WordReplacer({"new": "NEW", "new lines": "\n"})
+        assert replacer.replace("new line") == "NEW line"
+
+    def test_special_characters_are_escaped(self):
+        replacer = WordReplacer({"a.b": "ab"})
+        assert replacer.replace("axb a.b") == "axb ab"
+
+    def test_escapes_are_expanded(self):
+        """As in the README's example, "\\n" in the config is a newline (as it was with re.sub)."""
+        replacer = WordReplacer({"new line": r"\n", "tab": r"\t", "backslash": r"\\"})
+        assert replacer.replace("one new line two tab three backslash") == "one \n two \t three \\"
+
+    def test_invalid_replacement(self):
+        with pytest.raises(re.error):
+            WordReplacer({"first": r"\1"})
+
+    def test_no_replacements(self):
+        replacer = WordReplacer({})
+        assert replacer.replace("hello world") == "hello world"
+
+    def test_many_replacements(self):
+        replacer = WordReplacer({f"word{i}": f"replacement{i}" for i in range(10_000)})
+        assert (
+            replacer.replace("word1 word10 word9999 word10000")
+            == "replacement1 replacement10 replacement9999 word10000"
+        )